@@ -0,0 +1,50 @@
+"""messages: composite (session_id, created_at) index
+
+历史查询 `WHERE session_id = ? ORDER BY created_at` 之前只能用 session_id
+单列索引定位后再排序；复合索引可直接按序扫描。复合索引以 session_id 开头，
+可同时满足外键约束对索引的要求，因此原单列索引随之删除。
+
+Revision ID: 3f1d2c9a7b01
+Revises:
+Create Date: 2026-10-19 10:00:00
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3f1d2c9a7b01"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+COMPOSITE_INDEX = "ix_messages_session_id_created_at"
+# create_all 与 mysql-init / postgres init 脚本生成的单列索引名不同
+LEGACY_INDEXES = ("ix_messages_session_id", "idx_messages_session_id")
+
+
+def _index_names() -> set[str]:
+    inspector = sa.inspect(op.get_bind())
+    return {index["name"] for index in inspector.get_indexes("messages")}
+
+
+def upgrade() -> None:
+    existing = _index_names()
+
+    if COMPOSITE_INDEX not in existing:
+        op.create_index(COMPOSITE_INDEX, "messages", ["session_id", "created_at"])
+
+    # 先建复合索引再删单列索引，外键始终有可用索引
+    for name in LEGACY_INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name="messages")
+
+
+def downgrade() -> None:
+    existing = _index_names()
+
+    if "ix_messages_session_id" not in existing:
+        op.create_index("ix_messages_session_id", "messages", ["session_id"])
+    if COMPOSITE_INDEX in existing:
+        op.drop_index(COMPOSITE_INDEX, table_name="messages")
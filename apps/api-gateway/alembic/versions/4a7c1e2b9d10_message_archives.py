@@ -0,0 +1,84 @@
+"""message_archives: compressed archive of cold sessions
+
+冷会话的消息整体压缩为一行存入 message_archives，并从 messages 热表删除；
+访问时按需恢复。见 api_gateway/infrastructure/archive.py。
+
+Revision ID: 4a7c1e2b9d10
+Revises: 3f1d2c9a7b01
+Create Date: 2026-10-19 14:00:00
+
+"""
+
+import json
+import zlib
+from datetime import datetime
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import mysql
+
+from api_gateway.infrastructure.models import UUIDBinary
+
+# revision identifiers, used by Alembic.
+revision = "4a7c1e2b9d10"
+down_revision = "3f1d2c9a7b01"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("message_archives"):
+        return
+
+    op.create_table(
+        "message_archives",
+        sa.Column(
+            "session_id",
+            UUIDBinary(),
+            sa.ForeignKey("chat_sessions.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("message_count", sa.Integer(), nullable=False),
+        sa.Column("total_tokens", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("first_message_at", sa.DateTime(), nullable=False),
+        sa.Column("last_message_at", sa.DateTime(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(), nullable=False),
+        sa.Column(
+            "payload", sa.LargeBinary().with_variant(mysql.LONGBLOB(), "mysql"), nullable=False
+        ),
+    )
+    op.create_index("ix_message_archives_archived_at", "message_archives", ["archived_at"])
+
+
+def downgrade() -> None:
+    # 先把归档消息放回热表，避免删表丢数据
+    bind = op.get_bind()
+    archives = sa.table(
+        "message_archives", sa.column("session_id", UUIDBinary()), sa.column("payload")
+    )
+    messages = sa.table(
+        "messages",
+        sa.column("id", UUIDBinary()),
+        sa.column("session_id", UUIDBinary()),
+        sa.column("role"),
+        sa.column("content"),
+        sa.column("tokens"),
+        sa.column("created_at"),
+    )
+    for session_id, payload in bind.execute(sa.select(archives.c.session_id, archives.c.payload)):
+        rows = [
+            {
+                "id": id_,
+                "session_id": session_id,
+                "role": role,
+                "content": content,
+                "tokens": tokens,
+                "created_at": datetime.fromisoformat(created_at),
+            }
+            for id_, role, content, tokens, created_at in json.loads(zlib.decompress(payload))
+        ]
+        if rows:
+            bind.execute(sa.insert(messages), rows)
+
+    op.drop_index("ix_message_archives_archived_at", table_name="message_archives")
+    op.drop_table("message_archives")
@@ -0,0 +1,164 @@
+"""messages: monthly range partitioning by created_at (opt-in)
+
+仅在显式传入 `alembic -x partition_messages=true upgrade head` 时转换，
+否则本迁移为空操作（SQLite 等其他方言始终跳过）。
+
+- MySQL：分区表不支持外键，删除 messages -> chat_sessions 外键；
+  主键须包含分区列，改为 (id, created_at)。会话删除由仓储显式删除消息。
+- PostgreSQL：重建为声明式分区表，主键 (id, created_at)，外键保留。
+
+数据量大时需在维护窗口执行（MySQL 为整表重建，PostgreSQL 为整表复制）。
+
+Revision ID: 5b8d2f3c1e42
+Revises: 4a7c1e2b9d10
+Create Date: 2026-10-19 15:00:00
+
+"""
+
+from datetime import date, datetime
+
+import sqlalchemy as sa
+from alembic import context, op
+
+from api_gateway.infrastructure.partitioning import (
+    PG_DEFAULT_PARTITION,
+    TABLE,
+    add_months,
+    is_partitioned,
+    month_range,
+    month_start,
+    mysql_partition_definitions,
+    postgres_partition_ddl,
+)
+
+# revision identifiers, used by Alembic.
+revision = "5b8d2f3c1e42"
+down_revision = "4a7c1e2b9d10"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+FK_NAME = "fk_messages_session"
+
+
+def _enabled() -> bool:
+    flag = context.get_x_argument(as_dictionary=True).get("partition_messages", "")
+    return flag.lower() in ("1", "true", "yes")
+
+
+def _months(bind) -> list[date]:
+    """最早消息所在月至当前月 + MONTHS_AHEAD"""
+    first = bind.execute(sa.text(f"SELECT MIN(created_at) FROM {TABLE}")).scalar()
+    today = datetime.utcnow().date()
+    if isinstance(first, str):
+        first = datetime.fromisoformat(first)
+    start = first.date() if first is not None else today
+    return month_range(start, add_months(month_start(today), MONTHS_AHEAD))
+
+
+def _session_fk_names(bind) -> list[str]:
+    return [
+        fk["name"]
+        for fk in sa.inspect(bind).get_foreign_keys(TABLE)
+        if fk["referred_table"] == "chat_sessions" and fk["name"]
+    ]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name not in ("mysql", "postgresql") or not _enabled():
+        return
+    if is_partitioned(bind):
+        return
+
+    if bind.dialect.name == "mysql":
+        _upgrade_mysql(bind)
+    else:
+        _upgrade_postgres(bind)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name not in ("mysql", "postgresql") or not is_partitioned(bind):
+        return
+
+    if bind.dialect.name == "mysql":
+        op.execute(f"ALTER TABLE {TABLE} REMOVE PARTITIONING")
+        op.execute(f"ALTER TABLE {TABLE} DROP PRIMARY KEY, ADD PRIMARY KEY (id)")
+        op.execute(
+            f"ALTER TABLE {TABLE} ADD CONSTRAINT {FK_NAME} FOREIGN KEY (session_id) "
+            "REFERENCES chat_sessions(id) ON DELETE CASCADE"
+        )
+    else:
+        index_defs = _pg_index_defs(bind)
+        op.execute(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_partitioned")
+        op.execute(f"CREATE TABLE {TABLE} (LIKE {TABLE}_partitioned INCLUDING DEFAULTS)")
+        op.execute(f"INSERT INTO {TABLE} SELECT * FROM {TABLE}_partitioned")
+        op.execute(f"DROP TABLE {TABLE}_partitioned CASCADE")
+        _pg_add_constraints(index_defs, primary_key="id")
+
+
+# ========================
+# MySQL
+# ========================
+
+
+def _upgrade_mysql(bind) -> None:
+    for name in _session_fk_names(bind):
+        op.execute(f"ALTER TABLE {TABLE} DROP FOREIGN KEY {name}")
+    op.execute(f"ALTER TABLE {TABLE} DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at)")
+    op.execute(
+        f"ALTER TABLE {TABLE} PARTITION BY RANGE COLUMNS(created_at) (\n    "
+        f"{mysql_partition_definitions(_months(bind))}\n)"
+    )
+
+
+# ========================
+# PostgreSQL
+# ========================
+
+
+def _pg_index_defs(bind) -> list[str]:
+    """messages 上除主键外的索引定义（重建表后按原样恢复）"""
+    return list(
+        bind.execute(
+            sa.text(
+                "SELECT indexdef FROM pg_indexes "
+                "WHERE tablename = :table AND schemaname = current_schema() "
+                "AND indexname NOT LIKE '%pkey'"
+            ),
+            {"table": TABLE},
+        ).scalars()
+    )
+
+
+def _upgrade_postgres(bind) -> None:
+    months = _months(bind)
+    index_defs = _pg_index_defs(bind)
+
+    # 分区键不可为空
+    op.execute(f"UPDATE {TABLE} SET created_at = NOW() WHERE created_at IS NULL")
+    op.execute(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_unpartitioned")
+    op.execute(
+        f"CREATE TABLE {TABLE} (LIKE {TABLE}_unpartitioned INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    op.execute(f"ALTER TABLE {TABLE} ALTER COLUMN created_at SET NOT NULL")
+    for month in months:
+        op.execute(postgres_partition_ddl(month))
+    op.execute(f"CREATE TABLE {PG_DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+
+    op.execute(f"INSERT INTO {TABLE} SELECT * FROM {TABLE}_unpartitioned")
+    op.execute(f"DROP TABLE {TABLE}_unpartitioned CASCADE")
+    _pg_add_constraints(index_defs, primary_key="id, created_at")
+
+
+def _pg_add_constraints(index_defs: list[str], primary_key: str) -> None:
+    """旧表删除后索引名空出，再在新表上建主键、外键与原有索引"""
+    op.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY ({primary_key})")
+    op.execute(
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT {FK_NAME} FOREIGN KEY (session_id) "
+        "REFERENCES chat_sessions(id) ON DELETE CASCADE"
+    )
+    for definition in index_defs:
+        op.execute(definition)
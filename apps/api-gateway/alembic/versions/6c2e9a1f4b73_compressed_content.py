@@ -0,0 +1,117 @@
+"""messages/documents: compressed content columns
+
+content 由文本列改为二进制列（MySQL LONGBLOB / PostgreSQL BYTEA），由
+CompressedText 透明压缩。转换保留原有 UTF-8 字节，无格式标记的旧数据可直接读取；
+已有数据默认不重写，`alembic -x compress_existing=true upgrade head` 时分批压缩。
+
+PostgreSQL 上基于 content 的全文索引（idx_*_content_gin）随之删除。
+SQLite 列类型宽松，无需转换。
+
+Revision ID: 6c2e9a1f4b73
+Revises: 5b8d2f3c1e42
+Create Date: 2026-10-19 16:00:00
+
+"""
+
+import sqlalchemy as sa
+from alembic import context, op
+
+from api_gateway.config import settings
+from api_gateway.infrastructure.models import compress_text, decompress_text, has_format_marker
+
+# revision identifiers, used by Alembic.
+revision = "6c2e9a1f4b73"
+down_revision = "5b8d2f3c1e42"
+branch_labels = None
+depends_on = None
+
+TABLES = ("messages", "documents")
+BATCH = 1000
+
+
+def _rewrite(bind, table: str, convert) -> None:
+    """按主键分批读取 content，convert 返回新值（None 表示不变）"""
+    # id 不指定类型，按驱动返回值原样回传
+    t = sa.table(table, sa.column("id"), sa.column("content", sa.LargeBinary()))
+    last_id = None
+    while True:
+        query = sa.select(t.c.id, t.c.content).order_by(t.c.id).limit(BATCH)
+        if last_id is not None:
+            query = query.where(t.c.id > last_id)
+        rows = bind.execute(query).all()
+        if not rows:
+            return
+        updates = [
+            {"row_id": row_id, "new_content": new}
+            for row_id, content in rows
+            if (new := convert(bytes(content))) is not None
+        ]
+        if updates:
+            bind.execute(
+                t.update()
+                .where(t.c.id == sa.bindparam("row_id"))
+                .values(content=sa.bindparam("new_content")),
+                updates,
+            )
+        last_id = rows[-1][0]
+
+
+def _compress(content: bytes) -> bytes | None:
+    if has_format_marker(content):
+        return None
+    return compress_text(
+        content.decode("utf-8"),
+        settings.CONTENT_COMPRESSION,
+        settings.CONTENT_COMPRESSION_MIN_BYTES,
+    )
+
+
+def _plain(content: bytes) -> bytes | None:
+    if not has_format_marker(content):
+        return None
+    return decompress_text(content).encode("utf-8")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+
+    for table in TABLES:
+        if dialect == "mysql":
+            op.execute(f"ALTER TABLE {table} MODIFY content LONGBLOB NOT NULL")
+        elif dialect == "postgresql":
+            op.execute(f"DROP INDEX IF EXISTS idx_{table}_content_gin")
+            op.execute(
+                f"ALTER TABLE {table} ALTER COLUMN content TYPE BYTEA "
+                "USING convert_to(content, 'UTF8')"
+            )
+
+    flag = context.get_x_argument(as_dictionary=True).get("compress_existing", "")
+    if dialect in ("mysql", "postgresql") and flag.lower() in ("1", "true", "yes"):
+        for table in TABLES:
+            _rewrite(bind, table, _compress)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    if dialect not in ("mysql", "postgresql"):
+        return
+
+    for table in TABLES:
+        # 先解压为无标记的 UTF-8，再改回文本列
+        _rewrite(bind, table, _plain)
+        if dialect == "mysql":
+            op.execute(
+                f"ALTER TABLE {table} MODIFY content LONGTEXT "
+                "CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci NOT NULL"
+            )
+        else:
+            op.execute(
+                f"ALTER TABLE {table} ALTER COLUMN content TYPE TEXT "
+                "USING convert_from(content, 'UTF8')"
+            )
+            op.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_content_gin ON {table} "
+                "USING gin(to_tsvector('english', content))"
+            )
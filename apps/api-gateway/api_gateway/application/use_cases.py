@@ -5,10 +5,17 @@
 from collections.abc import AsyncGenerator
 
 from ..config import settings
-from ..domain.entities import ChatSession, MessageRole
-from ..domain.repositories import IChatSessionRepository, IMessageRepository
+from ..domain.entities import ChatSession, Message, MessageRole
+from ..domain.repositories import (
+    IChatSessionRepository,
+    IMessageRepository,
+    IPersistenceQueue,
+    IUnitOfWork,
+)
 from ..domain.services import ChatService
 from ..infrastructure.llm_client import ILLMClient
+from ..utils.ids import new_id
+from ..utils.timing import timed
 
 
 class ChatCompletionUseCase:
@@ -20,11 +27,17 @@ class ChatCompletionUseCase:
         message_repo: IMessageRepository,
         llm_client: ILLMClient,
         chat_service: ChatService,
+        persistence_queue: IPersistenceQueue | None = None,
+        unit_of_work: IUnitOfWork | None = None,
     ):
         self.session_repo = session_repo
         self.message_repo = message_repo
         self.llm_client = llm_client
         self.chat_service = chat_service
+        # 可选：write-behind 队列，启用后消息与会话更新不在请求路径上落库
+        self.persistence_queue = persistence_queue
+        # 可选：工作单元，启用后一轮对话的所有写入在一个事务内提交
+        self.unit_of_work = unit_of_work
 
     async def execute(
         self,
@@ -49,8 +62,8 @@ class ChatCompletionUseCase:
         Yields:
             生成的文本块
         """
-        # 1. 获取会话
-        session = await self.session_repo.get_by_id(session_id)
+        # 1. 获取会话（仅会话头，不加载完整历史）
+        session = await self.session_repo.get_by_id(session_id, with_messages=False)
         if not session:
             raise ValueError(f"Session {session_id} not found")
 
@@ -58,14 +71,13 @@ class ChatCompletionUseCase:
         if not self.chat_service.validate_message_length(user_message, settings.MAX_INPUT_TOKENS):
             raise ValueError(f"Message too long. Max {settings.MAX_INPUT_TOKENS} tokens")
 
-        # 3. 创建用户消息
-        user_msg = self.chat_service.create_message(session.id, MessageRole.USER, user_message)
-
-        # 4. 保存用户消息
-        await self.message_repo.save(user_msg)
-        session.add_message(user_msg)
+        # 3. 只加载上下文窗口内的历史消息
+        budget = self.chat_service.context_budget(
+            user_message, settings.MAX_INPUT_TOKENS, session.system_prompt
+        )
+        session.messages = await self.session_repo.get_context_window(session.id, budget)
 
-        # 5. 准备上下文
+        # 4. 准备上下文
         context = self.chat_service.prepare_context(
             session=session,
             new_message_content=user_message,
@@ -73,6 +85,13 @@ class ChatCompletionUseCase:
             system_prompt=session.system_prompt,
         )
 
+        # 5. 创建并保存用户消息（write-behind / 工作单元模式下与助手消息一起提交）
+        user_msg = self.chat_service.create_message(session.id, MessageRole.USER, user_message)
+        if not self.persistence_queue and not self.unit_of_work:
+            with timed("db"):
+                await self.session_repo.append_message(user_msg)
+        session.add_message(user_msg)
+
         # 6. 调用 LLM
         full_response = ""
         async for chunk in self.llm_client.chat_completion_stream(
@@ -90,12 +109,31 @@ class ChatCompletionUseCase:
             session.id, MessageRole.ASSISTANT, full_response
         )
 
-        # 8. 保存助手消息
-        await self.message_repo.save(assistant_msg)
         session.add_message(assistant_msg)
 
-        # 9. 更新会话
-        await self.session_repo.save(session)
+        # 8. 持久化
+        with timed("db"):
+            await self._persist_turn(session, user_msg, assistant_msg)
+
+    async def _persist_turn(self, session: ChatSession, user_msg: Message, assistant_msg: Message):
+        """持久化一轮对话"""
+        if self.persistence_queue:
+            await self.persistence_queue.enqueue_message(user_msg)
+            await self.persistence_queue.enqueue_message(assistant_msg)
+            await self.persistence_queue.enqueue_session_update(
+                session.id, user_msg.tokens + assistant_msg.tokens, session.updated_at
+            )
+            return
+
+        if self.unit_of_work:
+            # 用户消息、助手消息与会话计数器原子提交
+            async with self.unit_of_work as uow:
+                await uow.sessions.append_message(user_msg)
+                await uow.sessions.append_message(assistant_msg)
+                await uow.commit()
+            return
+
+        await self.session_repo.append_message(assistant_msg)
 
 
 class SessionManagementUseCase:
@@ -109,10 +147,8 @@ class SessionManagementUseCase:
         self, owner_id: str, name: str, system_prompt: str = ""
     ) -> ChatSession:
         """创建新会话"""
-        import uuid
-
         session = ChatSession(
-            id=str(uuid.uuid4()), owner_id=owner_id, name=name, system_prompt=system_prompt
+            id=new_id(), owner_id=owner_id, name=name, system_prompt=system_prompt
         )
 
         return await self.session_repo.save(session)
@@ -1,9 +1,15 @@
 """
 领域层 - 实体定义
+
+实体使用 slots，避免每个实例携带 __dict__；长会话历史可改用列式的
+MessageHistory 进一步压缩内存。
 """
 
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator, MutableSequence
 from dataclasses import dataclass, field
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
 
 
@@ -15,7 +21,11 @@ class MessageRole(str, Enum):
     ASSISTANT = "assistant"
 
 
-@dataclass
+# 角色字符串 → 枚举单例（避免每次构造都走 Enum 查找）
+_ROLES: dict[str, MessageRole] = {role.value: role for role in MessageRole}
+
+
+@dataclass(slots=True)
 class Message:
     """消息实体"""
 
@@ -27,18 +37,104 @@ class Message:
     created_at: datetime = field(default_factory=datetime.utcnow)
 
     def __post_init__(self):
-        if isinstance(self.role, str):
-            self.role = MessageRole(self.role)
-
-
-@dataclass
+        role = self.role
+        if role.__class__ is not MessageRole:
+            self.role = _ROLES.get(role) or MessageRole(role)
+
+
+# MessageHistory 中时间戳按相对该纪元的微秒数存储（实体统一使用 naive UTC）
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_ROLE_CODES = list(MessageRole)
+_ROLE_INDEX = {role: i for i, role in enumerate(_ROLE_CODES)}
+
+
+class MessageHistory:
+    """
+    列式存储的会话消息历史
+
+    token 数、角色、时间戳存放在紧凑数组中，并维护 token 前缀和，按预算取
+    上下文窗口为 O(log n)。读取时按需构建 Message，返回的是快照，修改它们
+    不会影响历史本身。
+    """
+
+    __slots__ = ("session_id", "_ids", "_contents", "_roles", "_tokens", "_created", "_prefix")
+
+    def __init__(self, session_id: str, messages: Iterable[Message] = ()):
+        self.session_id = session_id
+        self._ids: list[str] = []
+        self._contents: list[str] = []
+        self._roles = array("B")
+        self._tokens = array("I")
+        self._created = array("q")
+        self._prefix = array("Q", [0])  # _prefix[i] = 前 i 条消息的 token 总数
+        for message in messages:
+            self.append(message)
+
+    def append(self, message: Message):
+        """追加消息"""
+        self._ids.append(message.id)
+        self._contents.append(message.content)
+        self._roles.append(_ROLE_INDEX[message.role])
+        self._tokens.append(message.tokens)
+        self._created.append((message.created_at - _EPOCH) // _MICROSECOND)
+        self._prefix.append(self._prefix[-1] + message.tokens)
+
+    @property
+    def total_tokens(self) -> int:
+        """历史 token 总数"""
+        return self._prefix[-1]
+
+    def window(self, max_tokens: int) -> list[Message]:
+        """token 预算内的最近消息（与 ChatSession.get_context_messages 语义一致）"""
+        if max_tokens < 0:
+            return []
+        # 最小的 i 使 sum(tokens[i:]) <= max_tokens
+        start = bisect_left(self._prefix, self.total_tokens - max_tokens)
+        return [self._build(i) for i in range(start, len(self))]
+
+    def _build(self, i: int) -> Message:
+        return Message(
+            id=self._ids[i],
+            session_id=self.session_id,
+            role=_ROLE_CODES[self._roles[i]],
+            content=self._contents[i],
+            tokens=self._tokens[i],
+            created_at=_EPOCH + self._created[i] * _MICROSECOND,
+        )
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._build(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("message index out of range")
+        return self._build(index)
+
+    def __iter__(self) -> Iterator[Message]:
+        return (self._build(i) for i in range(len(self)))
+
+    def __reversed__(self) -> Iterator[Message]:
+        return (self._build(i) for i in range(len(self) - 1, -1, -1))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, MessageHistory | list):
+            return list(self) == list(other)
+        return NotImplemented
+
+
+@dataclass(slots=True)
 class ChatSession:
     """会话实体"""
 
     id: str
     owner_id: str | None
     name: str
-    messages: list[Message] = field(default_factory=list)
+    messages: MutableSequence[Message] | MessageHistory = field(default_factory=list)
     system_prompt: str = ""
     total_tokens: int = 0
     pinned: bool = False
@@ -56,7 +152,10 @@ class ChatSession:
     def get_context_messages(self, max_tokens: int | None = None) -> list[Message]:
         """获取上下文消息（带 token 限制）"""
         if not max_tokens:
-            return self.messages
+            return self.messages if isinstance(self.messages, list) else list(self.messages)
+
+        if isinstance(self.messages, MessageHistory):
+            return self.messages.window(max_tokens)
 
         # 从后向前累加，直到超过 token 限制
         selected = []
@@ -64,13 +163,14 @@ class ChatSession:
         for msg in reversed(self.messages):
             if total + msg.tokens > max_tokens:
                 break
-            selected.insert(0, msg)
+            selected.append(msg)
             total += msg.tokens
 
+        selected.reverse()
         return selected
 
 
-@dataclass
+@dataclass(slots=True)
 class User:
     """用户实体"""
 
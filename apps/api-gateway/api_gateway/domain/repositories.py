@@ -3,6 +3,7 @@
 """
 
 from abc import ABC, abstractmethod
+from datetime import datetime
 
 from .entities import ChatSession, Message, User
 
@@ -11,8 +12,8 @@ class IChatSessionRepository(ABC):
     """会话仓储接口"""
 
     @abstractmethod
-    async def get_by_id(self, session_id: str) -> ChatSession | None:
-        """根据 ID 获取会话"""
+    async def get_by_id(self, session_id: str, with_messages: bool = True) -> ChatSession | None:
+        """根据 ID 获取会话（with_messages=False 时不加载历史消息）"""
         pass
 
     @abstractmethod
@@ -20,6 +21,16 @@ class IChatSessionRepository(ABC):
         """获取用户的所有会话"""
         pass
 
+    @abstractmethod
+    async def get_context_window(self, session_id: str, max_tokens: int) -> list[Message]:
+        """获取 token 预算内的最近消息（按时间正序）"""
+        pass
+
+    @abstractmethod
+    async def append_message(self, message: Message) -> None:
+        """追加消息并原子累加会话 total_tokens / updated_at"""
+        pass
+
     @abstractmethod
     async def save(self, session: ChatSession) -> ChatSession:
         """保存会话"""
@@ -62,3 +73,43 @@ class IUserRepository(ABC):
     async def save(self, user: User) -> User:
         """保存用户"""
         pass
+
+
+class IPersistenceQueue(ABC):
+    """异步持久化队列接口（write-behind）"""
+
+    @abstractmethod
+    async def enqueue_message(self, message: Message) -> None:
+        """提交消息，由后台任务批量落库"""
+        pass
+
+    @abstractmethod
+    async def enqueue_session_update(
+        self, session_id: str, tokens_delta: int, updated_at: datetime
+    ) -> None:
+        """提交会话计数器增量"""
+        pass
+
+
+class IUnitOfWork(ABC):
+    """工作单元接口：一次对话轮次内的写操作在同一事务中提交"""
+
+    sessions: IChatSessionRepository
+    messages: IMessageRepository
+
+    async def __aenter__(self) -> "IUnitOfWork":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # 未提交即退出（含异常）时回滚
+        await self.rollback()
+
+    @abstractmethod
+    async def commit(self) -> None:
+        """提交事务"""
+        pass
+
+    @abstractmethod
+    async def rollback(self) -> None:
+        """回滚未提交的写入"""
+        pass
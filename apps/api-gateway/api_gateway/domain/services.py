@@ -2,6 +2,7 @@
 领域层 - 领域服务
 """
 
+from ..utils.ids import new_id
 from ..utils.tokens import estimate_tokens
 from .entities import ChatSession, Message, MessageRole
 
@@ -34,11 +35,10 @@ class ChatService:
         if system_prompt:
             messages.append({"role": "system", "content": system_prompt})
 
-        # 估算当前 token 使用
-        current_tokens = estimate_tokens(system_prompt) + estimate_tokens(new_message_content)
-
         # 从历史消息中选择合适的上下文
-        available_tokens = max_input_tokens - current_tokens - 100  # 保留 100 token 余量
+        available_tokens = ChatService.context_budget(
+            new_message_content, max_input_tokens, system_prompt
+        )
         context_messages = session.get_context_messages(available_tokens)
 
         # 添加历史消息
@@ -50,13 +50,19 @@ class ChatService:
 
         return messages
 
+    @staticmethod
+    def context_budget(
+        new_message_content: str, max_input_tokens: int, system_prompt: str = ""
+    ) -> int:
+        """计算可用于历史消息的 token 预算"""
+        current_tokens = estimate_tokens(system_prompt) + estimate_tokens(new_message_content)
+        return max_input_tokens - current_tokens - 100  # 保留 100 token 余量
+
     @staticmethod
     def create_message(session_id: str, role: MessageRole, content: str) -> Message:
         """创建消息实体"""
-        import uuid
-
         return Message(
-            id=str(uuid.uuid4()),
+            id=new_id(),
             session_id=session_id,
             role=role,
             content=content,
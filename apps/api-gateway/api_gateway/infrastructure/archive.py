@@ -0,0 +1,246 @@
+"""
+基础设施层 - 冷会话消息归档
+
+长时间未活跃的会话，其消息整体压缩为 message_archives 中的一行并从热表删除；
+再次访问时（热表查不到消息）按需解压回写热表。只读访问不刷新 updated_at，
+恢复后若无新消息，会在之后的某一轮再次归档。后台任务按周期执行归档，
+并在 messages 为分区表时顺带做分区滚动维护，使热表规模保持有界。
+"""
+
+import asyncio
+import contextlib
+import json
+import zlib
+from collections.abc import Callable
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, exists, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..utils.logger import setup_logger
+from .database import AsyncSessionLocal
+from .models import ChatSessionModel, MessageArchiveModel, MessageModel, MessageRoleEnum
+from .partitioning import drop_empty_partitions, ensure_future_partitions
+
+logger = setup_logger(__name__, settings.LOG_LEVEL, settings.LOG_FORMAT)
+
+# 单条 DELETE 的 IN 列表长度
+_DELETE_CHUNK = 1000
+
+
+def _encode(rows) -> bytes:
+    payload = [
+        [row.id, row.role.value, row.content, row.tokens, row.created_at.isoformat()]
+        for row in rows
+    ]
+    return zlib.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"), 6)
+
+
+def _decode(session_id: str, payload: bytes) -> list[dict]:
+    return [
+        {
+            "id": id_,
+            "session_id": session_id,
+            "role": MessageRoleEnum(role),
+            "content": content,
+            "tokens": tokens,
+            "created_at": datetime.fromisoformat(created_at),
+        }
+        for id_, role, content, tokens, created_at in json.loads(zlib.decompress(payload))
+    ]
+
+
+async def archive_session(db: AsyncSession, session_id: str, cutoff: datetime) -> int:
+    """
+    归档单个会话（调用方负责事务）
+
+    锁定会话行并复核 updated_at，与 append_message 的计数器 UPDATE 串行，
+    避免归档期间新写入的消息被一并删除。返回归档的消息数。
+    """
+    updated_at = await db.scalar(
+        select(ChatSessionModel.updated_at)
+        .where(ChatSessionModel.id == session_id)
+        .with_for_update()
+    )
+    if updated_at is None or updated_at >= cutoff:
+        return 0
+
+    rows = (
+        await db.execute(
+            select(
+                MessageModel.id,
+                MessageModel.role,
+                MessageModel.content,
+                MessageModel.tokens,
+                MessageModel.created_at,
+            )
+            .where(MessageModel.session_id == session_id)
+            .order_by(MessageModel.created_at, MessageModel.id)
+        )
+    ).all()
+    if not rows:
+        return 0
+
+    await db.execute(
+        insert(MessageArchiveModel),
+        [
+            {
+                "session_id": session_id,
+                "message_count": len(rows),
+                "total_tokens": sum(row.tokens for row in rows),
+                "first_message_at": rows[0].created_at,
+                "last_message_at": rows[-1].created_at,
+                "archived_at": datetime.utcnow(),
+                "payload": _encode(rows),
+            }
+        ],
+    )
+    ids = [row.id for row in rows]
+    for i in range(0, len(ids), _DELETE_CHUNK):
+        await db.execute(
+            delete(MessageModel).where(MessageModel.id.in_(ids[i : i + _DELETE_CHUNK]))
+        )
+    return len(rows)
+
+
+async def restore_session(db: AsyncSession, session_id: str) -> bool:
+    """按需恢复归档会话到热表（调用方负责提交）；无归档时返回 False"""
+    # 绝大多数空会话没有归档：先做不加锁的存在性检查，有归档才加锁读取
+    if not await db.scalar(select(exists().where(MessageArchiveModel.session_id == session_id))):
+        return False
+    payload = await db.scalar(
+        select(MessageArchiveModel.payload)
+        .where(MessageArchiveModel.session_id == session_id)
+        .with_for_update()
+    )
+    if payload is None:
+        return False
+
+    rows = _decode(session_id, payload)
+    if rows:
+        await db.execute(insert(MessageModel), rows)
+    await db.execute(
+        delete(MessageArchiveModel).where(MessageArchiveModel.session_id == session_id)
+    )
+    logger.info(
+        "Restored archived session", extra={"session_id": session_id, "messages": len(rows)}
+    )
+    return True
+
+
+class MessageArchiver:
+    """冷会话归档后台任务"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        cold_after_days: int = 90,
+        batch_sessions: int = 200,
+        interval_seconds: float = 3600,
+        months_ahead: int = 3,
+    ):
+        self._session_factory = session_factory
+        self.cold_after = timedelta(days=cold_after_days)
+        self.batch_sessions = batch_sessions
+        self.interval = interval_seconds
+        self.months_ahead = months_ahead
+        self._task: asyncio.Task | None = None
+
+    async def archive_cold_sessions(self, now: datetime | None = None) -> int:
+        """归档一批冷会话，返回归档的会话数"""
+        cutoff = (now or datetime.utcnow()) - self.cold_after
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(ChatSessionModel.id)
+                .where(
+                    ChatSessionModel.updated_at < cutoff,
+                    exists().where(MessageModel.session_id == ChatSessionModel.id),
+                )
+                .order_by(ChatSessionModel.updated_at)
+                .limit(self.batch_sessions)
+            )
+            session_ids = result.scalars().all()
+
+        archived = 0
+        for session_id in session_ids:
+            try:
+                async with self._session_factory() as db, db.begin():
+                    if await archive_session(db, session_id, cutoff):
+                        archived += 1
+            except IntegrityError:
+                # 其他 worker 已归档同一会话
+                logger.warning("Session already archived", extra={"session_id": session_id})
+        return archived
+
+    async def maintain_partitions(self, now: datetime | None = None) -> dict[str, list[str]]:
+        """分区滚动维护：创建未来分区，删除已清空的冷分区（键名避开 LogRecord 保留字段）"""
+        now = now or datetime.utcnow()
+        async with self._session_factory() as db, db.begin():
+            conn = await db.connection()
+            created = await conn.run_sync(ensure_future_partitions, now.date(), self.months_ahead)
+            dropped = await conn.run_sync(drop_empty_partitions, (now - self.cold_after).date())
+        return {"partitions_created": created, "partitions_dropped": dropped}
+
+    async def run_once(self, now: datetime | None = None) -> dict:
+        """执行一轮归档与分区维护"""
+        archived = await self.archive_cold_sessions(now)
+        partitions = await self.maintain_partitions(now)
+        result = {"archived_sessions": archived, **partitions}
+        logger.info("Message archive run finished", extra=result)
+        return result
+
+    # ========================
+    # 生命周期
+    # ========================
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name="message-archiver")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as exc:
+                logger.error(f"Message archive run failed: {exc}")
+            await asyncio.sleep(self.interval)
+
+
+# 进程级单例（由 lifespan 启停）
+_archiver: MessageArchiver | None = None
+
+
+def start_archiver() -> MessageArchiver | None:
+    """按配置启动归档任务（多 worker 部署建议只在一个实例上开启）"""
+    global _archiver
+
+    if not settings.ARCHIVE_ENABLED:
+        return None
+
+    _archiver = MessageArchiver(
+        cold_after_days=settings.ARCHIVE_COLD_DAYS,
+        batch_sessions=settings.ARCHIVE_BATCH_SESSIONS,
+        interval_seconds=settings.ARCHIVE_INTERVAL_SECONDS,
+        months_ahead=settings.PARTITION_MONTHS_AHEAD,
+    )
+    _archiver.start()
+    return _archiver
+
+
+async def stop_archiver():
+    """停止归档任务"""
+    global _archiver
+
+    if _archiver is None:
+        return
+
+    await _archiver.stop()
+    _archiver = None
@@ -0,0 +1,320 @@
+"""
+基础设施层 - 会话数据批量导入导出
+
+按表流式导出为 JSONL（可 gzip）或 Parquet，一表一个文件，附 manifest.json；
+导入按外键顺序逐表分批写入。导出使用服务端游标（stream + yield_per），
+导入逐行读取、按批提交，内存占用只与批大小有关，与数据总量无关。
+
+写入路径：
+- PostgreSQL：COPY（asyncpg copy_records_to_table）
+- 其他：多行 INSERT（SQLAlchemy insertmanyvalues，每批一条或少量语句）
+- skip_existing：改用 INSERT IGNORE / ON CONFLICT DO NOTHING，可用于断点续导
+
+列值经模型的 TypeDecorator 处理，导出为明文（UUID 字符串、解压后的正文），
+因此可在 MySQL / PostgreSQL / SQLite 之间迁移，目标库按自身配置重新压缩。
+"""
+
+import base64
+import gzip
+import json
+import time
+from collections.abc import AsyncIterator, Callable, Iterator
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any
+
+from sqlalchemy import JSON, Boolean, DateTime, Enum, Integer, LargeBinary, Table, insert, select
+from sqlalchemy.dialects import mysql, postgresql
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.types import TypeDecorator
+
+from .models import (
+    ChatSessionModel,
+    DepartmentModel,
+    MessageArchiveModel,
+    MessageModel,
+    UserModel,
+)
+
+# 外键依赖顺序
+TABLES: dict[str, Table] = {
+    model.__tablename__: model.__table__
+    for model in (UserModel, DepartmentModel, ChatSessionModel, MessageModel, MessageArchiveModel)
+}
+FORMATS = ("jsonl", "parquet")
+MANIFEST = "manifest.json"
+
+
+# ========================
+# 列值编解码
+# ========================
+
+
+def _encode_value(column, value, fmt: str):
+    if value is None or isinstance(column.type, TypeDecorator):
+        return value
+    if isinstance(column.type, Enum):
+        return value.value if hasattr(value, "value") else value
+    if fmt == "jsonl":
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, bytes):
+            return base64.b64encode(value).decode("ascii")
+    elif isinstance(column.type, JSON):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _decode_value(column, value, fmt: str):
+    if value is None or isinstance(column.type, TypeDecorator):
+        return value
+    if isinstance(column.type, Enum) and column.type.enum_class is not None:
+        return column.type.enum_class(value)
+    if isinstance(value, str):
+        if isinstance(column.type, DateTime):
+            return datetime.fromisoformat(value)
+        if isinstance(column.type, LargeBinary):
+            return base64.b64decode(value)
+        if isinstance(column.type, JSON) and fmt == "parquet":
+            return json.loads(value)
+    return value
+
+
+def _arrow_schema(table: Table):
+    import pyarrow as pa
+
+    def arrow_type(column):
+        if isinstance(column.type, TypeDecorator | Enum | JSON):
+            return pa.string()
+        if isinstance(column.type, Boolean):
+            return pa.bool_()
+        if isinstance(column.type, Integer):
+            return pa.int64()
+        if isinstance(column.type, DateTime):
+            return pa.timestamp("us")
+        if isinstance(column.type, LargeBinary):
+            return pa.binary()
+        return pa.string()
+
+    return pa.schema([(c.name, arrow_type(c)) for c in table.columns])
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as exc:
+        raise RuntimeError("Parquet format requires the pyarrow package") from exc
+
+
+# ========================
+# 文件读写
+# ========================
+
+
+def data_path(directory: Path, table: str, fmt: str, compress: bool = False) -> Path:
+    suffix = ".parquet" if fmt == "parquet" else ".jsonl.gz" if compress else ".jsonl"
+    return directory / f"{table}{suffix}"
+
+
+def _find_data_file(directory: Path, table: str) -> tuple[Path, str] | None:
+    for fmt, compress in (("jsonl", False), ("jsonl", True), ("parquet", False)):
+        path = data_path(directory, table, fmt, compress)
+        if path.exists():
+            return path, fmt
+    return None
+
+
+def _open_text(path: Path, mode: str) -> IO[str]:
+    """由调用方关闭"""
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")  # noqa: SIM115
+    return open(path, mode, encoding="utf-8")  # noqa: SIM115
+
+
+def read_batches(path: Path, fmt: str, table: Table, batch_size: int) -> Iterator[list[dict]]:
+    """逐批读取数据文件并解码为列值字典"""
+    columns = {c.name: c for c in table.columns}
+
+    def decode(record: dict) -> dict:
+        return {
+            name: _decode_value(columns[name], value, fmt)
+            for name, value in record.items()
+            if name in columns
+        }
+
+    if fmt == "parquet":
+        _require_pyarrow()
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield [decode(record) for record in batch.to_pylist()]
+        return
+
+    with _open_text(path, "r") as f:
+        batch = []
+        for line in f:
+            if not line.strip():
+                continue
+            batch.append(decode(json.loads(line)))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+class _Writer:
+    """按批追加写入单表数据文件"""
+
+    def __init__(self, path: Path, fmt: str, table: Table):
+        self.fmt = fmt
+        self.table = table
+        if fmt == "parquet":
+            _require_pyarrow()
+            import pyarrow.parquet as pq
+
+            self._schema = _arrow_schema(table)
+            self._file = pq.ParquetWriter(path, self._schema, compression="zstd")
+        else:
+            self._file = _open_text(path, "w")
+
+    def write(self, rows: list[dict]):
+        if self.fmt == "parquet":
+            import pyarrow as pa
+
+            self._file.write_table(pa.Table.from_pylist(rows, schema=self._schema))
+        else:
+            self._file.writelines(
+                json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n" for row in rows
+            )
+
+    def close(self):
+        self._file.close()
+
+
+# ========================
+# 导出
+# ========================
+
+
+async def stream_table(
+    engine: AsyncEngine, table: Table, fmt: str, batch_size: int
+) -> AsyncIterator[list[dict]]:
+    """服务端游标逐批读取整表"""
+    names = [c.name for c in table.columns]
+    columns = list(table.columns)
+    async with engine.connect() as conn:
+        result = await conn.stream(select(table).execution_options(yield_per=batch_size))
+        async for partition in result.partitions():
+            yield [
+                {
+                    name: _encode_value(column, value, fmt)
+                    for name, column, value in zip(names, columns, row, strict=True)
+                }
+                for row in partition
+            ]
+
+
+async def export_data(
+    engine: AsyncEngine,
+    directory: Path,
+    fmt: str = "jsonl",
+    tables: list[str] | None = None,
+    batch_size: int = 5000,
+    compress: bool = False,
+) -> dict[str, int]:
+    """导出到目录，返回每表行数"""
+    directory.mkdir(parents=True, exist_ok=True)
+    counts = {}
+    for name in tables or TABLES:
+        table = TABLES[name]
+        writer = _Writer(data_path(directory, name, fmt, compress), fmt, table)
+        count = 0
+        try:
+            async for rows in stream_table(engine, table, fmt, batch_size):
+                writer.write(rows)
+                count += len(rows)
+        finally:
+            writer.close()
+        counts[name] = count
+
+    manifest = {
+        "format": fmt,
+        "exported_at": datetime.utcnow().isoformat(),
+        "dialect": engine.dialect.name,
+        "tables": counts,
+    }
+    (directory / MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return counts
+
+
+# ========================
+# 导入
+# ========================
+
+
+def _insert_statement(table: Table, dialect: str, skip_existing: bool):
+    if not skip_existing:
+        return insert(table)
+    if dialect == "mysql":
+        return mysql.insert(table).prefix_with("IGNORE")
+    if dialect == "postgresql":
+        return postgresql.insert(table).on_conflict_do_nothing()
+    return insert(table).prefix_with("OR IGNORE")
+
+
+async def _copy_batch(conn, table: Table, rows: list[dict]):
+    """PostgreSQL COPY；列值先经类型的绑定处理（UUID、压缩正文、枚举）"""
+    dialect = conn.dialect
+    columns = list(table.columns)
+    processors = [c.type.bind_processor(dialect) for c in columns]
+    records = [
+        tuple(
+            proc(row.get(c.name)) if proc else row.get(c.name)
+            for c, proc in zip(columns, processors, strict=True)
+        )
+        for row in rows
+    ]
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        table.name, records=records, columns=[c.name for c in columns]
+    )
+
+
+async def import_data(
+    engine: AsyncEngine,
+    directory: Path,
+    tables: list[str] | None = None,
+    batch_size: int = 5000,
+    skip_existing: bool = False,
+    use_copy: bool = True,
+    progress: Callable[[str, int, float], None] | None = None,
+) -> dict[str, int]:
+    """从目录导入（每批一个事务），返回每表行数"""
+    dialect = engine.dialect.name
+    copy = use_copy and not skip_existing and dialect == "postgresql"
+    counts = {}
+    for name in tables or TABLES:
+        found = _find_data_file(directory, name)
+        if found is None:
+            continue
+        path, fmt = found
+        table = TABLES[name]
+        statement = _insert_statement(table, dialect, skip_existing)
+        count, started = 0, time.perf_counter()
+        for rows in read_batches(path, fmt, table, batch_size):
+            async with engine.begin() as conn:
+                if copy:
+                    await _copy_batch(conn, table, rows)
+                else:
+                    await conn.execute(statement, rows)
+            count += len(rows)
+            if progress:
+                progress(name, count, time.perf_counter() - started)
+        counts[name] = count
+    return counts
+
+
+def read_manifest(directory: Path) -> dict[str, Any] | None:
+    path = directory / MANIFEST
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else None
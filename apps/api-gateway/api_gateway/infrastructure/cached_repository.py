@@ -0,0 +1,356 @@
+"""
+基础设施层 - 读穿透会话缓存
+
+在 SQLAlchemy 仓储前放一层进程内 LRU，缓存热会话的会话头与最近消息窗口。
+写路径同步更新缓存；每个会话有一个版本号（单进程用本地计数器，多 worker
+用 Redis INCR），读取时版本不一致即视为失效，保证多 worker 下安全。
+版本号存储同样有界：本地只保留最近写入的会话，Redis 键带 TTL；缓存条目的
+存活时间不超过版本号 TTL，版本号过期重置时不会有旧条目被误判为有效。
+"""
+
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from dataclasses import dataclass, replace
+from datetime import datetime
+
+from ..config import settings
+from ..domain.entities import ChatSession, Message
+from ..domain.repositories import (
+    IChatSessionRepository,
+    IMessageRepository,
+    IPersistenceQueue,
+    IUnitOfWork,
+)
+
+
+class IVersionStore(ABC):
+    """会话版本号存储接口"""
+
+    @abstractmethod
+    async def get(self, session_id: str) -> int:
+        """获取当前版本号"""
+        pass
+
+    @abstractmethod
+    async def bump(self, session_id: str) -> int:
+        """版本号加一并返回新值"""
+        pass
+
+
+class LocalVersionStore(IVersionStore):
+    """
+    进程内版本号（仅适用于单 worker）
+
+    只保留最近写入的 max_keys 个会话；其余会话的版本号为 _floor（大于任何已淘汰的
+    版本号），版本号不会回退到淘汰前的值。
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._versions: OrderedDict[str, int] = OrderedDict()
+        self._floor = 0
+
+    async def get(self, session_id: str) -> int:
+        return self._versions.get(session_id, self._floor)
+
+    async def bump(self, session_id: str) -> int:
+        version = self._versions.pop(session_id, self._floor) + 1
+        self._versions[session_id] = version
+        while len(self._versions) > self.max_keys:
+            _, evicted = self._versions.popitem(last=False)
+            self._floor = max(self._floor, evicted + 1)
+        return version
+
+
+class RedisVersionStore(IVersionStore):
+    """Redis 版本号（多 worker 共享；读写均续期 TTL，需 Redis 6.2+ 的 GETEX）"""
+
+    def __init__(
+        self, url: str, prefix: str = "cxygpt:session_version:", ttl_seconds: float = 3600
+    ):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._prefix = prefix
+        # 不短于缓存条目 TTL：键过期时，读到过它的缓存条目也已过期
+        self._ttl = max(1, math.ceil(ttl_seconds))
+
+    async def get(self, session_id: str) -> int:
+        value = await self._redis.getex(self._prefix + session_id, ex=self._ttl)
+        return int(value) if value else 0
+
+    async def bump(self, session_id: str) -> int:
+        key = self._prefix + session_id
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.incr(key)
+            pipe.expire(key, self._ttl)
+            version, _ = await pipe.execute()
+        return version
+
+
+@dataclass
+class _CachedSession:
+    """缓存条目"""
+
+    version: int
+    header: ChatSession  # 不含消息的会话头
+    expires_at: float  # 过期时刻（单调时钟）
+    window: deque[Message] | None = None  # 最近消息窗口（None = 未加载）
+    covered: float = 0  # token 预算不超过该值时，窗口可直接回答
+
+
+class SessionCache:
+    """有界 LRU 会话缓存"""
+
+    def __init__(
+        self,
+        version_store: IVersionStore,
+        max_sessions: int = 1024,
+        window_size: int = 64,
+        ttl_seconds: float = 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.version_store = version_store
+        self.max_sessions = max_sessions
+        self.window_size = window_size
+        self.ttl = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[str, _CachedSession] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def lookup(self, session_id: str) -> tuple[int, _CachedSession | None]:
+        """返回 (当前版本号, 版本一致的缓存条目)"""
+        version = await self.version_store.get(session_id)
+        entry = self._entries.get(session_id)
+        if entry is None:
+            return version, None
+        if entry.version != version or entry.expires_at <= self._clock():
+            del self._entries[session_id]
+            return version, None
+        self._entries.move_to_end(session_id)
+        return version, entry
+
+    def put_header(self, session_id: str, version: int, header: ChatSession):
+        """缓存会话头"""
+        self._entries[session_id] = _CachedSession(
+            version=version,
+            header=replace(header, messages=[]),
+            expires_at=self._clock() + self.ttl,
+        )
+        self._entries.move_to_end(session_id)
+        while len(self._entries) > self.max_sessions:
+            self._entries.popitem(last=False)
+
+    def put_window(
+        self, entry: _CachedSession, version: int, messages: list[Message], max_tokens: int
+    ):
+        """缓存按 max_tokens 加载的上下文窗口（version 为发起加载时的版本号）"""
+        if entry.version != version:
+            # 加载期间有追加写入，读到的窗口可能缺少新消息，不回填
+            return
+        kept = messages[-self.window_size :]
+        entry.window = deque(kept, maxlen=self.window_size)
+        kept_tokens = sum(m.tokens for m in kept)
+        if len(kept) < len(messages):
+            entry.covered = kept_tokens - 1
+        elif kept_tokens == entry.header.total_tokens:
+            entry.covered = math.inf  # 窗口即完整历史
+        else:
+            entry.covered = max_tokens
+
+    async def apply_append(self, message: Message):
+        """写路径：消息已落库后更新缓存并递增版本"""
+        version = await self.version_store.bump(message.session_id)
+        entry = self._entries.get(message.session_id)
+        if entry is None:
+            return
+        if entry.version != version - 1:
+            # 期间有其他 worker 写入，缓存内容不可信
+            del self._entries[message.session_id]
+            return
+
+        entry.version = version
+        entry.header.total_tokens += message.tokens
+        entry.header.updated_at = datetime.utcnow()
+        if entry.window is not None:
+            if len(entry.window) == entry.window.maxlen:
+                entry.window.append(message)  # 最旧的消息被挤出
+                entry.covered = sum(m.tokens for m in entry.window) - 1
+            else:
+                entry.window.append(message)
+                entry.covered += message.tokens
+
+    async def invalidate(self, session_id: str):
+        """写路径：无法增量更新时直接失效"""
+        await self.version_store.bump(session_id)
+        self._entries.pop(session_id, None)
+
+
+class CachedChatSessionRepository(IChatSessionRepository):
+    """带缓存的会话仓储"""
+
+    def __init__(
+        self, inner: IChatSessionRepository, cache: SessionCache, defer_writes: bool = False
+    ):
+        self.inner = inner
+        self.cache = cache
+        # 工作单元模式下，缓存更新推迟到提交之后
+        self.defer_writes = defer_writes
+        self._pending: list[Message] = []
+
+    async def get_by_id(self, session_id: str, with_messages: bool = True) -> ChatSession | None:
+        if with_messages:
+            # 完整历史不缓存
+            return await self.inner.get_by_id(session_id, with_messages=True)
+
+        version, entry = await self.cache.lookup(session_id)
+        if entry is None:
+            header = await self.inner.get_by_id(session_id, with_messages=False)
+            if header is None:
+                return None
+            self.cache.put_header(session_id, version, header)
+            return header
+
+        return replace(entry.header, messages=[])
+
+    async def get_by_owner(self, owner_id: str) -> list[ChatSession]:
+        return await self.inner.get_by_owner(owner_id)
+
+    async def get_context_window(self, session_id: str, max_tokens: int) -> list[Message]:
+        version, entry = await self.cache.lookup(session_id)
+        if entry is None:
+            return await self.inner.get_context_window(session_id, max_tokens)
+
+        if entry.window is not None and max_tokens <= entry.covered:
+            selected: list[Message] = []
+            total = 0
+            for msg in reversed(entry.window):
+                if total + msg.tokens > max_tokens:
+                    break
+                selected.append(msg)
+                total += msg.tokens
+            selected.reverse()
+            return selected
+
+        messages = await self.inner.get_context_window(session_id, max_tokens)
+        self.cache.put_window(entry, version, messages, max_tokens)
+        return messages
+
+    async def append_message(self, message: Message) -> None:
+        await self.inner.append_message(message)
+        if self.defer_writes:
+            self._pending.append(message)
+        else:
+            await self.cache.apply_append(message)
+
+    async def save(self, session: ChatSession) -> ChatSession:
+        saved = await self.inner.save(session)
+        await self.cache.invalidate(session.id)
+        return saved
+
+    async def delete(self, session_id: str) -> bool:
+        deleted = await self.inner.delete(session_id)
+        await self.cache.invalidate(session_id)
+        return deleted
+
+    async def apply_pending(self):
+        """提交后应用推迟的缓存更新"""
+        pending, self._pending = self._pending, []
+        for message in pending:
+            await self.cache.apply_append(message)
+
+    def discard_pending(self):
+        """回滚后丢弃推迟的缓存更新"""
+        self._pending = []
+
+
+class CachedMessageRepository(IMessageRepository):
+    """带缓存的消息仓储"""
+
+    def __init__(self, inner: IMessageRepository, cache: SessionCache):
+        self.inner = inner
+        self.cache = cache
+
+    async def get_by_session(self, session_id: str, limit: int = 100) -> list[Message]:
+        _, entry = await self.cache.lookup(session_id)
+        if (
+            entry is not None
+            and entry.window is not None
+            and (len(entry.window) >= limit or entry.covered == math.inf)
+        ):
+            return list(entry.window)[-limit:]
+        return await self.inner.get_by_session(session_id, limit)
+
+    async def save(self, message: Message) -> Message:
+        saved = await self.inner.save(message)
+        # 单独保存消息不更新会话计数器，直接失效
+        await self.cache.invalidate(message.session_id)
+        return saved
+
+
+class CachedUnitOfWork(IUnitOfWork):
+    """带缓存的工作单元：提交成功后才更新缓存"""
+
+    def __init__(self, inner: IUnitOfWork, cache: SessionCache):
+        self.inner = inner
+        self.sessions = CachedChatSessionRepository(inner.sessions, cache, defer_writes=True)
+        self.messages = CachedMessageRepository(inner.messages, cache)
+
+    async def commit(self) -> None:
+        await self.inner.commit()
+        await self.sessions.apply_pending()
+
+    async def rollback(self) -> None:
+        await self.inner.rollback()
+        self.sessions.discard_pending()
+
+
+class CachedPersistenceQueue(IPersistenceQueue):
+    """带缓存的 write-behind 队列：入队即更新本进程缓存"""
+
+    def __init__(self, inner: IPersistenceQueue, cache: SessionCache):
+        self.inner = inner
+        self.cache = cache
+
+    async def enqueue_message(self, message: Message) -> None:
+        await self.inner.enqueue_message(message)
+        await self.cache.apply_append(message)
+
+    async def enqueue_session_update(
+        self, session_id: str, tokens_delta: int, updated_at: datetime
+    ) -> None:
+        # 计数器已随 apply_append 更新
+        await self.inner.enqueue_session_update(session_id, tokens_delta, updated_at)
+
+
+# 进程级单例
+_cache: SessionCache | None = None
+
+
+def get_session_cache() -> SessionCache | None:
+    """获取会话缓存（SESSION_CACHE_SIZE=0 时为 None）"""
+    global _cache
+
+    if settings.SESSION_CACHE_SIZE <= 0:
+        return None
+
+    if _cache is None:
+        if settings.REDIS_URL:
+            version_store = RedisVersionStore(
+                settings.REDIS_URL, ttl_seconds=settings.SESSION_CACHE_TTL
+            )
+        else:
+            # 版本号保留数为缓存容量的数倍：回源加载中的未缓存会话也能检测到并发写入
+            version_store = LocalVersionStore(max_keys=settings.SESSION_CACHE_SIZE * 4)
+        _cache = SessionCache(
+            version_store,
+            max_sessions=settings.SESSION_CACHE_SIZE,
+            window_size=settings.SESSION_CACHE_WINDOW,
+            ttl_seconds=settings.SESSION_CACHE_TTL,
+        )
+    return _cache
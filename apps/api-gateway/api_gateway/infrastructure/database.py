@@ -1,43 +1,203 @@
 """
 数据库配置 - MySQL 优化版本
+
+连接池参数来自配置（档位 gateway 段的 DB_POOL_*），池上挂有计数器，
+用于观察排队等待、溢出连接与失效次数，据此规划 MySQL max_connections。
 """
 
+import time
+from typing import Any
+
+from sqlalchemy import event, exc
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from ..config import settings
+from ..utils.tracing import trace_engine
 
 # 创建基类
 Base = declarative_base()
 
-# MySQL 配置（生产级连接池）
-if "mysql" in settings.DATABASE_URL.lower():
-    engine = create_async_engine(
-        settings.DATABASE_URL,
-        echo=settings.LOG_LEVEL == "DEBUG",
-        pool_pre_ping=True,  # 连接检活
-        pool_size=20,  # 连接池大小
-        max_overflow=40,  # 额外连接数
-        pool_recycle=3600,  # 连接回收时间（1小时）
-        pool_timeout=30,  # 获取连接超时
-    )
-# SQLite 配置（开发环境）
-elif "sqlite" in settings.DATABASE_URL.lower():
-    engine = create_async_engine(
-        settings.DATABASE_URL,
-        echo=settings.LOG_LEVEL == "DEBUG",
-        connect_args={"check_same_thread": False},
-    )
-# PostgreSQL 配置
-else:
-    database_url = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
-    engine = create_async_engine(
-        database_url,
-        echo=settings.LOG_LEVEL == "DEBUG",
-        pool_pre_ping=True,
-        pool_size=20,
-        max_overflow=40,
-    )
+
+class PoolMetrics:
+    """连接池计数器"""
+
+    # 获取连接耗时分桶上界（毫秒）
+    WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+    def __init__(self):
+        self.connects = 0  # 新建物理连接
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0  # 连接失效（检活失败、断线等）
+        self.timeouts = 0  # 等待空闲连接超时
+        self.checked_out_peak = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(self.WAIT_BUCKETS_MS) + 1)
+
+    @property
+    def checked_out(self) -> int:
+        return self.checkouts - self.checkins
+
+    def observe_wait(self, seconds: float):
+        """记录一次获取连接的耗时"""
+        self.wait_count += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        ms = seconds * 1000
+        for i, bound in enumerate(self.WAIT_BUCKETS_MS):
+            if ms <= bound:
+                self.wait_buckets[i] += 1
+                return
+        self.wait_buckets[-1] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        """导出为可 JSON 序列化的字典"""
+        bounds = [f"le_{b}ms" for b in self.WAIT_BUCKETS_MS]
+        bounds.append(f"gt_{self.WAIT_BUCKETS_MS[-1]}ms")
+        return {
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checked_out": self.checked_out,
+            "checked_out_peak": self.checked_out_peak,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "wait": {
+                "count": self.wait_count,
+                "avg_ms": self.wait_total / self.wait_count * 1000 if self.wait_count else 0.0,
+                "max_ms": self.wait_max * 1000,
+                "buckets": dict(zip(bounds, self.wait_buckets, strict=True)),
+            },
+        }
+
+
+pool_metrics = PoolMetrics()
+replica_pool_metrics = PoolMetrics()
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """记录获取连接耗时（含排队与新建连接）的异步队列池"""
+
+    metrics = pool_metrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.observe_wait(time.perf_counter() - start)
+
+
+class InstrumentedReplicaPool(InstrumentedAsyncPool):
+    """只读副本连接池（单独计数）"""
+
+    metrics = replica_pool_metrics
+
+
+def instrument_engine(engine, metrics: PoolMetrics = pool_metrics):
+    """为引擎的连接池挂载计数事件"""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.connects += 1
+
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.checkouts += 1
+        metrics.checked_out_peak = max(metrics.checked_out_peak, metrics.checked_out)
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        metrics.checkins += 1
+
+    @event.listens_for(sync_engine, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.invalidations += 1
+
+
+def pool_options(poolclass: type[InstrumentedAsyncPool] = InstrumentedAsyncPool) -> dict[str, Any]:
+    """MySQL / PostgreSQL 连接池参数"""
+    return {
+        "poolclass": poolclass,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,  # 连接检活
+        "pool_size": settings.DB_POOL_SIZE,  # 连接池大小
+        "max_overflow": settings.DB_MAX_OVERFLOW,  # 额外连接数
+        "pool_recycle": settings.DB_POOL_RECYCLE,  # 连接回收时间
+        "pool_timeout": settings.DB_POOL_TIMEOUT,  # 获取连接超时
+    }
+
+
+def create_engine_for(url: str, poolclass: type[InstrumentedAsyncPool] = InstrumentedAsyncPool):
+    """按数据库类型创建引擎并挂载连接池计数"""
+    # MySQL 配置（生产级连接池）
+    if "mysql" in url.lower():
+        new_engine = create_async_engine(
+            url,
+            echo=settings.LOG_LEVEL == "DEBUG",
+            **pool_options(poolclass),
+        )
+    # SQLite 配置（开发环境）
+    elif "sqlite" in url.lower():
+        new_engine = create_async_engine(
+            url,
+            echo=settings.LOG_LEVEL == "DEBUG",
+            connect_args={"check_same_thread": False},
+        )
+    # PostgreSQL 配置
+    else:
+        new_engine = create_async_engine(
+            url.replace("postgresql://", "postgresql+asyncpg://"),
+            echo=settings.LOG_LEVEL == "DEBUG",
+            **pool_options(poolclass),
+        )
+
+    instrument_engine(new_engine, poolclass.metrics)
+    trace_engine(new_engine, "replica" if poolclass is InstrumentedReplicaPool else "primary")
+    return new_engine
+
+
+engine = create_engine_for(settings.DATABASE_URL)
+
+# 只读副本（可选）：列表类查询走副本，写入与会话内读取仍在主库
+replica_engine = (
+    create_engine_for(settings.DATABASE_REPLICA_URL, InstrumentedReplicaPool)
+    if settings.DATABASE_REPLICA_URL
+    else None
+)
+
+
+def _pool_status(target_engine, metrics: PoolMetrics) -> dict[str, Any]:
+    pool = target_engine.pool
+    status: dict[str, Any] = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            {
+                "size": pool.size(),
+                "max_overflow": settings.DB_MAX_OVERFLOW,
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                # 负数表示常驻连接尚未全部建立
+                "overflow": pool.overflow(),
+            }
+        )
+    status["metrics"] = metrics.snapshot()
+    return status
+
+
+def get_pool_status() -> dict[str, Any]:
+    """连接池当前状态与累计计数（配置了副本时附带副本连接池）"""
+    status = _pool_status(engine, pool_metrics)
+    if replica_engine is not None:
+        status["replica"] = _pool_status(replica_engine, replica_pool_metrics)
+    return status
+
 
 # 创建会话工厂
 AsyncSessionLocal = async_sessionmaker(
@@ -45,6 +205,11 @@ AsyncSessionLocal = async_sessionmaker(
     class_=AsyncSession,
     expire_on_commit=False,
 )
+ReplicaSessionLocal = (
+    async_sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False)
+    if replica_engine is not None
+    else None
+)
 
 
 async def get_db() -> AsyncSession:
@@ -56,6 +221,18 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+async def get_read_db() -> AsyncSession | None:
+    """获取只读副本会话（未配置副本时为 None）"""
+    if ReplicaSessionLocal is None:
+        yield None
+        return
+    async with ReplicaSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
 async def init_db():
     """初始化数据库"""
     async with engine.begin() as conn:
@@ -65,3 +242,5 @@ async def init_db():
 async def close_db():
     """关闭数据库连接"""
     await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
@@ -49,3 +49,7 @@ class ILLMClient(ABC):
             完整的生成文本
         """
         pass
+
+    async def aclose(self) -> None:
+        """释放连接等资源（默认无操作）"""
+        return None
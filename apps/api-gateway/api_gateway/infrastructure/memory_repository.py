@@ -1,46 +1,162 @@
 """
 基础设施层 - 内存仓储实现（用于开发和测试）
+
+带二级索引（owner → 会话、username → 用户），查询不随数据量线性增长；
+可选的会话数 LRU 淘汰与每会话消息数上限，便于以内存后端代替数据库做大规模压测。
+消息只随会话历史保存一份，消息仓储可直接读取会话仓储中的历史。
 """
 
-from ..domain.entities import ChatSession, Message, User
-from ..domain.repositories import IChatSessionRepository, IMessageRepository, IUserRepository
+from collections import OrderedDict, deque
+from collections.abc import MutableSequence
+from dataclasses import replace
+from itertools import islice
+
+from ..domain.entities import ChatSession, Message, MessageHistory, User
+from ..domain.repositories import (
+    IChatSessionRepository,
+    IMessageRepository,
+    IUnitOfWork,
+    IUserRepository,
+)
 
 
 class InMemoryChatSessionRepository(IChatSessionRepository):
     """内存会话仓储"""
 
-    def __init__(self):
-        self._storage: dict[str, ChatSession] = {}
-
-    async def get_by_id(self, session_id: str) -> ChatSession | None:
-        return self._storage.get(session_id)
+    def __init__(
+        self,
+        compact_history: bool = False,
+        max_sessions: int = 0,
+        max_messages: int = 0,
+    ):
+        # 按最近访问排序，超过 max_sessions（> 0）时淘汰最久未访问的会话
+        self._storage: OrderedDict[str, ChatSession] = OrderedDict()
+        # owner → 会话 ID，按最近写入排序（即 updated_at 升序）
+        self._by_owner: dict[str | None, OrderedDict[str, None]] = {}
+        # 可选：会话历史以列式 MessageHistory 保存，长会话更省内存（不截断）
+        self._compact_history = compact_history
+        self.max_sessions = max_sessions
+        # 每个会话保留的最近消息数（0 = 不限）；total_tokens 仍按完整历史累计
+        self.max_messages = max_messages
+
+    async def get_by_id(self, session_id: str, with_messages: bool = True) -> ChatSession | None:
+        session = self._storage.get(session_id)
+        if session is None:
+            return None
+        self._storage.move_to_end(session_id)
+        if with_messages:
+            return session
+        # 返回不含消息的副本，避免调用方改动存储中的实体
+        return replace(session, messages=[])
 
     async def get_by_owner(self, owner_id: str) -> list[ChatSession]:
-        return [session for session in self._storage.values() if session.owner_id == owner_id]
+        session_ids = self._by_owner.get(owner_id)
+        if not session_ids:
+            return []
+        return [self._storage[session_id] for session_id in reversed(session_ids)]
+
+    async def get_context_window(self, session_id: str, max_tokens: int) -> list[Message]:
+        session = self._storage.get(session_id)
+        if session is None or max_tokens <= 0:
+            return []
+        return session.get_context_messages(max_tokens)
+
+    async def append_message(self, message: Message) -> None:
+        session = self._storage.get(message.session_id)
+        if session is not None:
+            session.add_message(message)
+            self._touch(session)
 
     async def save(self, session: ChatSession) -> ChatSession:
+        if self._compact_history:
+            if not isinstance(session.messages, MessageHistory):
+                session.messages = MessageHistory(session.id, session.messages)
+        elif self.max_messages > 0 and not isinstance(session.messages, deque):
+            session.messages = deque(session.messages, maxlen=self.max_messages)
+
+        previous = self._storage.get(session.id)
+        if previous is not None and previous.owner_id != session.owner_id:
+            self._unindex(previous)
         self._storage[session.id] = session
+        self._touch(session)
+
+        while self.max_sessions > 0 and len(self._storage) > self.max_sessions:
+            _, evicted = self._storage.popitem(last=False)
+            self._unindex(evicted)
         return session
 
     async def delete(self, session_id: str) -> bool:
-        if session_id in self._storage:
-            del self._storage[session_id]
-            return True
-        return False
+        session = self._storage.pop(session_id, None)
+        if session is None:
+            return False
+        self._unindex(session)
+        return True
+
+    def history(self, session_id: str) -> MutableSequence[Message] | MessageHistory | None:
+        """会话的消息历史（不改变 LRU 顺序；会话不存在时为 None）"""
+        session = self._storage.get(session_id)
+        return None if session is None else session.messages
+
+    def _touch(self, session: ChatSession):
+        """标记会话最近被写入"""
+        self._storage.move_to_end(session.id)
+        owned = self._by_owner.setdefault(session.owner_id, OrderedDict())
+        owned[session.id] = None
+        owned.move_to_end(session.id)
+
+    def _unindex(self, session: ChatSession):
+        owned = self._by_owner.get(session.owner_id)
+        if owned is not None:
+            owned.pop(session.id, None)
+            if not owned:
+                del self._by_owner[session.owner_id]
 
 
 class InMemoryMessageRepository(IMessageRepository):
     """内存消息仓储"""
 
-    def __init__(self):
-        self._storage: dict[str, list[Message]] = {}
+    def __init__(
+        self,
+        max_sessions: int = 0,
+        max_messages: int = 0,
+        sessions: InMemoryChatSessionRepository | None = None,
+    ):
+        # 可选：以会话仓储中的会话历史为唯一存储（上限由会话仓储决定，不再另存一份）
+        self._sessions = sessions
+        # 按最近写入排序，超过 max_sessions（> 0）时淘汰最久未写入会话的消息
+        self._storage: OrderedDict[str, deque[Message]] = OrderedDict()
+        self.max_sessions = max_sessions
+        # 每个会话保留的最近消息数（0 = 不限）
+        self.max_messages = max_messages
 
     async def get_by_session(self, session_id: str, limit: int = 100) -> list[Message]:
-        messages = self._storage.get(session_id, [])
-        return messages[-limit:]
+        if self._sessions is not None:
+            messages = self._sessions.history(session_id)
+        else:
+            messages = self._storage.get(session_id)
+        if not messages:
+            return []
+        # 从尾部取 limit 条，不复制整个历史
+        recent = list(islice(reversed(messages), limit))
+        recent.reverse()
+        return recent
 
     async def save(self, message: Message) -> Message:
-        session_messages = self._storage.setdefault(message.session_id, [])
+        if self._sessions is not None:
+            # 与数据库一致：单独保存消息不更新会话计数器；会话不存在时丢弃
+            history = self._sessions.history(message.session_id)
+            if history is not None:
+                history.append(message)
+            return message
+
+        session_messages = self._storage.get(message.session_id)
+        if session_messages is None:
+            session_messages = deque(maxlen=self.max_messages or None)
+            self._storage[message.session_id] = session_messages
+            while self.max_sessions > 0 and len(self._storage) > self.max_sessions:
+                self._storage.popitem(last=False)
+        else:
+            self._storage.move_to_end(message.session_id)
         session_messages.append(message)
         return message
 
@@ -50,16 +166,36 @@ class InMemoryUserRepository(IUserRepository):
 
     def __init__(self):
         self._storage: dict[str, User] = {}
+        self._by_username: dict[str, str] = {}  # username → user_id
 
     async def get_by_id(self, user_id: str) -> User | None:
         return self._storage.get(user_id)
 
     async def get_by_username(self, username: str) -> User | None:
-        for user in self._storage.values():
-            if user.username == username:
-                return user
-        return None
+        user = self._storage.get(self._by_username.get(username, ""))
+        # 实体被原地改名时索引可能过期，以实体当前值为准
+        return user if user is not None and user.username == username else None
 
     async def save(self, user: User) -> User:
+        previous = self._storage.get(user.id)
+        if previous is not None and previous.username != user.username:
+            self._by_username.pop(previous.username, None)
         self._storage[user.id] = user
+        self._by_username[user.username] = user.id
         return user
+
+
+class InMemoryUnitOfWork(IUnitOfWork):
+    """内存工作单元（写入立即生效，不支持回滚）"""
+
+    def __init__(
+        self, sessions: InMemoryChatSessionRepository, messages: InMemoryMessageRepository
+    ):
+        self.sessions = sessions
+        self.messages = messages
+
+    async def commit(self) -> None:
+        pass
+
+    async def rollback(self) -> None:
+        pass
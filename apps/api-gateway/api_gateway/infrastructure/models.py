@@ -3,17 +3,51 @@ SQLAlchemy ORM 模型 - MySQL 优化版本
 """
 
 import enum
+import threading
 import uuid
+import zlib
 from datetime import datetime
-
-from sqlalchemy import BINARY, Boolean, Column, DateTime, ForeignKey, Integer, String, Text
+from functools import lru_cache
+
+from sqlalchemy import (
+    BINARY,
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+)
 from sqlalchemy import Enum as SQLEnum
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import relationship
 from sqlalchemy.types import JSON, TypeDecorator
 
+from ..config import settings
+from ..utils.ids import new_id
 from .database import Base
 
 
+@lru_cache(maxsize=65536)
+def uuid_str_to_bytes(value: str) -> bytes:
+    """UUID 字符串 → 16 字节（带缓存，重复的 session_id / owner_id 直接命中）"""
+    raw = bytes.fromhex(value.replace("-", "")) if len(value) == 36 else b""
+    if len(raw) != 16:
+        # 非标准写法（大括号、urn: 前缀等）交给 uuid 模块解析与校验
+        raw = uuid.UUID(value).bytes
+    return raw
+
+
+@lru_cache(maxsize=65536)
+def uuid_bytes_to_str(value: bytes) -> str:
+    """16 字节 → UUID 字符串（带缓存，且同一 ID 复用同一个 str 对象）"""
+    h = value.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
 class UUIDBinary(TypeDecorator):
     """使用 BINARY(16) 存储 UUID，MySQL 最优方案"""
 
@@ -25,7 +59,7 @@ class UUIDBinary(TypeDecorator):
         if value is None:
             return value
         if isinstance(value, str):
-            return uuid.UUID(value).bytes
+            return uuid_str_to_bytes(value)
         if isinstance(value, uuid.UUID):
             return value.bytes
         return value
@@ -34,7 +68,92 @@ class UUIDBinary(TypeDecorator):
         """读取时：将 bytes 转为 UUID 字符串"""
         if value is None:
             return value
-        return str(uuid.UUID(bytes=value))
+        return uuid_bytes_to_str(bytes(value))
+
+
+# 压缩格式标记（首字节）。0xF8-0xFF 不会出现在合法 UTF-8 中，
+# 无标记的数据即迁移前的原始 UTF-8 文本，无需重写旧数据
+_RAW = 0xFC
+_ZSTD = 0xFD
+_ZLIB = 0xFE
+
+
+@lru_cache(maxsize=1)
+def _zstd():
+    """zstandard 为可选依赖，未安装时回退 zlib"""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+# 复用 zstd 压缩/解压上下文（构造开销约为 1KB 文本压缩本身的数倍）；实例不可跨线程共享
+_zstd_local = threading.local()
+
+
+def _zstd_codec():
+    codec = getattr(_zstd_local, "codec", None)
+    if codec is None:
+        zstd = _zstd()
+        codec = _zstd_local.codec = (zstd.ZstdCompressor(level=3), zstd.ZstdDecompressor())
+    return codec
+
+
+def has_format_marker(value: bytes) -> bool:
+    """是否为带格式标记的数据（否则为迁移前的原始 UTF-8）"""
+    return bool(value) and value[0] in (_RAW, _ZSTD, _ZLIB)
+
+
+def compress_text(value: str, algorithm: str = "auto", min_bytes: int = 512) -> bytes:
+    """文本 → 带格式标记的字节串；过短或压缩无收益时原样存储"""
+    raw = value.encode("utf-8")
+    if algorithm == "none" or len(raw) < min_bytes:
+        return bytes((_RAW,)) + raw
+
+    if algorithm in ("auto", "zstd") and _zstd() is not None:
+        marker, packed = _ZSTD, _zstd_codec()[0].compress(raw)
+    else:
+        marker, packed = _ZLIB, zlib.compress(raw, 6)
+    if len(packed) + 1 >= len(raw):
+        return bytes((_RAW,)) + raw
+    return bytes((marker,)) + packed
+
+
+def decompress_text(value: bytes) -> str:
+    """带格式标记的字节串 → 文本（兼容无标记的旧数据）"""
+    marker = value[0] if value else None
+    if marker == _RAW:
+        return value[1:].decode("utf-8")
+    if marker == _ZLIB:
+        return zlib.decompress(value[1:]).decode("utf-8")
+    if marker == _ZSTD:
+        if _zstd() is None:
+            raise RuntimeError("zstd-compressed content requires the zstandard package")
+        return _zstd_codec()[1].decompress(value[1:]).decode("utf-8")
+    return value.decode("utf-8")
+
+
+class CompressedText(TypeDecorator):
+    """透明压缩的长文本列（MySQL LONGBLOB / PostgreSQL BYTEA），按首字节标记解压"""
+
+    impl = LargeBinary().with_variant(mysql.LONGBLOB(), "mysql")
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return value
+        return compress_text(
+            value, settings.CONTENT_COMPRESSION, settings.CONTENT_COMPRESSION_MIN_BYTES
+        )
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return value
+        if isinstance(value, str):
+            # 尚未迁移为二进制列的库
+            return value
+        return decompress_text(bytes(value))
 
 
 class MessageRoleEnum(str, enum.Enum):
@@ -50,7 +169,7 @@ class UserModel(Base):
 
     __tablename__ = "users"
 
-    id = Column(UUIDBinary, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(UUIDBinary, primary_key=True, default=new_id)
     username = Column(String(50), unique=True, nullable=False, index=True)
     email = Column(String(255), unique=True, nullable=False, index=True)
     hashed_password = Column(String(255), nullable=False)
@@ -72,7 +191,7 @@ class DepartmentModel(Base):
 
     __tablename__ = "departments"
 
-    id = Column(UUIDBinary, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(UUIDBinary, primary_key=True, default=new_id)
     name = Column(String(100), nullable=False)
     description = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -87,7 +206,7 @@ class ChatSessionModel(Base):
 
     __tablename__ = "chat_sessions"
 
-    id = Column(UUIDBinary, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(UUIDBinary, primary_key=True, default=new_id)
     owner_id = Column(
         UUIDBinary, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
     )
@@ -116,16 +235,19 @@ class MessageModel(Base):
     """消息表"""
 
     __tablename__ = "messages"
+    __table_args__ = (
+        # 历史查询按 session_id 过滤、按 created_at 排序，复合索引一次定位并有序扫描
+        Index("ix_messages_session_id_created_at", "session_id", "created_at"),
+    )
 
-    id = Column(UUIDBinary, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(UUIDBinary, primary_key=True, default=new_id)
     session_id = Column(
         UUIDBinary,
         ForeignKey("chat_sessions.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
     role = Column(SQLEnum(MessageRoleEnum), nullable=False)
-    content = Column(Text, nullable=False)
+    content = Column(CompressedText, nullable=False)
     tokens = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
@@ -133,18 +255,35 @@ class MessageModel(Base):
     session = relationship("ChatSessionModel", back_populates="messages")
 
 
+class MessageArchiveModel(Base):
+    """冷会话消息归档表（每个会话一行，消息压缩存储）"""
+
+    __tablename__ = "message_archives"
+
+    session_id = Column(
+        UUIDBinary, ForeignKey("chat_sessions.id", ondelete="CASCADE"), primary_key=True
+    )
+    message_count = Column(Integer, nullable=False)
+    total_tokens = Column(Integer, nullable=False, default=0)
+    first_message_at = Column(DateTime, nullable=False)
+    last_message_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    # zlib 压缩的 JSON 消息列表；MySQL BLOB 上限 64KB，需 LONGBLOB
+    payload = Column(LargeBinary().with_variant(mysql.LONGBLOB(), "mysql"), nullable=False)
+
+
 class DocumentModel(Base):
     """文档表"""
 
     __tablename__ = "documents"
 
-    id = Column(UUIDBinary, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(UUIDBinary, primary_key=True, default=new_id)
     owner_id = Column(
         UUIDBinary, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
     )
     department_id = Column(UUIDBinary, ForeignKey("departments.id", ondelete="SET NULL"))
     title = Column(String(200), nullable=False)
-    content = Column(Text, nullable=False)
+    content = Column(CompressedText, nullable=False)
     file_path = Column(String(500))
     is_public = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -166,7 +305,7 @@ class VectorIndexMetaModel(Base):
 
     __tablename__ = "vector_index_meta"
 
-    id = Column(UUIDBinary, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(UUIDBinary, primary_key=True, default=new_id)
     document_id = Column(
         UUIDBinary,
         ForeignKey("documents.id", ondelete="CASCADE"),
@@ -189,7 +328,7 @@ class AuditLogModel(Base):
 
     __tablename__ = "audit_logs"
 
-    id = Column(UUIDBinary, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(UUIDBinary, primary_key=True, default=new_id)
     user_id = Column(UUIDBinary, ForeignKey("users.id", ondelete="SET NULL"), index=True)
     action = Column(String(50), nullable=False)
     resource = Column(String(100), nullable=False)
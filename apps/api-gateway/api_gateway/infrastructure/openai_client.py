@@ -19,6 +19,20 @@ class OpenAICompatibleClient(ILLMClient):
 
     def __init__(self, base_url: str = None):
         self.base_url = base_url or settings.UPSTREAM_OPENAI_BASE
+        self._client: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """共享 HTTP 客户端（复用连接池，首次使用时创建）"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=settings.TIMEOUT_TOTAL)
+        return self._client
+
+    async def aclose(self) -> None:
+        """关闭共享 HTTP 客户端"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     async def chat_completion_stream(
         self,
@@ -40,10 +54,7 @@ class OpenAICompatibleClient(ILLMClient):
             "top_p": top_p,
         }
 
-        async with (
-            httpx.AsyncClient(timeout=settings.TIMEOUT_TOTAL) as client,
-            client.stream("POST", url, json=payload) as response,
-        ):
+        async with self.client.stream("POST", url, json=payload) as response:
             if response.status_code != 200:
                 error_text = await response.aread()
                 logger.error(f"LLM API error: {response.status_code} {error_text}")
@@ -87,15 +98,14 @@ class OpenAICompatibleClient(ILLMClient):
             "top_p": top_p,
         }
 
-        async with httpx.AsyncClient(timeout=settings.TIMEOUT_TOTAL) as client:
-            response = await client.post(url, json=payload)
+        response = await self.client.post(url, json=payload)
 
-            if response.status_code != 200:
-                logger.error(f"LLM API error: {response.status_code}")
-                raise Exception(f"LLM API error: {response.status_code}")
+        if response.status_code != 200:
+            logger.error(f"LLM API error: {response.status_code}")
+            raise Exception(f"LLM API error: {response.status_code}")
 
-            data = response.json()
-            return data.get("choices", [{}])[0].get("message", {}).get("content", "")
+        data = response.json()
+        return data.get("choices", [{}])[0].get("message", {}).get("content", "")
 
 
 class MockLLMClient(ILLMClient):
@@ -0,0 +1,189 @@
+"""
+基础设施层 - messages 表按月分区维护
+
+MySQL 使用 PARTITION BY RANGE COLUMNS(created_at)（分区名 pYYYYMM，兜底分区 pmax），
+PostgreSQL 使用声明式分区（子表 messages_pYYYYMM，兜底子表 messages_pdefault）。
+分区表的转换由 Alembic 迁移 5b8d2f3c1e42 完成；这里提供 DDL 生成与滚动维护：
+提前创建未来月份的分区、删除已被归档清空的旧分区。未分区或其他方言上均为空操作。
+
+函数接收同步 Connection，异步代码中通过 conn.run_sync() 调用。
+"""
+
+import re
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+TABLE = "messages"
+MYSQL_MAX_PARTITION = "pmax"
+PG_DEFAULT_PARTITION = f"{TABLE}_pdefault"
+
+_MONTH_NAME = re.compile(r"p(\d{4})(\d{2})$")
+
+
+def month_start(value: date) -> date:
+    """所在月的第一天"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    """月初日期加减若干月"""
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_range(first: date, last: date) -> list[date]:
+    """[first, last] 覆盖的所有月份（月初）"""
+    months = []
+    current = month_start(first)
+    while current <= month_start(last):
+        months.append(current)
+        current = add_months(current, 1)
+    return months
+
+
+def partition_name(month: date) -> str:
+    return f"p{month:%Y%m}"
+
+
+def _parse_month(name: str) -> date | None:
+    match = _MONTH_NAME.search(name)
+    return date(int(match[1]), int(match[2]), 1) if match else None
+
+
+# ========================
+# DDL 生成
+# ========================
+
+
+def mysql_partition_definitions(months: list[date]) -> str:
+    """MySQL 分区定义列表（含兜底分区）"""
+    parts = [
+        f"PARTITION {partition_name(m)} VALUES LESS THAN ('{add_months(m, 1).isoformat()}')"
+        for m in months
+    ]
+    parts.append(f"PARTITION {MYSQL_MAX_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    return ",\n    ".join(parts)
+
+
+def postgres_partition_ddl(month: date) -> str:
+    """PostgreSQL 月分区子表 DDL"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {TABLE}_{partition_name(month)} PARTITION OF {TABLE} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+# ========================
+# 状态查询
+# ========================
+
+
+def is_partitioned(conn: Connection) -> bool:
+    """messages 是否已是分区表"""
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        return bool(
+            conn.execute(
+                text(
+                    "SELECT 1 FROM information_schema.PARTITIONS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table "
+                    "AND PARTITION_NAME IS NOT NULL LIMIT 1"
+                ),
+                {"table": TABLE},
+            ).first()
+        )
+    if dialect == "postgresql":
+        return bool(
+            conn.execute(
+                text(
+                    "SELECT 1 FROM pg_partitioned_table pt "
+                    "JOIN pg_class c ON c.oid = pt.partrelid "
+                    "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+                ),
+                {"table": TABLE},
+            ).first()
+        )
+    return False
+
+
+def list_partitions(conn: Connection) -> list[date]:
+    """已有的月分区（升序）"""
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        names = conn.execute(
+            text(
+                "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table "
+                "AND PARTITION_NAME IS NOT NULL"
+            ),
+            {"table": TABLE},
+        ).scalars()
+    elif dialect == "postgresql":
+        names = conn.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent "
+                "WHERE p.relname = :table AND pg_table_is_visible(p.oid)"
+            ),
+            {"table": TABLE},
+        ).scalars()
+    else:
+        return []
+    return sorted(m for m in map(_parse_month, names) if m is not None)
+
+
+# ========================
+# 滚动维护
+# ========================
+
+
+def ensure_future_partitions(conn: Connection, today: date, months_ahead: int = 3) -> list[str]:
+    """确保当前月起 months_ahead 个月的分区已存在，返回新建的分区名"""
+    if not is_partitioned(conn):
+        return []
+
+    existing = list_partitions(conn)
+    wanted = month_range(today, add_months(month_start(today), months_ahead))
+    # 只能在最后一个月分区之后追加（MySQL 从兜底分区中拆分）
+    missing = [m for m in wanted if not existing or m > existing[-1]]
+    if not missing:
+        return []
+
+    if conn.dialect.name == "mysql":
+        conn.execute(
+            text(
+                f"ALTER TABLE {TABLE} REORGANIZE PARTITION {MYSQL_MAX_PARTITION} INTO (\n    "
+                f"{mysql_partition_definitions(missing)}\n)"
+            )
+        )
+    else:
+        # 兜底子表中若已有落在新分区范围内的行，CREATE 会失败；按时维护即可避免
+        for month in missing:
+            conn.execute(text(postgres_partition_ddl(month)))
+    return [partition_name(m) for m in missing]
+
+
+def drop_empty_partitions(conn: Connection, before: date) -> list[str]:
+    """删除 before 所在月之前、已无数据的月分区（冷会话归档后即被清空）"""
+    if not is_partitioned(conn):
+        return []
+
+    dropped = []
+    for month in list_partitions(conn):
+        if add_months(month, 1) > month_start(before):
+            break
+        name = partition_name(month)
+        if conn.dialect.name == "mysql":
+            has_rows = conn.execute(text(f"SELECT 1 FROM {TABLE} PARTITION ({name}) LIMIT 1"))
+            if has_rows.first() is None:
+                conn.execute(text(f"ALTER TABLE {TABLE} DROP PARTITION {name}"))
+                dropped.append(name)
+        else:
+            has_rows = conn.execute(text(f"SELECT 1 FROM {TABLE}_{name} LIMIT 1"))
+            if has_rows.first() is None:
+                conn.execute(text(f"DROP TABLE {TABLE}_{name}"))
+                dropped.append(name)
+    return dropped
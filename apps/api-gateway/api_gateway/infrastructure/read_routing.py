@@ -0,0 +1,70 @@
+"""
+基础设施层 - 读写分离路由
+
+列表类查询（会话列表、消息历史、按用户名查用户）可走只读副本，写入始终在主库。
+写入后的短时间窗口内，同一键（会话 ID、用户 ID、用户名）的读取回到主库，
+避免复制延迟导致“刚写完读不到”（read-your-writes）。
+
+粘滞状态保存在进程内：同一客户端的后续请求落到其他 worker 时不受保护，
+窗口应覆盖副本的典型复制延迟。
+"""
+
+import time
+from collections.abc import Callable
+
+from ..config import settings
+
+
+class ReadYourWritesTracker:
+    """记录最近写入的键，在粘滞窗口内要求从主库读取"""
+
+    def __init__(
+        self,
+        window_seconds: float = 5.0,
+        max_keys: int = 100_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.window = window_seconds
+        self.max_keys = max_keys
+        self._clock = clock
+        self._deadlines: dict[str, float] = {}
+
+    def mark(self, *keys: str | None):
+        """标记键刚被写入"""
+        deadline = self._clock() + self.window
+        for key in keys:
+            if key is not None:
+                # 先删除再插入，保持字典按截止时间有序
+                self._deadlines.pop(key, None)
+                self._deadlines[key] = deadline
+        if len(self._deadlines) > self.max_keys:
+            self._prune()
+
+    def is_sticky(self, key: str | None) -> bool:
+        """键是否仍在粘滞窗口内"""
+        if key is None:
+            return False
+        deadline = self._deadlines.get(key)
+        if deadline is None:
+            return False
+        if deadline <= self._clock():
+            del self._deadlines[key]
+            return False
+        return True
+
+    def _prune(self):
+        """清理过期键；仍超限时丢弃最早的键"""
+        now = self._clock()
+        for key in list(self._deadlines):
+            if self._deadlines[key] > now and len(self._deadlines) <= self.max_keys:
+                break
+            del self._deadlines[key]
+
+
+# 进程级单例
+_tracker = ReadYourWritesTracker(window_seconds=settings.REPLICA_STICKY_SECONDS)
+
+
+def get_write_tracker() -> ReadYourWritesTracker:
+    """获取读写分离粘滞跟踪器"""
+    return _tracker
@@ -1,51 +1,153 @@
 """
 SQLAlchemy 数据库仓储实现
+
+读路径只选取所需列，由行元组直接构建领域实体，不经过 ORM 实例与身份映射；
+写路径仍使用 ORM 模型。配置只读副本时，列表类查询经 read_session 读取，
+写入后的粘滞窗口内回到主库。热表查不到消息时尝试从归档表按需恢复。
 """
 
-from sqlalchemy import delete, select
+from datetime import datetime
+
+from sqlalchemy import Row, delete, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 
 from ..domain.entities import ChatSession, Message, MessageRole, User
-from ..domain.repositories import IChatSessionRepository, IMessageRepository, IUserRepository
+from ..domain.repositories import (
+    IChatSessionRepository,
+    IMessageRepository,
+    IUnitOfWork,
+    IUserRepository,
+)
+from .archive import restore_session
 from .models import ChatSessionModel, MessageModel, MessageRoleEnum, UserModel
+from .read_routing import get_write_tracker
+
+# 读路径选取的列（顺序与实体构造参数一致）
+_MESSAGE_COLUMNS = (
+    MessageModel.id,
+    MessageModel.session_id,
+    MessageModel.role,
+    MessageModel.content,
+    MessageModel.tokens,
+    MessageModel.created_at,
+)
+_SESSION_COLUMNS = (
+    ChatSessionModel.id,
+    ChatSessionModel.owner_id,
+    ChatSessionModel.name,
+    ChatSessionModel.system_prompt,
+    ChatSessionModel.total_tokens,
+    ChatSessionModel.pinned,
+    ChatSessionModel.created_at,
+    ChatSessionModel.updated_at,
+)
+_USER_COLUMNS = (
+    UserModel.id,
+    UserModel.username,
+    UserModel.email,
+    UserModel.hashed_password,
+    UserModel.is_active,
+    UserModel.is_superuser,
+    UserModel.created_at,
+)
+
+_ROLES = {role: MessageRole(role.value) for role in MessageRoleEnum}
+
+
+class _RepositoryBase:
+    """仓储公共逻辑：读写分离与归档按需恢复"""
+
+    session: AsyncSession
+    read_session: AsyncSession | None
+    auto_commit: bool
+
+    def _reader(self, key: str | None) -> AsyncSession:
+        """按键选择主库或只读副本会话"""
+        if self.read_session is None or get_write_tracker().is_sticky(key):
+            return self.session
+        return self.read_session
+
+    async def _routing_owner(self, session_id: str) -> str | None:
+        """会话列表按 owner 路由：写入会话后需让该用户的列表读主库（无副本时不查）"""
+        if self.read_session is None:
+            return None
+        return await self.session.scalar(
+            select(ChatSessionModel.owner_id).where(ChatSessionModel.id == session_id)
+        )
 
+    async def _restore_archived(self, session_id: str, total_tokens: int | None = None) -> bool:
+        """热表无消息时尝试从归档恢复（在主库上进行；已知计数器为 0 的会话从未有消息，直接跳过）"""
+        if total_tokens == 0 or not await restore_session(self.session, session_id):
+            return False
+        if self.auto_commit:
+            await self.session.commit()
+        get_write_tracker().mark(session_id)
+        return True
 
-class SQLAlchemyChatSessionRepository(IChatSessionRepository):
+
+class SQLAlchemyChatSessionRepository(_RepositoryBase, IChatSessionRepository):
     """SQLAlchemy 会话仓储"""
 
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        auto_commit: bool = True,
+        read_session: AsyncSession | None = None,
+    ):
         self.session = session
+        # 工作单元模式下由 UoW 统一提交
+        self.auto_commit = auto_commit
+        # 只读副本会话（可选）
+        self.read_session = read_session
 
-    async def get_by_id(self, session_id: str) -> ChatSession | None:
+    async def get_by_id(self, session_id: str, with_messages: bool = True) -> ChatSession | None:
         """根据 ID 获取会话"""
-        stmt = (
-            select(ChatSessionModel)
-            .options(selectinload(ChatSessionModel.messages))
-            .where(ChatSessionModel.id == session_id)
+        result = await self.session.execute(
+            select(*_SESSION_COLUMNS).where(ChatSessionModel.id == session_id)
         )
-        result = await self.session.execute(stmt)
-        model = result.scalar_one_or_none()
+        row = result.first()
 
-        if not model:
+        if not row:
             return None
 
-        return self._to_entity(model)
+        session = self._to_entity(row)
+        if with_messages:
+            messages = (await self._load_messages([session_id])).get(session_id, [])
+            if not messages and await self._restore_archived(session_id, session.total_tokens):
+                messages = (await self._load_messages([session_id])).get(session_id, [])
+            session.messages = messages
+        return session
 
     async def get_by_owner(self, owner_id: str) -> list[ChatSession]:
-        """获取用户的所有会话"""
-        from sqlalchemy.orm import selectinload
-
-        stmt = (
-            select(ChatSessionModel)
+        """获取用户的所有会话（可走只读副本）"""
+        db = self._reader(owner_id)
+        result = await db.execute(
+            select(*_SESSION_COLUMNS)
             .where(ChatSessionModel.owner_id == owner_id)
-            .options(selectinload(ChatSessionModel.messages))  # 预加载消息
             .order_by(ChatSessionModel.updated_at.desc())
         )
-        result = await self.session.execute(stmt)
-        models = result.scalars().all()
-
-        return [self._to_entity(model) for model in models]
+        sessions = [self._to_entity(row) for row in result]
+
+        # 所有会话的消息一次查询取回
+        if sessions:
+            messages = await self._load_messages([s.id for s in sessions], db)
+            for session in sessions:
+                session.messages = messages.get(session.id, [])
+        return sessions
+
+    async def _load_messages(
+        self, session_ids: list[str], db: AsyncSession | None = None
+    ) -> dict[str, list[Message]]:
+        """按会话分组加载消息（按时间正序）"""
+        result = await (db or self.session).execute(
+            select(*_MESSAGE_COLUMNS)
+            .where(MessageModel.session_id.in_(session_ids))
+            .order_by(MessageModel.created_at, MessageModel.id)
+        )
+        grouped: dict[str, list[Message]] = {}
+        for row in result:
+            grouped.setdefault(row[1], []).append(SQLAlchemyMessageRepository._to_entity(row))
+        return grouped
 
     async def save(self, session: ChatSession) -> ChatSession:
         """保存会话"""
@@ -75,66 +177,126 @@ class SQLAlchemyChatSessionRepository(IChatSessionRepository):
             )
             self.session.add(model)
 
-        await self.session.commit()
+        if self.auto_commit:
+            await self.session.commit()
+        get_write_tracker().mark(session.id, session.owner_id)
         return session
 
+    async def get_context_window(self, session_id: str, max_tokens: int) -> list[Message]:
+        """获取 token 预算内的最近消息（窗口函数倒序累加，只取需要的行）"""
+        cumulative = (
+            func.sum(MessageModel.tokens)
+            .over(order_by=(MessageModel.created_at.desc(), MessageModel.id.desc()))
+            .label("cumulative")
+        )
+        window = (
+            select(MessageModel.id, cumulative)
+            .where(MessageModel.session_id == session_id)
+            .subquery()
+        )
+        stmt = (
+            select(*_MESSAGE_COLUMNS)
+            .join(window, MessageModel.id == window.c.id)
+            .where(window.c.cumulative <= max_tokens)
+            .order_by(MessageModel.created_at, MessageModel.id)
+        )
+        rows = (await self.session.execute(stmt)).all()
+        if not rows and max_tokens > 0 and await self._restore_archived(session_id):
+            rows = (await self.session.execute(stmt)).all()
+
+        return [SQLAlchemyMessageRepository._to_entity(row) for row in rows]
+
+    async def append_message(self, message: Message) -> None:
+        """追加消息，并用一条 UPDATE 累加会话计数器"""
+        self.session.add(SQLAlchemyMessageRepository._to_model(message))
+        await self.session.execute(
+            update(ChatSessionModel)
+            .where(ChatSessionModel.id == message.session_id)
+            .values(
+                total_tokens=ChatSessionModel.total_tokens + message.tokens,
+                updated_at=datetime.utcnow(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        owner_id = await self._routing_owner(message.session_id)
+
+        if self.auto_commit:
+            await self.session.commit()
+        # 计数器与 updated_at 变化影响该用户的会话列表
+        get_write_tracker().mark(message.session_id, owner_id)
+
     async def delete(self, session_id: str) -> bool:
         """删除会话"""
+        owner_id = await self._routing_owner(session_id)
+        # messages 为分区表时（MySQL）没有外键级联，显式删除
+        await self.session.execute(
+            delete(MessageModel).where(MessageModel.session_id == session_id)
+        )
         stmt = delete(ChatSessionModel).where(ChatSessionModel.id == session_id)
         result = await self.session.execute(stmt)
-        await self.session.commit()
+        if self.auto_commit:
+            await self.session.commit()
+        get_write_tracker().mark(session_id, owner_id)
         return result.rowcount > 0
 
     @staticmethod
-    def _to_entity(model: ChatSessionModel) -> ChatSession:
-        """ORM 模型转实体"""
-        messages = [
-            Message(
-                id=str(m.id),
-                session_id=str(m.session_id),
-                role=MessageRole(m.role.value),
-                content=m.content,
-                tokens=m.tokens,
-                created_at=m.created_at,
-            )
-            for m in model.messages
-        ]
-
+    def _to_entity(row: Row) -> ChatSession:
+        """行元组转实体（不含消息）"""
+        id_, owner_id, name, system_prompt, total_tokens, pinned, created_at, updated_at = row
         return ChatSession(
-            id=str(model.id),
-            owner_id=str(model.owner_id) if model.owner_id else None,
-            name=model.name,
-            messages=messages,
-            system_prompt=model.system_prompt,
-            total_tokens=model.total_tokens,
-            pinned=model.pinned,
-            created_at=model.created_at,
-            updated_at=model.updated_at,
+            id=id_,
+            owner_id=owner_id,
+            name=name,
+            system_prompt=system_prompt,
+            total_tokens=total_tokens,
+            pinned=pinned,
+            created_at=created_at,
+            updated_at=updated_at,
         )
 
 
-class SQLAlchemyMessageRepository(IMessageRepository):
+class SQLAlchemyMessageRepository(_RepositoryBase, IMessageRepository):
     """SQLAlchemy 消息仓储"""
 
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        auto_commit: bool = True,
+        read_session: AsyncSession | None = None,
+    ):
         self.session = session
+        # 工作单元模式下由 UoW 统一提交
+        self.auto_commit = auto_commit
+        # 只读副本会话（可选）
+        self.read_session = read_session
 
     async def get_by_session(self, session_id: str, limit: int = 100) -> list[Message]:
-        """获取会话的消息"""
+        """获取会话的消息（可走只读副本）"""
         stmt = (
-            select(MessageModel)
+            select(*_MESSAGE_COLUMNS)
             .where(MessageModel.session_id == session_id)
             .order_by(MessageModel.created_at.desc())
             .limit(limit)
         )
-        result = await self.session.execute(stmt)
-        models = result.scalars().all()
+        rows = (await self._reader(session_id).execute(stmt)).all()
+        if not rows and await self._restore_archived(session_id):
+            rows = (await self.session.execute(stmt)).all()
 
-        return [self._to_entity(model) for model in reversed(models)]
+        return [self._to_entity(row) for row in reversed(rows)]
 
     async def save(self, message: Message) -> Message:
         """保存消息"""
-        model = MessageModel(
+        self.session.add(self._to_model(message))
+        if self.auto_commit:
+            await self.session.commit()
+        get_write_tracker().mark(message.session_id)
+        return message
+
+    @staticmethod
+    def _to_model(message: Message) -> MessageModel:
+        """实体转 ORM 模型"""
+        return MessageModel(
             id=message.id,
             session_id=message.session_id,
             role=MessageRoleEnum(message.role.value),
@@ -142,56 +304,64 @@ class SQLAlchemyMessageRepository(IMessageRepository):
             tokens=message.tokens,
             created_at=message.created_at,
         )
-        self.session.add(model)
-        await self.session.commit()
-        return message
 
     @staticmethod
-    def _to_entity(model: MessageModel) -> Message:
-        """ORM 模型转实体"""
+    def _to_entity(row: Row) -> Message:
+        """行元组转实体"""
+        id_, session_id, role, content, tokens, created_at = row
         return Message(
-            id=str(model.id),
-            session_id=str(model.session_id),
-            role=MessageRole(model.role.value),
-            content=model.content,
-            tokens=model.tokens,
-            created_at=model.created_at,
+            id=id_,
+            session_id=session_id,
+            role=_ROLES[role],
+            content=content,
+            tokens=tokens,
+            created_at=created_at,
         )
 
 
-class SQLAlchemyUserRepository(IUserRepository):
+class SQLAlchemyUserRepository(_RepositoryBase, IUserRepository):
     """SQLAlchemy 用户仓储"""
 
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        auto_commit: bool = True,
+        read_session: AsyncSession | None = None,
+    ):
         self.session = session
+        # 工作单元模式下由 UoW 统一提交
+        self.auto_commit = auto_commit
+        # 只读副本会话（可选）
+        self.read_session = read_session
 
     async def get_by_id(self, user_id: str) -> User | None:
         """根据 ID 获取用户"""
-        stmt = select(UserModel).where(UserModel.id == user_id)
-        result = await self.session.execute(stmt)
-        model = result.scalar_one_or_none()
+        result = await self.session.execute(select(*_USER_COLUMNS).where(UserModel.id == user_id))
+        row = result.first()
 
-        if not model:
+        if not row:
             return None
 
-        return self._to_entity(model)
+        return self._to_entity(row)
 
     async def get_by_username(self, username: str) -> User | None:
-        """根据用户名获取用户"""
-        stmt = select(UserModel).where(UserModel.username == username)
-        result = await self.session.execute(stmt)
-        model = result.scalar_one_or_none()
+        """根据用户名获取用户（可走只读副本）"""
+        result = await self._reader(username).execute(
+            select(*_USER_COLUMNS).where(UserModel.username == username)
+        )
+        row = result.first()
 
-        if not model:
+        if not row:
             return None
 
-        return self._to_entity(model)
+        return self._to_entity(row)
 
     async def save(self, user: User) -> User:
         """保存用户"""
         stmt = select(UserModel).where(UserModel.id == user.id)
         result = await self.session.execute(stmt)
         existing = result.scalar_one_or_none()
+        previous_username = existing.username if existing else None
 
         if existing:
             # 更新
@@ -213,18 +383,36 @@ class SQLAlchemyUserRepository(IUserRepository):
             )
             self.session.add(model)
 
-        await self.session.commit()
+        if self.auto_commit:
+            await self.session.commit()
+        get_write_tracker().mark(user.id, user.username, previous_username)
         return user
 
     @staticmethod
-    def _to_entity(model: UserModel) -> User:
-        """ORM 模型转实体"""
+    def _to_entity(row: Row) -> User:
+        """行元组转实体"""
+        id_, username, email, hashed_password, is_active, is_superuser, created_at = row
         return User(
-            id=str(model.id),
-            username=model.username,
-            email=model.email,
-            hashed_password=model.hashed_password,
-            is_active=model.is_active,
-            is_superuser=model.is_superuser,
-            created_at=model.created_at,
+            id=id_,
+            username=username,
+            email=email,
+            hashed_password=hashed_password,
+            is_active=is_active,
+            is_superuser=is_superuser,
+            created_at=created_at,
         )
+
+
+class SQLAlchemyUnitOfWork(IUnitOfWork):
+    """SQLAlchemy 工作单元（共享同一个 AsyncSession，一次提交）"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.sessions = SQLAlchemyChatSessionRepository(session, auto_commit=False)
+        self.messages = SQLAlchemyMessageRepository(session, auto_commit=False)
+
+    async def commit(self) -> None:
+        await self.session.commit()
+
+    async def rollback(self) -> None:
+        await self.session.rollback()
@@ -0,0 +1,498 @@
+"""
+基础设施层 - Write-behind 批量持久化
+
+消息与会话计数器增量先进入有界队列，由后台任务按时间窗口或行数攒批，
+以多行 INSERT + 计数器 UPDATE 在一个事务内落库。数据库不可用时批次
+写入本地 JSONL 日志，恢复后自动回放。
+
+计数器增量记录其计入的消息 ID，攒批时一轮对话的消息与增量总在同一事务内，
+因此回放可以做到幂等：已存在的消息跳过，其增量也随之跳过（提交成功但确认
+丢失的批次不会重复写入或重复计数）。整批失败时按轮逐个重试，违反约束的条目
+（如会话已删除）写入死信文件 <日志>.dead，不再回放。
+
+多个 worker 共用同一日志路径：追加与取出日志时持有 <日志>.lock 的排他锁，
+回放全程持有 <日志>.replay.lock（非阻塞获取，其他 worker 正在回放时跳过），
+同一份日志只会被一个 worker 回放。
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+from collections.abc import Callable, Iterator
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..domain.entities import Message
+from ..domain.repositories import IPersistenceQueue
+from ..utils.logger import setup_logger
+from .database import AsyncSessionLocal
+from .models import ChatSessionModel, MessageModel, MessageRoleEnum
+from .read_routing import get_write_tracker
+
+try:
+    import fcntl
+except ImportError:  # Windows：不加锁，仅支持单 worker
+    fcntl = None
+
+logger = setup_logger(__name__, settings.LOG_LEVEL, settings.LOG_FORMAT)
+
+# 队列条目：(类型, JSON 可序列化的负载)，与日志行格式一致
+_MESSAGE = "message"
+_SESSION = "session"
+
+# 查询已存在消息 ID 的 IN 列表长度
+_EXISTING_CHUNK = 500
+
+Entry = tuple[str, dict[str, Any]]
+
+
+def _with_suffix(path: Path, suffix: str) -> Path:
+    return path.with_suffix(path.suffix + suffix)
+
+
+@contextlib.contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    """阻塞持有文件排他锁（跨进程；关闭文件即释放）"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+
+def _try_file_lock(path: Path) -> IO | None:
+    """非阻塞获取文件排他锁，返回持有锁的文件（关闭即释放）；已被占用时返回 None"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    f = open(path, "a")  # noqa: SIM115 持有锁的文件交给调用方关闭
+    if fcntl is not None:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+    return f
+
+
+def _units(batch: list[Entry]) -> tuple[list[list[Entry]], list[Entry]]:
+    """
+    按完整单元切分：单元内每条消息的计数器增量也在单元内（通常即一轮对话）
+
+    返回 (完整单元列表, 末尾尚未凑齐增量的条目)。
+    """
+    units: list[list[Entry]] = []
+    current: list[Entry] = []
+    open_ids: set[str] = set()
+    for kind, payload in batch:
+        current.append((kind, payload))
+        if kind == _MESSAGE:
+            open_ids.add(payload["id"])
+        else:
+            open_ids.difference_update(payload.get("message_ids", ()))
+        if not open_ids:
+            units.append(current)
+            current = []
+    return units, current
+
+
+class WriteBehindWriter(IPersistenceQueue):
+    """Write-behind 写入器"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        queue_size: int = 10000,
+        max_batch: int = 500,
+        flush_interval_ms: int = 20,
+        journal_path: str | None = None,
+        track_owners: bool = False,
+    ):
+        self._session_factory = session_factory
+        self._queue: asyncio.Queue[Entry] = asyncio.Queue(maxsize=queue_size)
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval_ms / 1000
+        self.journal_path = Path(journal_path) if journal_path else None
+        # 配置只读副本时，落库后同时标记会话所属用户（会话列表按 owner 路由）
+        self.track_owners = track_owners
+        self._task: asyncio.Task | None = None
+        # 各会话已入队、尚未被计数器增量认领的消息 ID
+        self._unclaimed: dict[str, list[str]] = {}
+        # 上一批末尾未凑齐增量的条目（已出队，并入下一批）
+        self._carry: list[Entry] = []
+        self._inflight: list[Entry] = []
+        # 可能有待回放的日志（启动时检查一次，此后仅在转存后置位，刷盘成功后不必每次查文件）
+        self._journal_pending = self.journal_path is not None
+
+    # ========================
+    # IPersistenceQueue
+    # ========================
+
+    async def enqueue_message(self, message: Message) -> None:
+        """提交消息（队列满时阻塞，形成反压）"""
+        await self._queue.put(
+            (
+                _MESSAGE,
+                {
+                    "id": message.id,
+                    "session_id": message.session_id,
+                    "role": message.role.value,
+                    "content": message.content,
+                    "tokens": message.tokens,
+                    "created_at": message.created_at.isoformat(),
+                },
+            )
+        )
+        self._unclaimed.setdefault(message.session_id, []).append(message.id)
+
+    async def enqueue_session_update(
+        self, session_id: str, tokens_delta: int, updated_at: datetime
+    ) -> None:
+        """提交会话计数器增量（认领该会话此前入队的消息）"""
+        await self._queue.put(
+            (
+                _SESSION,
+                {
+                    "session_id": session_id,
+                    "tokens_delta": tokens_delta,
+                    "updated_at": updated_at.isoformat(),
+                    "message_ids": self._unclaimed.pop(session_id, []),
+                },
+            )
+        )
+
+    # ========================
+    # 生命周期
+    # ========================
+
+    async def start(self):
+        """回放遗留日志并启动后台刷盘任务"""
+        await self._replay_journal()
+        self._task = asyncio.create_task(self._run(), name="write-behind-flusher")
+
+    async def stop(self, timeout: float = 10):
+        """关闭：等待队列刷完，超时则剩余条目写入日志"""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except TimeoutError:
+            logger.warning(
+                "Write-behind flush timed out on shutdown", extra={"pending": self.pending}
+            )
+
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+        # 被取消时正在攒批或刷盘的条目（可能已提交，回放时幂等跳过）
+        leftover, self._inflight = self._inflight, []
+        carry, self._carry = self._carry, []
+        for _ in carry:
+            self._queue.task_done()
+        leftover.extend(carry)
+        while not self._queue.empty():
+            leftover.append(self._queue.get_nowait())
+            self._queue.task_done()
+        if leftover:
+            await self._spill(leftover)
+
+    @property
+    def pending(self) -> int:
+        """队列中待刷盘条目数"""
+        return self._queue.qsize() + len(self._carry)
+
+    # ========================
+    # 刷盘
+    # ========================
+
+    async def _run(self):
+        """后台循环：攒批 → 刷盘"""
+        loop = asyncio.get_running_loop()
+        while True:
+            # 已出队、尚未落库的条目；关闭时任务被取消，由 stop() 转存日志
+            batch = self._inflight = self._carry
+            self._carry = []
+            if not batch:
+                batch.append(await self._queue.get())
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except TimeoutError:
+                    break
+
+            # 一轮对话的消息与增量须在同一事务：末尾未凑齐的条目留到下一批
+            units, tail = _units(batch)
+            if units and tail:
+                self._inflight = batch = batch[: len(batch) - len(tail)]
+                self._carry = tail
+
+            try:
+                flushed = await self._flush(batch)
+                self._inflight = []
+                if flushed:
+                    await self._replay_journal()
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: list[Entry], replay: bool = False) -> bool:
+        """
+        在一个事务内写入一批条目；返回数据库是否可用
+
+        失败时按单元逐个重试：违反约束的单元转入死信，数据库不可用时剩余条目转存日志。
+        """
+        try:
+            await self._write(batch, idempotent=replay)
+        except Exception as exc:
+            logger.error(f"Write-behind flush failed: {exc}", extra={"size": len(batch)})
+            return await self._flush_units(batch)
+        return True
+
+    async def _flush_units(self, batch: list[Entry]) -> bool:
+        """逐个单元重试（幂等），坏单元不拖累整批"""
+        units, tail = _units(batch)
+        if tail:
+            units.append(tail)
+        for i, unit in enumerate(units):
+            try:
+                await self._write(unit, idempotent=True)
+            except IntegrityError as exc:
+                logger.error(
+                    f"Write-behind entries rejected: {exc.orig}",
+                    extra={"size": len(unit), "session_id": unit[0][1]["session_id"]},
+                )
+                await self._dead_letter(unit, str(exc.orig))
+            except Exception:
+                await self._spill([entry for rest in units[i:] for entry in rest])
+                return False
+        return True
+
+    async def _write(self, batch: list[Entry], idempotent: bool):
+        """
+        在一个事务内写入条目
+
+        idempotent 为 True 时先查询已存在的消息：跳过这些消息，以及认领了它们的增量
+        （消息与其增量在同一事务中提交，消息已存在即说明增量已计入）。
+        """
+        async with self._session_factory() as session, session.begin():
+            existing = await self._existing_ids(session, batch) if idempotent else set()
+            rows = []
+            deltas: dict[str, list] = {}
+            written = set(existing)
+            claimed = set(existing)
+            for kind, payload in batch:
+                if kind == _MESSAGE:
+                    if payload["id"] in written:
+                        continue
+                    written.add(payload["id"])
+                    rows.append(
+                        {
+                            "id": payload["id"],
+                            "session_id": payload["session_id"],
+                            "role": MessageRoleEnum(payload["role"]),
+                            "content": payload["content"],
+                            "tokens": payload["tokens"],
+                            "created_at": datetime.fromisoformat(payload["created_at"]),
+                        }
+                    )
+                else:
+                    message_ids = payload.get("message_ids", ())
+                    if claimed.intersection(message_ids):
+                        continue
+                    claimed.update(message_ids)
+                    updated_at = datetime.fromisoformat(payload["updated_at"])
+                    entry = deltas.setdefault(payload["session_id"], [0, updated_at])
+                    entry[0] += payload["tokens_delta"]
+                    entry[1] = max(entry[1], updated_at)
+
+            if rows:
+                # 多行 INSERT（SQLAlchemy insertmanyvalues）
+                await session.execute(insert(MessageModel), rows)
+            for session_id, (tokens_delta, updated_at) in deltas.items():
+                await session.execute(
+                    update(ChatSessionModel)
+                    .where(ChatSessionModel.id == session_id)
+                    .values(
+                        total_tokens=ChatSessionModel.total_tokens + tokens_delta,
+                        updated_at=updated_at,
+                    )
+                )
+            session_ids = {*deltas, *(row["session_id"] for row in rows)}
+            owners: list[str] = []
+            if self.track_owners and session_ids:
+                owners = (
+                    await session.scalars(
+                        select(ChatSessionModel.owner_id).where(
+                            ChatSessionModel.id.in_(session_ids)
+                        )
+                    )
+                ).all()
+
+        # 读写分离：粘滞窗口从落库时刻起算
+        get_write_tracker().mark(*session_ids, *owners)
+
+    @staticmethod
+    async def _existing_ids(session: AsyncSession, batch: list[Entry]) -> set[str]:
+        """批次中已落库的消息 ID"""
+        ids = [payload["id"] for kind, payload in batch if kind == _MESSAGE]
+        existing: set[str] = set()
+        for i in range(0, len(ids), _EXISTING_CHUNK):
+            existing.update(
+                await session.scalars(
+                    select(MessageModel.id).where(MessageModel.id.in_(ids[i : i + _EXISTING_CHUNK]))
+                )
+            )
+        return existing
+
+    # ========================
+    # 本地日志
+    # ========================
+
+    async def _spill(self, batch: list[Entry]):
+        """批次追加到本地 JSONL 日志"""
+        if not self.journal_path:
+            logger.error(
+                "Write-behind batch dropped (no journal configured)", extra={"size": len(batch)}
+            )
+            return
+        records = [{"kind": kind, **payload} for kind, payload in batch]
+        await asyncio.to_thread(self._append, self.journal_path, records)
+        self._journal_pending = True
+
+    async def _dead_letter(self, unit: list[Entry], error: str):
+        """违反约束的条目写入死信文件（不再回放，留待人工处理）"""
+        if not self.journal_path:
+            return
+        dead = _with_suffix(self.journal_path, ".dead")
+        records = [{"kind": kind, **payload, "error": error} for kind, payload in unit]
+        await asyncio.to_thread(self._append, dead, records)
+
+    def _append(self, path: Path, records: list[dict[str, Any]]):
+        # 与其他 worker 的追加及取出日志互斥（避免行交错、写入已被取走的文件）
+        with (
+            _file_lock(_with_suffix(self.journal_path, ".lock")),
+            open(path, "a", encoding="utf-8") as f,
+        ):
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _take_journal(self, replaying: Path) -> tuple[list[Entry], bool] | None:
+        """
+        取出待回放条目（在线程中执行），返回 (条目, 是否为上次遗留的 .replay)
+
+        日志先改名为 .replay 再读取；上次回放中途退出留下的 .replay 优先回放，
+        不会被新日志覆盖。调用方须持有回放锁。
+        """
+        with _file_lock(_with_suffix(self.journal_path, ".lock")):
+            leftover = replaying.exists()
+            if not leftover:
+                if not self.journal_path.exists():
+                    return None
+                os.replace(self.journal_path, replaying)
+
+        batch: list[Entry] = []
+        with open(replaying, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                payload = json.loads(line)
+                batch.append((payload.pop("kind"), payload))
+        return batch, leftover
+
+    async def _replay_journal(self):
+        """回放本地日志（回放失败的条目会重新写入新日志）"""
+        if not self.journal_path or not self._journal_pending:
+            return
+        self._journal_pending = False
+
+        replaying = _with_suffix(self.journal_path, ".replay")
+        lock = await asyncio.to_thread(_try_file_lock, _with_suffix(replaying, ".lock"))
+        if lock is None:
+            # 其他 worker 正在回放；下次刷盘成功后再检查
+            self._journal_pending = True
+            return
+        try:
+            await self._replay_locked(replaying)
+        finally:
+            lock.close()
+
+    async def _replay_locked(self, replaying: Path):
+        """持有回放锁时，依次回放遗留的 .replay 与当前日志"""
+        while taken := await asyncio.to_thread(self._take_journal, replaying):
+            batch, leftover = taken
+            logger.info(
+                "Replaying write-behind journal",
+                extra={"entries": len(batch), "leftover": leftover},
+            )
+            # 按完整单元分块，保证消息与其增量在同一事务
+            units, tail = _units(batch)
+            chunk: list[Entry] = []
+            for unit in [*units, tail]:
+                chunk.extend(unit)
+                if len(chunk) >= self.max_batch:
+                    await self._flush(chunk, replay=True)
+                    chunk = []
+            if chunk:
+                await self._flush(chunk, replay=True)
+
+            await asyncio.to_thread(replaying.unlink)
+            # 遗留的 .replay 回放完后接着回放当前日志；否则本轮结束
+            if not leftover:
+                break
+
+
+# 进程级单例（由 lifespan 启停）
+_writer: WriteBehindWriter | None = None
+
+
+def get_write_behind() -> WriteBehindWriter | None:
+    """获取 write-behind 写入器（未启用时为 None）"""
+    return _writer
+
+
+async def start_write_behind() -> WriteBehindWriter | None:
+    """按配置启动 write-behind 写入器"""
+    global _writer
+
+    if not settings.WRITE_BEHIND_ENABLED:
+        return None
+
+    _writer = WriteBehindWriter(
+        queue_size=settings.WRITE_BEHIND_QUEUE_SIZE,
+        max_batch=settings.WRITE_BEHIND_MAX_BATCH,
+        flush_interval_ms=settings.WRITE_BEHIND_FLUSH_MS,
+        journal_path=settings.WRITE_BEHIND_JOURNAL_PATH or None,
+        track_owners=bool(settings.DATABASE_REPLICA_URL),
+    )
+    await _writer.start()
+    return _writer
+
+
+async def stop_write_behind():
+    """关闭 write-behind 写入器并刷盘"""
+    global _writer
+
+    if _writer is None:
+        return
+
+    await _writer.stop(timeout=settings.WRITE_BEHIND_SHUTDOWN_TIMEOUT)
+    _writer = None
@@ -12,8 +12,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 from api_gateway.config import get_profile_name, settings
-from api_gateway.routes import chat, system
+from api_gateway.infrastructure.archive import start_archiver, stop_archiver
+from api_gateway.infrastructure.write_behind import start_write_behind, stop_write_behind
+from api_gateway.presentation.container import close_app_container, init_app_container
+from api_gateway.routes import admin, chat, system
 from api_gateway.utils.logger import request_id_var, setup_logger
+from api_gateway.utils.profiling import start_loop_watchdog, stop_loop_watchdog
+from api_gateway.utils.timing import start_timeline
+from api_gateway.utils.tracing import KIND_SERVER, begin_span, get_exporter, span_var
 
 # 设置日志
 logger = setup_logger(__name__, settings.LOG_LEVEL, settings.LOG_FORMAT)
@@ -32,8 +38,19 @@ async def lifespan(app: FastAPI):
             "max_output_tokens": settings.MAX_OUTPUT_TOKENS,
         },
     )
+    await start_write_behind()
+    # 应用级容器依赖 write-behind，需在其启动之后构建
+    init_app_container()
+    start_archiver()
+    start_loop_watchdog()
     yield
     logger.info("Shutting down CxyGPT API Gateway")
+    stop_loop_watchdog()
+    await stop_archiver()
+    await close_app_container()
+    # 关闭前刷完 write-behind 队列（失败的批次落入本地日志）
+    await stop_write_behind()
+    get_exporter().flush()
 
 
 # 创建应用
@@ -98,17 +115,51 @@ app.add_middleware(
 # 请求 ID 中间件
 @app.middleware("http")
 async def add_request_id(request: Request, call_next):
-    """为每个请求添加唯一 ID"""
+    """为每个请求添加唯一 ID，并开启请求的根 span"""
     req_id = str(uuid.uuid4())
     request_id_var.set(req_id)
-    response = await call_next(request)
+    timeline = start_timeline(req_id)
+    span = begin_span(
+        f"{request.method} {request.url.path}",
+        KIND_SERVER,
+        {"http.method": request.method, "http.target": request.url.path, "request_id": req_id},
+        traceparent=request.headers.get("traceparent"),
+    )
+    if span.trace_id is not None:
+        span_var.set(span)
+    try:
+        response = await call_next(request)
+    except BaseException as exc:
+        span.set_error(f"{type(exc).__name__}: {exc}")
+        span.end()
+        raise
     response.headers["X-Request-ID"] = req_id
+    span.set_attribute("http.status_code", response.status_code)
+    if response.status_code >= 500:
+        span.set_error(f"HTTP {response.status_code}")
+    # 流式响应此时尚未发送完，由流结束时输出计时（SSE 注释）与访问日志
+    if not response.headers.get("content-type", "").startswith("text/event-stream"):
+        response.headers["Server-Timing"] = timeline.server_timing()
+        timeline.finish(method=request.method, path=request.url.path, status=response.status_code)
+        span.end()
+    else:
+        response.body_iterator = _end_span_after(response.body_iterator, span)
     return response
 
 
+async def _end_span_after(body_iterator, span):
+    """流式响应发送完毕（或客户端断开）时结束根 span"""
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        span.end()
+
+
 # 注册路由
 app.include_router(system.router)
 app.include_router(chat.router)
+app.include_router(admin.router)
 
 
 # 全局异常处理
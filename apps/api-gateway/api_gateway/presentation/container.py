@@ -2,46 +2,47 @@
 表现层 - 依赖注入容器（更新版）
 """
 
-from fastapi import Depends
+import contextlib
+from collections.abc import AsyncIterator
+
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..application.use_cases import ChatCompletionUseCase, SessionManagementUseCase
 from ..config import settings
 from ..domain.services import ChatService
-from ..infrastructure.database import get_db
+from ..infrastructure.cached_repository import (
+    CachedChatSessionRepository,
+    CachedMessageRepository,
+    CachedPersistenceQueue,
+    CachedUnitOfWork,
+    get_session_cache,
+)
+from ..infrastructure.database import AsyncSessionLocal, ReplicaSessionLocal
 from ..infrastructure.memory_repository import (
     InMemoryChatSessionRepository,
     InMemoryMessageRepository,
+    InMemoryUnitOfWork,
     InMemoryUserRepository,
 )
 from ..infrastructure.openai_client import MockLLMClient, OpenAICompatibleClient
 from ..infrastructure.sqlalchemy_repository import (
     SQLAlchemyChatSessionRepository,
     SQLAlchemyMessageRepository,
+    SQLAlchemyUnitOfWork,
     SQLAlchemyUserRepository,
 )
+from ..infrastructure.write_behind import get_write_behind
 
 
-class Container:
-    """依赖注入容器"""
+class AppContainer:
+    """应用级容器（lifespan 作用域）：无状态与共享组件只构建一次"""
 
-    def __init__(self, db_session: AsyncSession = None):
+    def __init__(self):
         # 根据配置选择仓储实现
         db_url = settings.DATABASE_URL.lower()
-        use_database = any(proto in db_url for proto in ("mysql", "postgresql", "sqlite"))
-
-        if use_database and db_session:
-            # 使用数据库仓储
-            self.session_repo = SQLAlchemyChatSessionRepository(db_session)
-            self.message_repo = SQLAlchemyMessageRepository(db_session)
-            self.user_repo = SQLAlchemyUserRepository(db_session)
-        else:
-            # 使用内存仓储（开发/测试）
-            self.session_repo = InMemoryChatSessionRepository()
-            self.message_repo = InMemoryMessageRepository()
-            self.user_repo = InMemoryUserRepository()
+        self.use_database = any(proto in db_url for proto in ("mysql", "postgresql", "sqlite"))
 
-        # LLM 客户端
+        # LLM 客户端（共享连接池）
         if settings.USE_MOCK:
             self.llm_client = MockLLMClient()
         else:
@@ -50,12 +51,74 @@ class Container:
         # 领域服务
         self.chat_service = ChatService()
 
+        # 数据库模式的共享组件
+        self.session_cache = get_session_cache() if self.use_database else None
+        self.persistence_queue = get_write_behind() if self.use_database else None
+        if self.session_cache and self.persistence_queue:
+            self.persistence_queue = CachedPersistenceQueue(
+                self.persistence_queue, self.session_cache
+            )
+
+        # 内存模式：仓储与用例进程内共享，状态跨请求保留
+        self.memory_container: Container | None = None
+        if not self.use_database:
+            self.memory_container = Container(self)
+
+    async def aclose(self):
+        """释放共享资源"""
+        await self.llm_client.aclose()
+
+
+class Container:
+    """请求级容器：复用应用级组件，仅注入数据库会话"""
+
+    def __init__(
+        self,
+        app_container: AppContainer,
+        db_session: AsyncSession | None = None,
+        read_session: AsyncSession | None = None,
+    ):
+        self.llm_client = app_container.llm_client
+        self.chat_service = app_container.chat_service
+        self.persistence_queue = None
+
+        if app_container.use_database and db_session:
+            # 使用数据库仓储（配置了只读副本时，列表类查询走副本）
+            self.session_repo = SQLAlchemyChatSessionRepository(
+                db_session, read_session=read_session
+            )
+            self.message_repo = SQLAlchemyMessageRepository(db_session, read_session=read_session)
+            self.user_repo = SQLAlchemyUserRepository(db_session, read_session=read_session)
+            self.unit_of_work = SQLAlchemyUnitOfWork(db_session)
+            # write-behind 仅在数据库模式下有意义
+            self.persistence_queue = app_container.persistence_queue
+
+            # 读穿透会话缓存
+            cache = app_container.session_cache
+            if cache:
+                self.session_repo = CachedChatSessionRepository(self.session_repo, cache)
+                self.message_repo = CachedMessageRepository(self.message_repo, cache)
+                self.unit_of_work = CachedUnitOfWork(self.unit_of_work, cache)
+        else:
+            # 使用内存仓储（开发/测试）
+            self.session_repo = InMemoryChatSessionRepository(
+                compact_history=settings.MEMORY_COMPACT_HISTORY,
+                max_sessions=settings.MEMORY_MAX_SESSIONS,
+                max_messages=settings.MEMORY_MAX_MESSAGES_PER_SESSION,
+            )
+            # 消息历史只在会话中保存一份
+            self.message_repo = InMemoryMessageRepository(sessions=self.session_repo)
+            self.user_repo = InMemoryUserRepository()
+            self.unit_of_work = InMemoryUnitOfWork(self.session_repo, self.message_repo)
+
         # 用例
         self.chat_completion_use_case = ChatCompletionUseCase(
             session_repo=self.session_repo,
             message_repo=self.message_repo,
             llm_client=self.llm_client,
             chat_service=self.chat_service,
+            persistence_queue=self.persistence_queue,
+            unit_of_work=self.unit_of_work,
         )
 
         self.session_management_use_case = SessionManagementUseCase(
@@ -63,6 +126,48 @@ class Container:
         )
 
 
-async def get_container(db: AsyncSession = Depends(get_db)) -> Container:
-    """获取容器实例"""
-    return Container(db_session=db)
+# 进程级单例（由 lifespan 构建与释放）
+_app_container: AppContainer | None = None
+
+
+def get_app_container() -> AppContainer:
+    """获取应用级容器（未初始化时按当前配置构建）"""
+    global _app_container
+
+    if _app_container is None:
+        _app_container = AppContainer()
+    return _app_container
+
+
+def init_app_container() -> AppContainer:
+    """构建应用级容器（在 write-behind 等共享组件启动之后调用）"""
+    global _app_container
+
+    _app_container = AppContainer()
+    return _app_container
+
+
+async def close_app_container():
+    """释放应用级容器"""
+    global _app_container
+
+    if _app_container is not None:
+        await _app_container.aclose()
+        _app_container = None
+
+
+async def get_container() -> AsyncIterator[Container]:
+    """获取请求级容器（数据库会话按存储模式打开，内存模式不打开）"""
+    app_container = get_app_container()
+    if app_container.memory_container:
+        yield app_container.memory_container
+        return
+
+    async with contextlib.AsyncExitStack() as stack:
+        db = await stack.enter_async_context(AsyncSessionLocal())
+        read_db = (
+            await stack.enter_async_context(ReplicaSessionLocal())
+            if ReplicaSessionLocal is not None
+            else None
+        )
+        yield Container(app_container, db_session=db, read_session=read_db)
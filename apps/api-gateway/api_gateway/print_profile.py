@@ -2,14 +2,14 @@
 打印当前档位与建议的 vLLM 启动命令
 """
 
-from api_gateway.config import detect_gpu_memory, get_profile_name, load_profiles, settings
+from api_gateway.config import detect_gpu_memory, load_profiles, resolve_profile, settings
 
 
 def main():
     """打印档位信息"""
-    profile_name = get_profile_name(settings)
+    profile_name = resolve_profile(settings).name
     profiles = load_profiles()
-    gpu_mem = detect_gpu_memory()
+    gpu_mem = detect_gpu_memory(settings.GPU_PROBE_TIMEOUT)
 
     print("=" * 60)
     print("CxyGPT 当前配置档位")
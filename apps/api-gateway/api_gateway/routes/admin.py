@@ -0,0 +1,116 @@
+"""
+运维诊断路由（需 ADMIN_TOKEN）
+"""
+
+import hmac
+import os
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+
+from api_gateway.config import settings
+from api_gateway.utils.logger import setup_logger
+from api_gateway.utils.profiling import get_loop_watchdog, profile_loop
+
+logger = setup_logger(__name__, settings.LOG_LEVEL, settings.LOG_FORMAT)
+
+
+def require_admin(request: Request) -> None:
+    """校验 Authorization: Bearer <ADMIN_TOKEN>；未配置令牌时接口不存在"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(
+        token.encode(), settings.ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=401,
+            detail={"error": {"message": "Invalid admin token", "type": "auth_error", "code": 401}},
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+
+@router.post(
+    "/profile",
+    response_class=PlainTextResponse,
+    summary="采样剖析",
+    description="""
+在处理本请求的 worker 上采样 `seconds` 秒，返回折叠栈（collapsed stacks）文本，
+可用 `flamegraph.pl` 或 https://www.speedscope.app 生成火焰图：
+
+```
+curl -X POST -H "Authorization: Bearer $ADMIN_TOKEN" \\
+    "http://127.0.0.1:8001/admin/profile?seconds=10" -o gateway.collapsed
+flamegraph.pl gateway.collapsed > gateway.svg
+```
+
+默认只采样事件循环线程（`all_threads=true` 包含线程池等其他线程）。
+多 worker 部署时请求落在任一 worker 上，响应头 `X-Worker-PID` 标明采样的进程。
+
+- `409`: 该 worker 上已有剖析在运行
+    """,
+)
+async def profile(
+    seconds: float = Query(10, gt=0, description="采样时长（秒）"),
+    interval_ms: float = Query(5, ge=1, le=100, description="采样间隔（毫秒）"),
+    all_threads: bool = Query(False, description="采样所有线程"),
+) -> PlainTextResponse:
+    """采样剖析"""
+    if seconds > settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": {
+                    "message": f"seconds must be <= {settings.PROFILE_MAX_SECONDS}",
+                    "type": "invalid_request_error",
+                    "code": 400,
+                }
+            },
+        )
+
+    logger.info(
+        "Profiling started",
+        extra={"seconds": seconds, "interval_ms": interval_ms, "all_threads": all_threads},
+    )
+    profiler = await profile_loop(seconds, interval_ms / 1000, all_threads)
+    if profiler is None:
+        raise HTTPException(
+            status_code=409,
+            detail={"error": {"message": "Profiling already in progress", "code": 409}},
+        )
+
+    pid = os.getpid()
+    return PlainTextResponse(
+        profiler.collapsed(),
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="gateway-{pid}-{int(time.time())}.collapsed"'
+            ),
+            "X-Worker-PID": str(pid),
+            "X-Profile-Samples": str(profiler.samples),
+        },
+    )
+
+
+@router.get(
+    "/loop",
+    summary="事件循环阻塞统计",
+    description="本 worker 的阻塞检测状态（需 `SLOW_CALLBACK_MS` > 0），阻塞堆栈见日志。",
+)
+async def loop_status() -> dict:
+    """事件循环阻塞统计"""
+    watchdog = get_loop_watchdog()
+    if watchdog is None:
+        return {"enabled": False, "pid": os.getpid()}
+    return {
+        "enabled": True,
+        "pid": os.getpid(),
+        "threshold_ms": watchdog.threshold * 1000,
+        "blocked_count": watchdog.blocked_count,
+        "max_blocked_ms": round(watchdog.max_blocked * 1000, 1),
+    }
@@ -23,7 +23,9 @@ from api_gateway.models.schemas import (
     ErrorResponse,
 )
 from api_gateway.utils.logger import request_id_var, setup_logger
+from api_gateway.utils.timing import current_timeline, timed
 from api_gateway.utils.tokens import estimate_messages_tokens
+from api_gateway.utils.tracing import KIND_CLIENT, begin_span, inject_headers, start_span
 
 router = APIRouter(tags=["Chat"])
 logger = setup_logger(__name__, settings.LOG_LEVEL, settings.LOG_FORMAT)
@@ -64,59 +66,87 @@ data: [DONE]
 )
 async def chat_completions(request: Request, req: ChatCompletionRequest):
     """聊天补全"""
-    # 设置请求 ID
-    req_id = str(uuid.uuid4())
-    request_id_var.set(req_id)
-
-    time.time()
-
-    # === Admission：输入长度检查 ===
-    input_tokens = estimate_messages_tokens(
-        [{"role": m.role, "content": m.content} for m in req.messages]
-    )
-
-    if input_tokens > settings.MAX_INPUT_TOKENS:
-        logger.warning(
-            f"Input too long: {input_tokens} > {settings.MAX_INPUT_TOKENS}",
-            extra={
-                "input_tokens": input_tokens,
-                "max_input_tokens": settings.MAX_INPUT_TOKENS,
-            },
-        )
-        raise HTTPException(
-            status_code=413,
-            detail={
-                "error": {
-                    "message": f"Input too long: {input_tokens} tokens, max {settings.MAX_INPUT_TOKENS}",
-                    "type": "invalid_request_error",
-                    "code": 413,
-                }
-            },
-        )
+    # 沿用中间件生成的请求 ID（与 X-Request-ID、日志、trace 一致）
+    req_id = request_id_var.get() or str(uuid.uuid4())
+
+    with start_span("admission") as span, timed("admission"):
+        # === Admission：输入长度检查 ===
+        with timed("tokenize"):
+            input_tokens = estimate_messages_tokens(
+                [{"role": m.role, "content": m.content} for m in req.messages]
+            )
+        span.set_attribute("input_tokens", input_tokens)
+
+        if input_tokens > settings.MAX_INPUT_TOKENS:
+            logger.warning(
+                f"Input too long: {input_tokens} > {settings.MAX_INPUT_TOKENS}",
+                extra={
+                    "input_tokens": input_tokens,
+                    "max_input_tokens": settings.MAX_INPUT_TOKENS,
+                },
+            )
+            raise HTTPException(
+                status_code=413,
+                detail={
+                    "error": {
+                        "message": f"Input too long: {input_tokens} tokens, max {settings.MAX_INPUT_TOKENS}",
+                        "type": "invalid_request_error",
+                        "code": 413,
+                    }
+                },
+            )
 
-    # === Admission：输出长度改写 ===
-    if req.max_tokens and req.max_tokens > settings.MAX_OUTPUT_TOKENS:
-        logger.info(f"max_tokens clamped: {req.max_tokens} -> {settings.MAX_OUTPUT_TOKENS}")
-        req.max_tokens = settings.MAX_OUTPUT_TOKENS
-    elif not req.max_tokens:
-        req.max_tokens = settings.MAX_OUTPUT_TOKENS
+        # === Admission：输出长度改写 ===
+        if req.max_tokens and req.max_tokens > settings.MAX_OUTPUT_TOKENS:
+            logger.info(f"max_tokens clamped: {req.max_tokens} -> {settings.MAX_OUTPUT_TOKENS}")
+            req.max_tokens = settings.MAX_OUTPUT_TOKENS
+        elif not req.max_tokens:
+            req.max_tokens = settings.MAX_OUTPUT_TOKENS
 
     # === Mock 模式 ===
     if settings.USE_MOCK:
         if req.stream:
-            return EventSourceResponse(mock_stream_generator(req_id, req.model))
+            return EventSourceResponse(
+                with_timing_trailer(mock_stream_generator(req_id, req.model))
+            )
         else:
             return mock_completion_response(req_id, req.model)
 
     # === 真实模式：转发到 vLLM ===
     if req.stream:
         return EventSourceResponse(
-            forward_stream(req_id, req, request), media_type="text/event-stream"
+            with_timing_trailer(forward_stream(req_id, req, request)),
+            media_type="text/event-stream",
         )
     else:
         return await forward_completion(req_id, req)
 
 
+async def with_timing_trailer(events: AsyncGenerator[dict, None]) -> AsyncGenerator[dict, None]:
+    """记录首个 chunk 与流耗时；结束时以 SSE 注释发送 Server-Timing 并写访问日志"""
+    timeline = current_timeline()
+    if timeline is None:
+        async for event in events:
+            yield event
+        return
+
+    error = None
+    try:
+        with timeline.span("stream"):
+            async for event in events:
+                if event.get("data") != "[DONE]":
+                    timeline.mark("ttft")
+                yield event
+        yield {"comment": f"server-timing: {timeline.server_timing()}"}
+    except Exception as exc:
+        error = type(exc).__name__
+        raise
+    finally:
+        timeline.finish(
+            method="POST", path="/v1/chat/completions", status=200, stream=True, error=error
+        )
+
+
 # ========================
 # Mock 模式生成器
 # ========================
@@ -171,6 +201,16 @@ def mock_completion_response(req_id: str, model: str) -> ChatCompletionResponse:
 # ========================
 
 
+def _upstream_attributes(url: str, req: ChatCompletionRequest) -> dict:
+    return {
+        "http.method": "POST",
+        "http.url": url,
+        "gen_ai.request.model": req.model,
+        "gen_ai.request.max_tokens": req.max_tokens,
+        "stream": req.stream,
+    }
+
+
 async def forward_stream(
     req_id: str, req: ChatCompletionRequest, client_request: Request
 ) -> AsyncGenerator[dict, None]:
@@ -186,11 +226,21 @@ async def forward_stream(
         "top_p": req.top_p,
     }
 
+    timeline = current_timeline()
+    # 生成器跨多次 yield，span 不设为当前 span，结束时手动 end
+    span = begin_span("upstream", KIND_CLIENT, _upstream_attributes(upstream_url, req))
     try:
+        started = time.perf_counter()
         async with (
             httpx.AsyncClient(timeout=settings.TIMEOUT_TOTAL) as client,
-            client.stream("POST", upstream_url, json=payload) as response,
+            client.stream(
+                "POST", upstream_url, json=payload, headers=inject_headers(span)
+            ) as response,
         ):
+            # 建连 + 上游返回响应头
+            if timeline is not None:
+                timeline.record("upstream", time.perf_counter() - started)
+            span.set_attribute("http.status_code", response.status_code)
             if response.status_code != 200:
                 error_text = await response.aread()
                 logger.error(f"Upstream error: {response.status_code} {error_text}")
@@ -217,10 +267,14 @@ async def forward_stream(
 
     except httpx.TimeoutException as exc:
         logger.error("Upstream timeout")
+        span.set_error("Timeout")
         raise HTTPException(status_code=504, detail={"error": {"message": "Timeout"}}) from exc
     except Exception as exc:
         logger.error(f"Stream error: {exc}")
+        span.set_error(str(exc))
         raise HTTPException(status_code=500, detail={"error": {"message": str(exc)}}) from exc
+    finally:
+        span.end()
 
 
 async def forward_completion(req_id: str, req: ChatCompletionRequest) -> ChatCompletionResponse:
@@ -237,8 +291,13 @@ async def forward_completion(req_id: str, req: ChatCompletionRequest) -> ChatCom
     }
 
     try:
-        async with httpx.AsyncClient(timeout=settings.TIMEOUT_TOTAL) as client:
-            response = await client.post(upstream_url, json=payload)
+        with (
+            start_span("upstream", KIND_CLIENT, _upstream_attributes(upstream_url, req)) as span,
+            timed("upstream"),
+        ):
+            async with httpx.AsyncClient(timeout=settings.TIMEOUT_TOTAL) as client:
+                response = await client.post(upstream_url, json=payload, headers=inject_headers())
+            span.set_attribute("http.status_code", response.status_code)
 
         if response.status_code != 200:
             logger.error(f"Upstream error: {response.status_code}")
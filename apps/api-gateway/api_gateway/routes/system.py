@@ -1,10 +1,13 @@
 """
-系统路由（健康检查、限额）
+系统路由（健康检查、限额、运行指标）
 """
 
+from typing import Any
+
 from fastapi import APIRouter
 
 from api_gateway.config import get_profile_name, settings
+from api_gateway.infrastructure.database import get_pool_status
 from api_gateway.models.schemas import HealthResponse, LimitsResponse
 
 router = APIRouter(tags=["System"])
@@ -47,3 +50,21 @@ async def get_limits() -> LimitsResponse:
         single_user=settings.SINGLE_USER,
         profile=get_profile_name(settings),
     )
+
+
+@router.get(
+    "/v1/metrics/db-pool",
+    summary="数据库连接池指标",
+    description="""
+当前 worker 的连接池状态与累计计数（每个 worker 独立统计）。
+
+- `checked_out` / `checked_out_peak`: 借出连接数及峰值
+- `overflow`: 超出 `size` 的溢出连接数
+- `wait`: 获取连接耗时（含排队与新建连接）的均值、最大值与分桶
+- `timeouts`: 等待空闲连接超时次数；持续大于 0 说明池偏小
+- `invalidations`: 连接失效次数（检活失败、断线等）
+    """,
+)
+async def get_db_pool_metrics() -> dict[str, Any]:
+    """数据库连接池指标"""
+    return get_pool_status()
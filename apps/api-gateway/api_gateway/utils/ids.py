@@ -0,0 +1,45 @@
+"""
+ID 生成工具
+"""
+
+import os
+import threading
+import time
+import uuid
+
+_lock = threading.Lock()
+_last_ms = 0
+_last_seq = 0
+
+
+def uuid7() -> uuid.UUID:
+    """
+    生成 UUIDv7（RFC 9562）
+
+    高 48 位为毫秒时间戳，随后 12 位在同一毫秒内单调递增，
+    使新主键总是追加在 InnoDB 聚簇索引末尾，而不是随机分散写入。
+    """
+    global _last_ms, _last_seq
+
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            # 新的毫秒：序号从随机值开始（保留一半空间用于递增）
+            seq = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            # 同一毫秒（或时钟回拨）：沿用上次时间戳，序号递增
+            ms = _last_ms
+            seq = _last_seq + 1
+            if seq > 0xFFF:
+                ms += 1
+                seq = 0
+        _last_ms, _last_seq = ms, seq
+
+    rand_b = int.from_bytes(os.urandom(8), "big") & 0x3FFFFFFFFFFFFFFF
+    value = (ms & 0xFFFFFFFFFFFF) << 80 | 0x7 << 76 | seq << 64 | 0b10 << 62 | rand_b
+    return uuid.UUID(int=value)
+
+
+def new_id() -> str:
+    """生成时间有序的字符串 ID（实体与 ORM 默认主键统一使用）"""
+    return str(uuid7())
@@ -12,6 +12,9 @@ from typing import Any
 # 请求 ID 上下文变量
 request_id_var: ContextVar[str] = ContextVar("request_id", default="")
 
+# 当前追踪 span（由 utils.tracing 维护，放在这里以便日志关联 trace_id）
+span_var: ContextVar[Any] = ContextVar("trace_span", default=None)
+
 
 class JSONFormatter(logging.Formatter):
     """JSON 格式化器"""
@@ -29,6 +32,12 @@ class JSONFormatter(logging.Formatter):
         if request_id:
             log_data["request_id"] = request_id
 
+        # 关联追踪
+        span = span_var.get()
+        if span is not None:
+            log_data["trace_id"] = span.trace_id
+            log_data["span_id"] = span.span_id
+
         # 添加额外字段（过滤掉标准属性）
         std_keys = {
             "name",
@@ -0,0 +1,193 @@
+"""
+运行时剖析工具
+
+- SamplingProfiler：后台线程定时采样线程栈（sys._current_frames），输出折叠栈
+  （collapsed stacks，每行 "帧;帧;帧 次数"），可直接交给 flamegraph.pl / speedscope
+- LoopWatchdog：事件循环心跳 + 监视线程，单步阻塞超过阈值时记录事件循环线程的堆栈
+
+均为纯 Python 实现，不依赖外部工具，可在运行中的 worker 上临时开启。
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from types import FrameType
+
+from api_gateway.config import settings
+from api_gateway.utils.logger import setup_logger
+
+logger = setup_logger(__name__, settings.LOG_LEVEL, settings.LOG_FORMAT)
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame: FrameType | None) -> str:
+    """栈帧链 → "根;...;叶" """
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class SamplingProfiler:
+    """采样剖析器（同一进程同一时刻只允许一个在运行）"""
+
+    _running = threading.Lock()
+
+    def __init__(self, interval: float = 0.005, thread_ids: set[int] | None = None):
+        # thread_ids 为 None 时采样除采样线程外的所有线程
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> bool:
+        """开始采样；已有剖析在运行时返回 False"""
+        if not self._running.acquire(blocking=False):
+            return False
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self._running.release()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (self.thread_ids and thread_id not in self.thread_ids):
+                    continue
+                name = names.get(thread_id) or f"thread-{thread_id}"
+                self.stacks[f"{name};{_collapse(frame)}"] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """折叠栈文本（按次数降序）"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+async def profile_loop(
+    seconds: float, interval: float = 0.005, all_threads: bool = False
+) -> SamplingProfiler | None:
+    """在当前事件循环所在进程上采样 seconds 秒；已有剖析在运行时返回 None"""
+    thread_ids = None if all_threads else {threading.get_ident()}
+    profiler = SamplingProfiler(interval, thread_ids)
+    if not profiler.start():
+        return None
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+    return profiler
+
+
+class LoopWatchdog:
+    """
+    事件循环阻塞检测
+
+    事件循环上每 threshold/4 更新一次心跳；监视线程发现心跳超过阈值未更新时，
+    抓取事件循环线程此刻的堆栈记录一次 WARNING（即阻塞中的代码），
+    恢复后再记录一次总阻塞时长。与 asyncio debug 模式不同，无需开启全局调试，开销可忽略。
+    """
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.interval = threshold / 4
+        self.blocked_count = 0
+        self.max_blocked = 0.0
+        self._beat = time.monotonic()
+        self._reported_beat: float | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._handle: asyncio.TimerHandle | None = None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._handle = self._loop.call_later(self.interval, self._heartbeat)
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _heartbeat(self) -> None:
+        now = time.monotonic()
+        # 心跳按 interval 调度，超出部分即事件循环未能及时运行的时长
+        lag = now - self._beat - self.interval
+        if lag > self.threshold:
+            self.blocked_count += 1
+            self.max_blocked = max(self.max_blocked, lag)
+            logger.warning(
+                f"Event loop was blocked for {lag * 1000:.0f} ms",
+                extra={"blocked_ms": round(lag * 1000, 1)},
+            )
+        self._beat = now
+        self._handle = self._loop.call_later(self.interval, self._heartbeat)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            lag = time.monotonic() - beat - self.interval
+            if lag <= self.threshold or self._reported_beat == beat:
+                continue
+            # 同一次阻塞只抓取一次堆栈
+            self._reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            logger.warning(
+                f"Event loop blocked for more than {self.threshold * 1000:.0f} ms",
+                extra={"blocked_ms": round(lag * 1000, 1), "stack": stack},
+            )
+
+
+_watchdog: LoopWatchdog | None = None
+
+
+def start_loop_watchdog() -> None:
+    """SLOW_CALLBACK_MS > 0 时在当前事件循环上启用阻塞检测"""
+    global _watchdog
+    if settings.SLOW_CALLBACK_MS <= 0 or _watchdog is not None:
+        return
+    _watchdog = LoopWatchdog(settings.SLOW_CALLBACK_MS / 1000)
+    _watchdog.start()
+    logger.info(
+        "Event loop watchdog started", extra={"slow_callback_ms": settings.SLOW_CALLBACK_MS}
+    )
+
+
+def stop_loop_watchdog() -> None:
+    global _watchdog
+    if _watchdog is not None:
+        _watchdog.stop()
+        _watchdog = None
+
+
+def get_loop_watchdog() -> LoopWatchdog | None:
+    return _watchdog
@@ -0,0 +1,115 @@
+"""
+请求时间线
+
+请求 ID 中间件为每个请求创建一个 RequestTimeline（与 request_id_var 一同放入上下文），
+各阶段用 timed() / mark() 记录耗时，请求结束时：
+- 非流式响应：写入 Server-Timing 响应头
+- 流式响应：作为最后一条 SSE 注释（": server-timing: ..."）发送
+- 均写一条结构化访问日志（logger api_gateway.access）
+
+无时间线（如脚本、测试中直接调用）时 timed() / mark() 为空操作。
+"""
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from api_gateway.config import settings
+from api_gateway.utils.logger import setup_logger
+
+access_logger = setup_logger("api_gateway.access", settings.LOG_LEVEL, settings.LOG_FORMAT)
+
+# 阶段名 → Server-Timing 描述
+PHASES = {
+    "admission": "Admission checks",
+    "tokenize": "Token estimation",
+    "upstream": "Upstream connect",
+    "ttft": "First chunk",
+    "stream": "Stream",
+    "db": "DB persistence",
+    "total": "Total",
+}
+
+
+class RequestTimeline:
+    """单个请求各阶段耗时（毫秒）"""
+
+    __slots__ = ("request_id", "start", "phases", "finished")
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.start = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.finished = False
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def record(self, name: str, seconds: float) -> None:
+        """累加阶段耗时（同一阶段可多次进入，如多次写库）"""
+        self.phases[name] = self.phases.get(name, 0.0) + seconds * 1000
+
+    def mark(self, name: str) -> None:
+        """记录自请求开始的时刻（只记首次，如首 token）"""
+        if name not in self.phases:
+            self.phases[name] = self.elapsed_ms()
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def server_timing(self) -> str:
+        """Server-Timing 头的值"""
+        phases = {**self.phases, "total": self.elapsed_ms()}
+        return ", ".join(
+            f'{name};dur={ms:.1f};desc="{PHASES.get(name, name)}"' for name, ms in phases.items()
+        )
+
+    def finish(self, **fields) -> None:
+        """写访问日志（只写一次）"""
+        if self.finished:
+            return
+        self.finished = True
+        access_logger.info(
+            "Request completed",
+            extra={
+                **{key: value for key, value in fields.items() if value is not None},
+                "duration_ms": round(self.elapsed_ms(), 1),
+                "timings": {name: round(ms, 1) for name, ms in self.phases.items()},
+            },
+        )
+
+
+timeline_var: ContextVar[RequestTimeline | None] = ContextVar("request_timeline", default=None)
+
+
+def start_timeline(request_id: str) -> RequestTimeline:
+    timeline = RequestTimeline(request_id)
+    timeline_var.set(timeline)
+    return timeline
+
+
+def current_timeline() -> RequestTimeline | None:
+    return timeline_var.get()
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """在当前请求的时间线上记录一个阶段"""
+    timeline = timeline_var.get()
+    if timeline is None:
+        yield
+        return
+    with timeline.span(name):
+        yield
+
+
+def mark(name: str) -> None:
+    timeline = timeline_var.get()
+    if timeline is not None:
+        timeline.mark(name)
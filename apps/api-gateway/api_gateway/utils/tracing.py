@@ -0,0 +1,380 @@
+"""
+分布式追踪（W3C Trace Context + OTLP/JSON 导出）
+
+- 每个请求一个 trace：请求 ID 中间件创建 SERVER span，若请求带 traceparent 则沿用其 trace
+- 子 span：admission、上游调用（CLIENT，向 vLLM 透传 traceparent）、SQLAlchemy 查询
+- 采样：父 span 带采样决定时跟随；否则按 TRACE_SAMPLE_RATIO 对 trace_id 取比例（同一 trace 结论一致）
+- 导出：后台线程批量导出 OTLP/JSON
+    file  每批一行写入 TRACE_FILE（与 OpenTelemetry Collector 的 file exporter 格式相同）
+    otlp  POST 到 TRACE_OTLP_ENDPOINT（OTLP/HTTP JSON，Collector 或 scripts/trace_collector.py）
+
+未启用时 start_span() 返回空 span，不生成 ID、不导出，开销可忽略。
+不依赖 opentelemetry-sdk；需要完整 SDK 时，导出格式与传播头均与之兼容。
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from api_gateway.config import settings
+from api_gateway.utils.logger import span_var
+
+# 导出失败时不能再经 JSON 日志回到追踪，直接用标准 logging
+logger = logging.getLogger(__name__)
+
+KIND_INTERNAL, KIND_SERVER, KIND_CLIENT = 1, 2, 3
+STATUS_ERROR = 2
+
+_EXPORT_BATCH = 512
+_EXPORT_INTERVAL = 1.0
+
+
+# ========================
+# traceparent
+# ========================
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str, bool] | None:
+    """解析 traceparent，返回 (trace_id, parent_span_id, sampled)；格式无效返回 None"""
+    if not value:
+        return None
+    parts = value.strip().lower().split("-")
+    if len(parts) < 4 or parts[0] == "ff":
+        return None
+    version, trace_id, span_id, flags = parts[:4]
+    if len(version) != 2 or len(trace_id) != 32 or len(span_id) != 16 or len(flags) != 2:
+        return None
+    try:
+        int(trace_id, 16), int(span_id, 16)
+        sampled = bool(int(flags, 16) & 1)
+    except ValueError:
+        return None
+    if trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, sampled
+
+
+def should_sample(trace_id: str, ratio: float) -> bool:
+    """按 trace_id 低 64 位取比例（TraceIdRatioBased），同一 trace 各服务结论一致"""
+    if ratio >= 1:
+        return True
+    if ratio <= 0:
+        return False
+    return int(trace_id[16:], 16) < ratio * 2**64
+
+
+# ========================
+# Span
+# ========================
+
+
+class Span:
+    """一次操作的计时与属性"""
+
+    __slots__ = (
+        "name",
+        "kind",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "sampled",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "status",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: str | None,
+        sampled: bool,
+        kind: int = KIND_INTERNAL,
+        attributes: dict[str, Any] | None = None,
+    ):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes or {}
+        self.status: tuple[int, str] | None = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, message: str) -> None:
+        self.status = (STATUS_ERROR, message)
+
+    def end(self) -> None:
+        if self.end_ns:
+            return
+        self.end_ns = time.time_ns()
+        if self.sampled:
+            _exporter.enqueue(self)
+
+    def to_otlp(self) -> dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                _otlp_attribute(k, v) for k, v in self.attributes.items() if v is not None
+            ],
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.status:
+            span["status"] = {"code": self.status[0], "message": self.status[1]}
+        return span
+
+
+class _NoopSpan:
+    """未启用追踪时的占位 span"""
+
+    traceparent = None
+    trace_id = span_id = None
+    sampled = False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_error(self, message: str) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_attribute(key: str, value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def current_span() -> Span | None:
+    return span_var.get()
+
+
+def begin_span(
+    name: str,
+    kind: int = KIND_INTERNAL,
+    attributes: dict[str, Any] | None = None,
+    traceparent: str | None = None,
+) -> "Span | _NoopSpan":
+    """创建 span 但不设为当前 span（跨越多个回调时使用，调用方负责 end）"""
+    if not settings.TRACING_ENABLED:
+        return NOOP_SPAN
+    # SERVER span 是请求入口，父 span 只来自入站 traceparent
+    parent = span_var.get() if kind != KIND_SERVER else None
+    if parent is not None:
+        return Span(name, parent.trace_id, parent.span_id, parent.sampled, kind, attributes)
+    remote = parse_traceparent(traceparent)
+    if remote is not None:
+        trace_id, parent_id, sampled = remote
+        return Span(name, trace_id, parent_id, sampled, kind, attributes)
+    trace_id = os.urandom(16).hex()
+    sampled = should_sample(trace_id, settings.TRACE_SAMPLE_RATIO)
+    return Span(name, trace_id, None, sampled, kind, attributes)
+
+
+@contextmanager
+def start_span(
+    name: str,
+    kind: int = KIND_INTERNAL,
+    attributes: dict[str, Any] | None = None,
+    traceparent: str | None = None,
+) -> Iterator["Span | _NoopSpan"]:
+    """创建 span 并设为当前 span，退出时结束；异常记为错误状态"""
+    span = begin_span(name, kind, attributes, traceparent)
+    if span is NOOP_SPAN:
+        yield span
+        return
+    token = span_var.set(span)
+    try:
+        yield span
+    except BaseException as exc:
+        span.set_error(f"{type(exc).__name__}: {exc}")
+        raise
+    finally:
+        span_var.reset(token)
+        span.end()
+
+
+def inject_headers(span: "Span | _NoopSpan | None" = None) -> dict[str, str]:
+    """出站请求的追踪头（默认取当前 span；未启用追踪时为空）"""
+    span = span or span_var.get()
+    if span is None or span.traceparent is None:
+        return {}
+    return {"traceparent": span.traceparent}
+
+
+# ========================
+# 导出
+# ========================
+
+
+class SpanExporter:
+    """有界队列 + 后台线程批量导出（队列满时丢弃并计数，不阻塞请求）"""
+
+    def __init__(self):
+        self._queue: queue.Queue[Span] = queue.Queue(maxsize=10000)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.exported = 0
+        self.dropped = 0
+
+    def enqueue(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self._thread is None:
+            self._start()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._drain(block=True)
+            if batch:
+                self._export_batch(batch)
+
+    def _export_batch(self, batch: list[Span]) -> None:
+        try:
+            self.export(batch)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _drain(self, block: bool) -> list[Span]:
+        batch = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=_EXPORT_INTERVAL))
+            while len(batch) < _EXPORT_BATCH:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def flush(self) -> None:
+        """导出队列中剩余的 span，并等待后台线程导出完手中的批次（关闭时调用）"""
+        while batch := self._drain(block=False):
+            self._export_batch(batch)
+        self._queue.join()
+
+    def export(self, spans: list[Span]) -> None:
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [_otlp_attribute("service.name", settings.TRACE_SERVICE_NAME)]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "api_gateway"},
+                            "spans": [span.to_otlp() for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        try:
+            if settings.TRACE_EXPORTER == "otlp":
+                import httpx
+
+                httpx.post(settings.TRACE_OTLP_ENDPOINT, json=payload, timeout=5).raise_for_status()
+            else:
+                path = Path(settings.TRACE_FILE)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(payload, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self.exported += len(spans)
+        except Exception as exc:
+            self.dropped += len(spans)
+            logger.warning(f"Span export failed: {exc}")
+
+
+_exporter = SpanExporter()
+
+
+def get_exporter() -> SpanExporter:
+    return _exporter
+
+
+# ========================
+# SQLAlchemy
+# ========================
+
+
+def trace_engine(engine, role: str = "primary") -> None:
+    """为引擎的每条 SQL 创建 CLIENT span（仅在已采样的 trace 内）"""
+    from sqlalchemy import event
+
+    sync_engine = engine.sync_engine
+    system = sync_engine.dialect.name
+    max_statement = 1000
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        parent = span_var.get()
+        if parent is None or not parent.sampled:
+            return
+        context._trace_span = begin_span(
+            f"db.{statement.lstrip().split(' ', 1)[0].upper()}",
+            KIND_CLIENT,
+            {
+                "db.system": system,
+                "db.statement": statement[:max_statement],
+                "db.role": role,
+                "db.executemany": executemany,
+            },
+        )
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        span = getattr(context, "_trace_span", None)
+        if span is not None:
+            if cursor.rowcount is not None and cursor.rowcount >= 0:
+                span.set_attribute("db.rowcount", cursor.rowcount)
+            span.end()
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        span = getattr(exception_context.execution_context, "_trace_span", None)
+        if span is not None:
+            span.set_error(str(exception_context.original_exception))
+            span.end()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+长文本压缩基准
+
+用法：
+    python scripts/bench_compression.py --samples 2000 --repeat 5
+
+生成中英混合的对话语料（中文问答、英文技术说明、代码块、Markdown 列表），
+按长度分桶对比各编码的存储大小与编解码耗时：
+    raw    不压缩（UTF-8 + 标记字节）
+    zlib   zlib level 6
+    zstd   zstd level 3（需安装 zstandard）
+均经 compress_text / decompress_text，即 CompressedText 的实际读写路径，阈值为 0。
+生成语料由有限句库拼接，长文本的压缩率偏高；可用 --corpus 指定真实导出的消息
+（JSONL 取 content 字段，否则每行一条）。
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api_gateway.infrastructure import models
+from api_gateway.infrastructure.models import compress_text, decompress_text
+
+ZH = [
+    "这个问题可以从数据库索引的角度来分析。",
+    "首先需要确认连接池的大小是否足够支撑当前的并发量。",
+    "如果会话历史很长，建议只把最近的若干条消息放入上下文窗口。",
+    "模型的回答仅供参考，请结合实际业务场景进行验证。",
+    "在部署到生产环境之前，务必完成压力测试和回滚预案。",
+    "我们可以把冷数据归档到对象存储，以降低主库的存储压力。",
+    "缓存命中率下降通常意味着热点数据发生了变化。",
+    "请检查日志中是否有超时或连接被拒绝的错误信息。",
+]
+EN = [
+    "The request latency is dominated by time-to-first-token on the upstream model.",
+    "Consider batching inserts to reduce round trips to the database.",
+    "Use a composite index on (session_id, created_at) to avoid a filesort.",
+    "Connection pool exhaustion shows up as timeouts rather than errors.",
+    "The write-behind queue flushes every 200 milliseconds or 100 messages.",
+    "Make sure the migration runs inside a maintenance window on large tables.",
+]
+CODE = [
+    "```python\nasync def get_by_session(self, session_id: str, limit: int = 100):\n"
+    "    result = await self.session.execute(query)\n    return [self._to_entity(r) for r in result]\n```",
+    "```sql\nSELECT id, role, content FROM messages\nWHERE session_id = ? ORDER BY created_at LIMIT 100;\n```",
+    "```bash\ncurl -N -H 'Content-Type: application/json' http://localhost:8001/v1/chat/completions\n```",
+]
+BUCKETS = [(0, 512), (512, 4096), (4096, 32768), (32768, 1 << 30)]
+
+
+def make_message(rng: random.Random) -> str:
+    """随机拼一条消息：长度呈长尾分布，多数较短，少数为长回答或粘贴的文档"""
+    target = int(rng.lognormvariate(6.5, 1.3))
+    parts = []
+    size = 0
+    while size < target:
+        kind = rng.random()
+        if kind < 0.5:
+            piece = "".join(rng.choice(ZH) for _ in range(rng.randint(1, 4)))
+        elif kind < 0.8:
+            piece = " ".join(rng.choice(EN) for _ in range(rng.randint(1, 3)))
+        elif kind < 0.9:
+            piece = rng.choice(CODE)
+        else:
+            piece = "\n".join(f"- 第 {i} 项：{rng.choice(ZH)}" for i in range(rng.randint(2, 6)))
+        # 随机数字与标识符，避免语料过于重复
+        piece += f" (#{rng.randint(0, 10**6)})\n\n"
+        parts.append(piece)
+        size += len(piece.encode("utf-8"))
+    return "".join(parts)
+
+
+def load_corpus(path: Path) -> list[str]:
+    texts = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        if path.suffix == ".jsonl":
+            texts.append(json.loads(line)["content"])
+        else:
+            texts.append(line)
+    return texts
+
+
+def bench(texts: list[str], algorithm: str, repeat: int) -> dict:
+    encoded = [compress_text(t, algorithm, 0) for t in texts]
+    enc_times, dec_times = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for t in texts:
+            compress_text(t, algorithm, 0)
+        enc_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        for blob in encoded:
+            decompress_text(blob)
+        dec_times.append(time.perf_counter() - start)
+    return {
+        "stored": sum(len(b) for b in encoded),
+        "encode_us": statistics.median(enc_times) / len(texts) * 1e6,
+        "decode_us": statistics.median(dec_times) / len(texts) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--corpus", type=Path, help="真实语料文件（.jsonl 或每行一条）")
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        rng = random.Random(args.seed)
+        corpus = [make_message(rng) for _ in range(args.samples)]
+    algorithms = ["raw", "zlib"] + (["zstd"] if models._zstd() else [])
+    if "zstd" not in algorithms:
+        print("zstandard 未安装，跳过 zstd")
+
+    print(
+        f"{'bucket (bytes)':<16}{'n':>6}{'algo':>6}{'raw KB':>10}{'stored KB':>11}"
+        f"{'ratio':>7}{'enc us':>9}{'dec us':>9}"
+    )
+    for low, high in BUCKETS:
+        texts = [t for t in corpus if low <= len(t.encode("utf-8")) < high]
+        if not texts:
+            continue
+        raw = sum(len(t.encode("utf-8")) for t in texts)
+        label = f"{low}-{high}" if high < 1 << 30 else f">={low}"
+        for algorithm in algorithms:
+            codec = "none" if algorithm == "raw" else algorithm
+            r = bench(texts, codec, args.repeat)
+            print(
+                f"{label:<16}{len(texts):>6}{algorithm:>6}{raw / 1024:>10.1f}"
+                f"{r['stored'] / 1024:>11.1f}{raw / r['stored']:>7.2f}"
+                f"{r['encode_us']:>9.1f}{r['decode_us']:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
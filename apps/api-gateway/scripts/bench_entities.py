@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+领域实体内存基准
+
+用法：
+    python scripts/bench_entities.py --messages 1000000
+
+用 tracemalloc 统计保存 N 条消息所需的内存，对比：
+    dict-dataclass   旧实体（普通 @dataclass，每个实例带 __dict__）
+    slots-dataclass  当前 Message（slots=True）组成的列表
+    message-history  列式 MessageHistory
+
+消息 ID 与内容字符串在各实现间共享且预先创建，不计入结果，
+输出只反映实体与容器本身的开销。
+"""
+
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api_gateway.domain.entities import Message, MessageHistory, MessageRole
+from api_gateway.utils.ids import new_id
+
+
+@dataclass
+class LegacyMessage:
+    """旧版消息实体"""
+
+    id: str
+    session_id: str
+    role: MessageRole
+    content: str
+    tokens: int = 0
+    created_at: datetime = field(default_factory=datetime.utcnow)
+
+    def __post_init__(self):
+        if isinstance(self.role, str):
+            self.role = MessageRole(self.role)
+
+
+def build_legacy(session_id, ids, contents, base):
+    return [
+        LegacyMessage(
+            id=ids[i],
+            session_id=session_id,
+            role="user" if i % 2 == 0 else "assistant",
+            content=contents[i % len(contents)],
+            tokens=i % 500,
+            created_at=base + timedelta(milliseconds=i),
+        )
+        for i in range(len(ids))
+    ]
+
+
+def build_slots(session_id, ids, contents, base):
+    return [
+        Message(
+            id=ids[i],
+            session_id=session_id,
+            role="user" if i % 2 == 0 else "assistant",
+            content=contents[i % len(contents)],
+            tokens=i % 500,
+            created_at=base + timedelta(milliseconds=i),
+        )
+        for i in range(len(ids))
+    ]
+
+
+def build_history(session_id, ids, contents, base):
+    history = MessageHistory(session_id)
+    for i in range(len(ids)):
+        history.append(
+            Message(
+                id=ids[i],
+                session_id=session_id,
+                role="user" if i % 2 == 0 else "assistant",
+                content=contents[i % len(contents)],
+                tokens=i % 500,
+                created_at=base + timedelta(milliseconds=i),
+            )
+        )
+    return history
+
+
+VARIANTS = {
+    "dict-dataclass": build_legacy,
+    "slots-dataclass": build_slots,
+    "message-history": build_history,
+}
+
+
+def measure(build, session_id, ids, contents, base) -> tuple[int, float]:
+    """返回 (保留内存字节数, 构建耗时秒)；计时单独进行，不受 tracemalloc 影响"""
+    gc.collect()
+    start = time.perf_counter()
+    container = build(session_id, ids, contents, base)
+    elapsed = time.perf_counter() - start
+    del container
+
+    gc.collect()
+    tracemalloc.start()
+    container = build(session_id, ids, contents, base)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del container
+    return retained, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="领域实体内存基准")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument(
+        "--variants",
+        nargs="+",
+        choices=list(VARIANTS),
+        default=list(VARIANTS),
+        help="对比的实现（第一个作为基线）",
+    )
+    args = parser.parse_args()
+
+    session_id = new_id()
+    ids = [new_id() for _ in range(args.messages)]
+    contents = [f"message content {i}" for i in range(1000)]
+    base = datetime(2025, 1, 1)
+
+    print(f"{args.messages} 条消息\n")
+    print(f"{'实现':<18}{'总内存(MB)':>12}{'每条(B)':>10}{'构建(s)':>10}")
+    baseline = None
+    for name in args.variants:
+        retained, elapsed = measure(VARIANTS[name], session_id, ids, contents, base)
+        baseline = baseline or retained
+        print(
+            f"{name:<18}{retained / 1024 / 1024:>12.1f}{retained / args.messages:>10.1f}"
+            f"{elapsed:>10.2f}   x{baseline / retained:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
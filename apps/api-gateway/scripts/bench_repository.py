@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+仓储读路径微基准
+
+用法：
+    python scripts/bench_repository.py --messages 1000 --repeat 200
+
+对同一份数据分别以各阶段的实现读取 SQLAlchemyMessageRepository.get_by_session，
+输出单次查询与每行耗时：
+    legacy-uuid    ORM 实例 + 逐值构造 uuid.UUID
+    orm-hydration  ORM 实例 + 缓存的 UUID 转换
+    current        Core 列查询直接构建实体
+默认使用内存 SQLite，结果主要反映 Python 侧的转换与实体构建开销。
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from api_gateway.domain.entities import Message, MessageRole
+from api_gateway.infrastructure.database import Base
+from api_gateway.infrastructure.models import (
+    ChatSessionModel,
+    MessageModel,
+    MessageRoleEnum,
+    UserModel,
+    UUIDBinary,
+)
+from api_gateway.infrastructure.sqlalchemy_repository import SQLAlchemyMessageRepository
+from api_gateway.utils.ids import new_id
+
+
+def _legacy_bind(self, value, dialect):
+    if value is None:
+        return value
+    if isinstance(value, str):
+        return uuid.UUID(value).bytes
+    if isinstance(value, uuid.UUID):
+        return value.bytes
+    return value
+
+
+def _legacy_result(self, value, dialect):
+    if value is None:
+        return value
+    return str(uuid.UUID(bytes=value))
+
+
+async def _orm_get_by_session(self, session_id: str, limit: int = 100) -> list[Message]:
+    """旧实现：加载 ORM 实例再逐字段复制"""
+    stmt = (
+        select(MessageModel)
+        .where(MessageModel.session_id == session_id)
+        .order_by(MessageModel.created_at.desc())
+        .limit(limit)
+    )
+    result = await self.session.execute(stmt)
+    return [
+        Message(
+            id=model.id,
+            session_id=model.session_id,
+            role=MessageRole(model.role.value),
+            content=model.content,
+            tokens=model.tokens,
+            created_at=model.created_at,
+        )
+        for model in reversed(result.scalars().all())
+    ]
+
+
+@contextmanager
+def orm_hydration():
+    """临时换回经 ORM 实例构建实体的读路径"""
+    original = SQLAlchemyMessageRepository.get_by_session
+    SQLAlchemyMessageRepository.get_by_session = _orm_get_by_session
+    try:
+        yield
+    finally:
+        SQLAlchemyMessageRepository.get_by_session = original
+
+
+@contextmanager
+def legacy_uuid():
+    """临时换回逐值解析的 UUIDBinary 实现（叠加 ORM 读路径）"""
+    bind, result = UUIDBinary.process_bind_param, UUIDBinary.process_result_value
+    UUIDBinary.process_bind_param, UUIDBinary.process_result_value = _legacy_bind, _legacy_result
+    try:
+        with orm_hydration():
+            yield
+    finally:
+        UUIDBinary.process_bind_param, UUIDBinary.process_result_value = bind, result
+
+
+@contextmanager
+def current():
+    yield
+
+
+VARIANTS = {
+    "legacy-uuid": legacy_uuid,
+    "orm-hydration": orm_hydration,
+    "current": current,
+}
+
+
+async def seed(session_factory, messages: int) -> str:
+    """写入一个含 N 条消息的会话"""
+    user_id, session_id = new_id(), new_id()
+    base = datetime.utcnow()
+    async with session_factory() as db, db.begin():
+        await db.execute(
+            insert(UserModel),
+            [{"id": user_id, "username": "bench", "email": "bench@local", "hashed_password": "x"}],
+        )
+        await db.execute(
+            insert(ChatSessionModel), [{"id": session_id, "owner_id": user_id, "name": "bench"}]
+        )
+        await db.execute(
+            insert(MessageModel),
+            [
+                {
+                    "id": new_id(),
+                    "session_id": session_id,
+                    "role": MessageRoleEnum.USER if i % 2 == 0 else MessageRoleEnum.ASSISTANT,
+                    "content": f"message {i}",
+                    "tokens": 10,
+                    "created_at": base + timedelta(milliseconds=i),
+                }
+                for i in range(messages)
+            ],
+        )
+    return session_id
+
+
+async def measure(session_factory, session_id: str, limit: int, repeat: int) -> list[float]:
+    """多次读取，返回每次耗时（毫秒）"""
+    timings = []
+    async with session_factory() as db:
+        repo = SQLAlchemyMessageRepository(db)
+        await repo.get_by_session(session_id, limit)  # 预热（语句编译缓存）
+        for _ in range(repeat):
+            db.expunge_all()  # 避免身份映射跳过行处理
+            start = time.perf_counter()
+            await repo.get_by_session(session_id, limit)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def run_variant(args) -> list[float]:
+    """独立引擎上建表、写入并测量（类型处理器按方言缓存，不能跨实现复用引擎）"""
+    engine = create_async_engine(args.url)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    session_id = await seed(session_factory, args.messages)
+    timings = await measure(session_factory, session_id, args.messages, args.repeat)
+    await engine.dispose()
+    return timings
+
+
+async def run(args):
+    print(f"get_by_session(limit={args.messages})，重复 {args.repeat} 次\n")
+    print(f"{'实现':<16}{'平均(ms)':>10}{'P50(ms)':>10}{'每行(µs)':>10}")
+    baseline = None
+    for name in args.variants:
+        with VARIANTS[name]():
+            timings = await run_variant(args)
+        mean = statistics.mean(timings)
+        baseline = baseline or mean
+        print(
+            f"{name:<16}{mean:>10.3f}{statistics.median(timings):>10.3f}"
+            f"{mean * 1000 / args.messages:>10.2f}   x{baseline / mean:.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="仓储读路径微基准")
+    parser.add_argument("--url", default="sqlite+aiosqlite:///:memory:")
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument(
+        "--variants",
+        nargs="+",
+        choices=list(VARIANTS),
+        default=list(VARIANTS),
+        help="对比的实现（第一个作为基线）",
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+网关进程内微基准（pytest-benchmark）
+
+默认测试运行带 --benchmark-disable，每个基准只执行一次作为冒烟测试；测量时：
+
+    pytest tests/benchmarks --benchmark-enable --no-cov
+
+与基线对比（基线按机器存放在 tests/benchmarks/baselines/<机器>/，中位数变慢超过 25% 失败）：
+
+    pytest tests/benchmarks --benchmark-enable --no-cov \\
+        --benchmark-storage=tests/benchmarks/baselines \\
+        --benchmark-compare --benchmark-compare-fail=median:25%
+
+微秒级基准对 CPU 争用敏感，对比须在生成基线的同一台空闲机器上进行。
+热路径有意改动后重新生成基线，与改动一起提交（评审时可直接看基线文件的变化）：
+
+    pytest tests/benchmarks --benchmark-enable --no-cov \\
+        --benchmark-storage=tests/benchmarks/baselines --benchmark-save=baseline
+"""
+
+import asyncio
+from collections.abc import Callable, Coroutine, Generator
+from typing import Any
+
+import httpx
+import pytest
+
+from api_gateway.config import settings
+from api_gateway.main import app
+
+
+@pytest.fixture(scope="module")
+def run() -> Generator[Callable[[Coroutine], Any], None, None]:
+    """在独立事件循环中同步执行协程（benchmark 只接受同步函数）"""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture
+def asgi_client(run, monkeypatch) -> Generator[httpx.AsyncClient, None, None]:
+    """进程内驱动 ASGI 应用；Mock 模式下不访问上游，测得的是网关自身开销"""
+    monkeypatch.setattr(settings, "USE_MOCK", True)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://gateway")
+    yield client
+    run(client.aclose())
@@ -0,0 +1,162 @@
+"""
+基准：按请求 / 按 token 调用的热路径函数
+"""
+
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from api_gateway.infrastructure.database import Base
+from api_gateway.infrastructure.models import ChatSessionModel, MessageModel, UserModel
+from api_gateway.infrastructure.sqlalchemy_repository import SQLAlchemyMessageRepository
+from api_gateway.models.schemas import (
+    ChatCompletionChunk,
+    ChatCompletionChunkChoice,
+    ChatCompletionChunkDelta,
+)
+from api_gateway.utils.logger import JSONFormatter
+from api_gateway.utils.tokens import estimate_messages_tokens
+
+SENTENCE = "请解释一下数据库连接池的工作原理。Explain how the connection pool works. "
+HISTORY_SIZE = 200
+
+
+@pytest.mark.benchmark(group="tokens")
+@pytest.mark.parametrize("chars", [100, 2_000, 12_000])
+def test_estimate_messages_tokens(benchmark, chars):
+    """token 估算随输入长度的开销（12K 字符约为默认输入上限）"""
+    text = (SENTENCE * (chars // len(SENTENCE) + 1))[:chars]
+    messages = [{"role": "system", "content": "你是一个助手。"}, {"role": "user", "content": text}]
+
+    assert benchmark(estimate_messages_tokens, messages) > 0
+
+
+@pytest.mark.benchmark(group="stream")
+def test_chunk_serialization(benchmark):
+    """每个 token 一次：构造并序列化 SSE chunk"""
+    req_id = str(uuid.uuid4())
+
+    def serialize():
+        return ChatCompletionChunk(
+            id=req_id,
+            created=int(time.time()),
+            model="qwen3-14b",
+            choices=[
+                ChatCompletionChunkChoice(
+                    index=0,
+                    delta=ChatCompletionChunkDelta(content="你好"),
+                    finish_reason=None,
+                )
+            ],
+        ).model_dump_json()
+
+    assert '"content":"你好"' in benchmark(serialize)
+
+
+@pytest.fixture
+def devnull_logger():
+    logger = logging.getLogger("benchmark.gateway")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    with open(os.devnull, "w") as stream:
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(JSONFormatter())
+        logger.addHandler(handler)
+        yield logger
+        logger.removeHandler(handler)
+
+
+@pytest.mark.benchmark(group="logging")
+def test_json_logger(benchmark, devnull_logger):
+    """带 extra 字段的一条结构化日志（格式化 + 写出）"""
+    extra = {"input_tokens": 1024, "max_input_tokens": 3072, "queue_time": 0.012}
+
+    benchmark(devnull_logger.info, "Request admitted", extra=extra)
+
+
+@pytest.mark.benchmark(group="repository")
+def test_message_hydration(benchmark):
+    """行元组 → Message 实体（不含数据库往返）"""
+    now = datetime.utcnow()
+    session_id = str(uuid.uuid4())
+    rows = [(str(uuid.uuid4()), session_id, "user", SENTENCE, 20, now) for _ in range(HISTORY_SIZE)]
+
+    def hydrate():
+        return [SQLAlchemyMessageRepository._to_entity(row) for row in rows]
+
+    assert len(benchmark(hydrate)) == HISTORY_SIZE
+
+
+@pytest.fixture(scope="module")
+def history_db(run):
+    """内存 SQLite 中一个含 HISTORY_SIZE 条消息的会话"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    user_id, session_id = str(uuid.uuid4()), str(uuid.uuid4())
+    now = datetime.utcnow()
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(
+                insert(UserModel),
+                [
+                    {
+                        "id": user_id,
+                        "username": "bench",
+                        "email": "bench@example.com",
+                        "hashed_password": "x",
+                        "created_at": now,
+                    }
+                ],
+            )
+            await conn.execute(
+                insert(ChatSessionModel),
+                [
+                    {
+                        "id": session_id,
+                        "owner_id": user_id,
+                        "name": "bench",
+                        "total_tokens": 0,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                ],
+            )
+            await conn.execute(
+                insert(MessageModel),
+                [
+                    {
+                        "id": str(uuid.uuid4()),
+                        "session_id": session_id,
+                        "role": "user" if i % 2 == 0 else "assistant",
+                        "content": SENTENCE * 20,
+                        "tokens": 20,
+                        "created_at": now + timedelta(seconds=i),
+                    }
+                    for i in range(HISTORY_SIZE)
+                ],
+            )
+
+    run(setup())
+    yield engine, session_id
+    run(engine.dispose())
+
+
+@pytest.mark.benchmark(group="repository")
+def test_get_by_session(benchmark, run, history_db):
+    """读取会话历史：查询 + 解压正文 + 构建实体"""
+    engine, session_id = history_db
+
+    async def load():
+        async with AsyncSession(engine) as session:
+            return await SQLAlchemyMessageRepository(session).get_by_session(
+                session_id, limit=HISTORY_SIZE
+            )
+
+    assert len(benchmark(lambda: run(load()))) == HISTORY_SIZE
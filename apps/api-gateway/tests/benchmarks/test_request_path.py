@@ -0,0 +1,71 @@
+"""
+基准：单个请求经过网关的固定开销（路由、校验、中间件、Admission）
+"""
+
+import pytest
+from starlette.requests import Request
+from starlette.responses import Response
+
+from api_gateway.config import settings
+from api_gateway.main import add_request_id
+
+CHAT_BODY = {
+    "model": "qwen3-14b",
+    "messages": [
+        {"role": "system", "content": "你是一个乐于助人的助手。"},
+        {"role": "user", "content": "你好，请简单介绍一下你自己。"},
+    ],
+    "stream": False,
+    "max_tokens": 100,
+}
+
+
+@pytest.mark.benchmark(group="request")
+def test_healthz(benchmark, run, asgi_client):
+    """框架 + 中间件的基线"""
+
+    def request():
+        return run(asgi_client.get("/healthz"))
+
+    assert benchmark(request).status_code == 200
+
+
+@pytest.mark.benchmark(group="request")
+def test_chat_completions_admission(benchmark, run, asgi_client):
+    """请求校验 + token 估算 + max_tokens 改写 + 响应序列化（Mock 模式，不含上游）"""
+
+    def request():
+        return run(asgi_client.post("/v1/chat/completions", json=CHAT_BODY))
+
+    response = benchmark(request)
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"]
+
+
+@pytest.mark.benchmark(group="request")
+def test_chat_completions_rejected(benchmark, run, asgi_client):
+    """输入超长在 Admission 拒绝（413）"""
+    body = {
+        **CHAT_BODY,
+        "messages": [{"role": "user", "content": "压测" * settings.MAX_INPUT_TOKENS * 2}],
+    }
+
+    def request():
+        return run(asgi_client.post("/v1/chat/completions", json=body))
+
+    assert benchmark(request).status_code == 413
+
+
+@pytest.mark.benchmark(group="middleware")
+def test_request_id_middleware(benchmark, run):
+    """请求 ID 中间件本身（不经过路由）"""
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""}
+    response = Response()
+
+    async def call_next(request):
+        return response
+
+    def middleware():
+        return run(add_request_id(Request(scope), call_next))
+
+    assert benchmark(middleware).headers["X-Request-ID"]
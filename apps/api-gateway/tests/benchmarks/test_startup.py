@@ -0,0 +1,31 @@
+"""
+基准：worker 启动时的导入耗时
+
+每轮在新解释器中导入 api_gateway.main（含配置加载、档位解析与路由注册），
+即每个 uvicorn worker 启动时付出的固定成本。排查具体模块时配合：
+
+    python -X importtime -c "import api_gateway.main" 2> import.log
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+APP_DIR = Path(__file__).parents[2]
+
+
+def import_app():
+    subprocess.run(
+        [sys.executable, "-c", "import api_gateway.main"],
+        cwd=APP_DIR,
+        check=True,
+        capture_output=True,
+    )
+
+
+@pytest.mark.benchmark(group="startup", min_rounds=3)
+def test_import_main(benchmark):
+    """新进程导入 api_gateway.main"""
+    benchmark.pedantic(import_app, rounds=5, warmup_rounds=1)
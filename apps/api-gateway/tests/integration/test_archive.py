@@ -0,0 +1,135 @@
+"""
+测试冷会话归档与按需恢复
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from api_gateway.domain.entities import ChatSession, Message, MessageRole
+from api_gateway.infrastructure.archive import MessageArchiver
+from api_gateway.infrastructure.database import Base
+from api_gateway.infrastructure.models import (
+    ChatSessionModel,
+    MessageArchiveModel,
+    MessageModel,
+)
+from api_gateway.infrastructure.sqlalchemy_repository import (
+    SQLAlchemyChatSessionRepository,
+    SQLAlchemyMessageRepository,
+    SQLAlchemyUserRepository,
+)
+from api_gateway.utils.ids import new_id
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'archive.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def _count(db, model) -> int:
+    return await db.scalar(select(func.count()).select_from(model))
+
+
+@pytest.mark.db
+class TestMessageArchiver:
+    """测试归档任务"""
+
+    @pytest.mark.asyncio
+    async def test_archive_and_restore_on_read(self, session_factory, sample_user):
+        """测试冷会话归档后，读取时按需恢复全部消息"""
+        now = datetime.utcnow()
+        cold_id, hot_id = new_id(), new_id()
+
+        async with session_factory() as db:
+            await SQLAlchemyUserRepository(db).save(sample_user)
+            repo = SQLAlchemyChatSessionRepository(db)
+            for session_id in (cold_id, hot_id):
+                await repo.save(ChatSession(id=session_id, owner_id=sample_user.id, name="s"))
+                for i in range(3):
+                    await repo.append_message(
+                        Message(
+                            id=new_id(),
+                            session_id=session_id,
+                            role=MessageRole.USER,
+                            content=f"消息 {i}",
+                            tokens=i + 1,
+                            created_at=now - timedelta(days=120) + timedelta(seconds=i),
+                        )
+                    )
+            await db.execute(
+                update(ChatSessionModel)
+                .where(ChatSessionModel.id == cold_id)
+                .values(updated_at=now - timedelta(days=100))
+            )
+            await db.commit()
+
+        archiver = MessageArchiver(session_factory=session_factory, cold_after_days=90)
+        result = await archiver.run_once(now)
+        assert result == {
+            "archived_sessions": 1,
+            "partitions_created": [],
+            "partitions_dropped": [],
+        }
+
+        async with session_factory() as db:
+            assert await _count(db, MessageModel) == 3
+            archive = await db.get(MessageArchiveModel, cold_id)
+            assert (archive.message_count, archive.total_tokens) == (3, 6)
+
+            # 热表查不到消息时从归档恢复
+            messages = await SQLAlchemyMessageRepository(db).get_by_session(cold_id)
+            assert [m.content for m in messages] == ["消息 0", "消息 1", "消息 2"]
+            assert await _count(db, MessageModel) == 6
+            assert await _count(db, MessageArchiveModel) == 0
+
+        # 已恢复的会话仍是冷会话，下一轮再次归档；恢复走会话读取路径
+        assert await archiver.archive_cold_sessions(now) == 1
+        async with session_factory() as db:
+            repo = SQLAlchemyChatSessionRepository(db)
+            session = await repo.get_by_id(cold_id)
+            assert [m.tokens for m in session.messages] == [1, 2, 3]
+            assert await repo.delete(cold_id)
+            assert await _count(db, MessageModel) == 3
+
+    @pytest.mark.asyncio
+    async def test_empty_session_skips_restore(self, engine, session_factory, sample_user):
+        """测试空会话读取不加锁读归档：已知计数器为 0 时不查归档，否则只做存在性检查"""
+        session_id = new_id()
+        async with session_factory() as db:
+            await SQLAlchemyUserRepository(db).save(sample_user)
+            await SQLAlchemyChatSessionRepository(db).save(
+                ChatSession(id=session_id, owner_id=sample_user.id, name="s")
+            )
+
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            if "message_archives" in statement:
+                statements.append(statement)
+
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            async with session_factory() as db:
+                repo = SQLAlchemyChatSessionRepository(db)
+                assert (await repo.get_by_id(session_id)).messages == []
+                assert statements == []
+
+                assert await repo.get_context_window(session_id, 1000) == []
+                assert await SQLAlchemyMessageRepository(db).get_by_session(session_id) == []
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+        assert len(statements) == 2
+        assert all("EXISTS" in statement and "payload" not in statement for statement in statements)
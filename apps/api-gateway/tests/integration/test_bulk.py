@@ -0,0 +1,70 @@
+"""
+测试批量导入导出
+"""
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from api_gateway.domain.entities import ChatSession, Message, MessageRole
+from api_gateway.infrastructure.bulk import export_data, import_data, read_manifest
+from api_gateway.infrastructure.database import Base
+from api_gateway.infrastructure.models import MessageModel
+from api_gateway.infrastructure.sqlalchemy_repository import (
+    SQLAlchemyChatSessionRepository,
+    SQLAlchemyUserRepository,
+)
+from api_gateway.utils.ids import new_id
+
+
+async def _engine(path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine
+
+
+@pytest.mark.db
+class TestBulkTransfer:
+    """测试导出后导入到另一个库"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("gzip", [False, True])
+    async def test_round_trip(self, tmp_path, sample_user, gzip):
+        """测试导出、导入与重复导入（skip_existing）"""
+        source, target = await _engine(tmp_path / "src.db"), await _engine(tmp_path / "dst.db")
+        session_id = new_id()
+        contents = ["你好", "长回答 " * 500]
+
+        async with async_sessionmaker(source, class_=AsyncSession)() as db:
+            await SQLAlchemyUserRepository(db).save(sample_user)
+            repo = SQLAlchemyChatSessionRepository(db)
+            await repo.save(ChatSession(id=session_id, owner_id=sample_user.id, name="s"))
+            for content in contents:
+                await repo.append_message(
+                    Message(
+                        id=new_id(),
+                        session_id=session_id,
+                        role=MessageRole.ASSISTANT,
+                        content=content,
+                        tokens=len(content),
+                    )
+                )
+
+        dump = tmp_path / "dump"
+        exported = await export_data(source, dump, batch_size=1, compress=gzip)
+        assert exported["messages"] == 2
+        assert read_manifest(dump)["tables"] == exported
+
+        imported = await import_data(target, dump, batch_size=1)
+        assert imported == exported
+        assert await import_data(target, dump, skip_existing=True) == exported
+
+        async with async_sessionmaker(target, class_=AsyncSession)() as db:
+            session = await SQLAlchemyChatSessionRepository(db).get_by_id(session_id)
+            assert [m.content for m in session.messages] == contents
+            assert session.messages[0].role is MessageRole.ASSISTANT
+            assert await db.scalar(select(func.count()).select_from(MessageModel)) == 2
+
+        await source.dispose()
+        await target.dispose()
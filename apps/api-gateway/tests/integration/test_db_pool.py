@@ -0,0 +1,61 @@
+"""
+测试连接池计数
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from api_gateway.infrastructure import database
+from api_gateway.infrastructure.database import InstrumentedAsyncPool, PoolMetrics
+
+
+@pytest.mark.db
+class TestPoolMetrics:
+    """测试连接池指标"""
+
+    @pytest.mark.asyncio
+    async def test_wait_and_timeout_counted(self, tmp_path):
+        """测试借出、排队等待与超时计数"""
+        counters = PoolMetrics()
+
+        class IsolatedPool(InstrumentedAsyncPool):
+            metrics = counters
+
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+            poolclass=IsolatedPool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.2,
+        )
+        database.instrument_engine(engine, counters)
+
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            assert counters.checked_out == 1
+
+            # 唯一的连接被占用，第二次获取排队直至超时
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+
+        async def release_later(conn):
+            await asyncio.sleep(0.05)
+            await conn.close()
+
+        conn = await engine.connect()
+        waiter = asyncio.create_task(release_later(conn))
+        async with engine.connect() as second:
+            await second.execute(text("SELECT 1"))
+        await waiter
+
+        snapshot = counters.snapshot()
+        assert snapshot["connects"] == 1
+        assert snapshot["timeouts"] == 1
+        assert snapshot["checked_out"] == 0
+        assert snapshot["checked_out_peak"] == 1
+        assert snapshot["wait"]["max_ms"] >= 150
+        await engine.dispose()
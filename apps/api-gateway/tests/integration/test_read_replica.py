@@ -0,0 +1,108 @@
+"""
+测试只读副本路由（两个 SQLite 文件模拟主库与滞后的副本）
+"""
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from api_gateway.domain.entities import ChatSession, Message, MessageRole
+from api_gateway.infrastructure import read_routing
+from api_gateway.infrastructure.database import Base
+from api_gateway.infrastructure.read_routing import ReadYourWritesTracker
+from api_gateway.infrastructure.sqlalchemy_repository import (
+    SQLAlchemyChatSessionRepository,
+    SQLAlchemyMessageRepository,
+    SQLAlchemyUserRepository,
+)
+from api_gateway.utils.ids import new_id
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+async def primary_and_replica(tmp_path):
+    """主库与副本会话（副本不复制，始终为空）"""
+    engines = [
+        create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}")
+        for name in ("primary.db", "replica.db")
+    ]
+    for engine in engines:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    factories = [
+        async_sessionmaker(e, class_=AsyncSession, expire_on_commit=False) for e in engines
+    ]
+    async with factories[0]() as primary, factories[1]() as replica:
+        yield primary, replica
+
+    for engine in engines:
+        await engine.dispose()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(
+        read_routing, "_tracker", ReadYourWritesTracker(window_seconds=5, clock=clock)
+    )
+    return clock
+
+
+@pytest.mark.db
+class TestReadReplicaRouting:
+    """测试读写分离与写后粘滞"""
+
+    @pytest.mark.asyncio
+    async def test_sticky_window_after_write(self, primary_and_replica, clock, sample_user):
+        """测试写入后窗口内读主库，窗口过后读副本"""
+        primary, replica = primary_and_replica
+        await SQLAlchemyUserRepository(primary).save(sample_user)
+
+        session_repo = SQLAlchemyChatSessionRepository(primary, read_session=replica)
+        message_repo = SQLAlchemyMessageRepository(primary, read_session=replica)
+        user_repo = SQLAlchemyUserRepository(primary, read_session=replica)
+
+        session_id, message_id = new_id(), new_id()
+        await session_repo.save(ChatSession(id=session_id, owner_id=sample_user.id, name="s1"))
+        await session_repo.append_message(
+            Message(
+                id=message_id, session_id=session_id, role=MessageRole.USER, content="hi", tokens=1
+            )
+        )
+
+        # 窗口内：读到主库刚写入的数据
+        assert [s.id for s in await session_repo.get_by_owner(sample_user.id)] == [session_id]
+        assert [m.id for m in await message_repo.get_by_session(session_id)] == [message_id]
+        assert (await user_repo.get_by_username(sample_user.username)).id == sample_user.id
+
+        # 窗口过后：列表类查询走副本（副本尚未复制到这些数据）
+        clock.now += 6
+        assert await session_repo.get_by_owner(sample_user.id) == []
+        assert await message_repo.get_by_session(session_id) == []
+        assert await user_repo.get_by_username(sample_user.username) is None
+
+        # 会话内读取始终在主库
+        assert (await session_repo.get_by_id(session_id)).messages[0].id == message_id
+
+    @pytest.mark.asyncio
+    async def test_append_marks_owner(self, primary_and_replica, clock, sample_user):
+        """测试追加消息后该用户的会话列表读主库（列表按 updated_at 排序，需读到最新）"""
+        primary, replica = primary_and_replica
+        await SQLAlchemyUserRepository(primary).save(sample_user)
+        session_repo = SQLAlchemyChatSessionRepository(primary, read_session=replica)
+        session_id = new_id()
+        await session_repo.save(ChatSession(id=session_id, owner_id=sample_user.id, name="s1"))
+
+        clock.now += 6
+        await session_repo.append_message(
+            Message(id=new_id(), session_id=session_id, role=MessageRole.USER, content="hi")
+        )
+
+        assert [s.id for s in await session_repo.get_by_owner(sample_user.id)] == [session_id]
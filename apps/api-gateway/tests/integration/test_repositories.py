@@ -6,6 +6,8 @@ import pytest
 
 from api_gateway.infrastructure.sqlalchemy_repository import (
     SQLAlchemyChatSessionRepository,
+    SQLAlchemyMessageRepository,
+    SQLAlchemyUnitOfWork,
     SQLAlchemyUserRepository,
 )
 
@@ -57,6 +59,46 @@ class TestSQLAlchemyChatSessionRepository:
         sessions = await repo.get_by_owner(sample_user.id)
         assert len(sessions) == 2
 
+    @pytest.mark.asyncio
+    async def test_context_window(self, db_session, sample_user, sample_chat_session):
+        """测试按 token 预算倒序取窗口，并原子累加计数器"""
+        import uuid
+        from datetime import datetime, timedelta
+
+        from api_gateway.domain.entities import Message, MessageRole
+
+        await SQLAlchemyUserRepository(db_session).save(sample_user)
+        repo = SQLAlchemyChatSessionRepository(db_session)
+        await repo.save(sample_chat_session)
+
+        base = datetime.utcnow()
+        for i in range(5):
+            await repo.append_message(
+                Message(
+                    id=str(uuid.uuid4()),
+                    session_id=sample_chat_session.id,
+                    role=MessageRole.USER,
+                    content=f"Message {i}",
+                    tokens=10,
+                    created_at=base + timedelta(seconds=i),
+                )
+            )
+
+        window = await repo.get_context_window(sample_chat_session.id, max_tokens=25)
+        assert [m.content for m in window] == ["Message 3", "Message 4"]
+
+        header = await repo.get_by_id(sample_chat_session.id, with_messages=False)
+        assert header.messages == []
+        assert header.total_tokens == 50
+
+        # 完整历史按时间正序，角色转换为领域枚举
+        full = await repo.get_by_id(sample_chat_session.id)
+        assert [m.content for m in full.messages] == [f"Message {i}" for i in range(5)]
+        assert full.messages[0].role is MessageRole.USER
+
+        owned = await repo.get_by_owner(sample_user.id)
+        assert [len(s.messages) for s in owned] == [5]
+
     @pytest.mark.asyncio
     async def test_delete_session(self, db_session, sample_chat_session):
         """测试删除会话"""
@@ -104,3 +146,49 @@ class TestSQLAlchemyUserRepository:
         retrieved = await repo.get_by_username(sample_user.username)
         assert retrieved is not None
         assert retrieved.id == sample_user.id
+
+
+@pytest.mark.db
+class TestSQLAlchemyUnitOfWork:
+    """测试工作单元"""
+
+    @pytest.mark.asyncio
+    async def test_commit_is_atomic(
+        self, db_session, sample_user, sample_chat_session, sample_message
+    ):
+        """测试消息与会话更新一次提交"""
+        await SQLAlchemyUserRepository(db_session).save(sample_user)
+        await SQLAlchemyChatSessionRepository(db_session).save(sample_chat_session)
+
+        sample_message.session_id = sample_chat_session.id
+        async with SQLAlchemyUnitOfWork(db_session) as uow:
+            await uow.sessions.append_message(sample_message)
+            await uow.commit()
+
+        messages = await SQLAlchemyMessageRepository(db_session).get_by_session(
+            sample_chat_session.id
+        )
+        assert [m.id for m in messages] == [sample_message.id]
+        session = await SQLAlchemyChatSessionRepository(db_session).get_by_id(
+            sample_chat_session.id, with_messages=False
+        )
+        assert session.total_tokens == sample_message.tokens
+
+    @pytest.mark.asyncio
+    async def test_rollback_on_error(
+        self, db_session, sample_user, sample_chat_session, sample_message
+    ):
+        """测试异常时整轮写入回滚"""
+        await SQLAlchemyUserRepository(db_session).save(sample_user)
+        await SQLAlchemyChatSessionRepository(db_session).save(sample_chat_session)
+        sample_message.session_id = sample_chat_session.id
+
+        with pytest.raises(RuntimeError):
+            async with SQLAlchemyUnitOfWork(db_session) as uow:
+                await uow.messages.save(sample_message)
+                raise RuntimeError("upstream failed")
+
+        messages = await SQLAlchemyMessageRepository(db_session).get_by_session(
+            sample_chat_session.id
+        )
+        assert messages == []
@@ -0,0 +1,291 @@
+"""
+测试 write-behind 批量持久化
+"""
+
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from api_gateway.domain.entities import Message, MessageRole
+from api_gateway.infrastructure import read_routing
+from api_gateway.infrastructure.models import ChatSessionModel, MessageModel
+from api_gateway.infrastructure.read_routing import ReadYourWritesTracker
+from api_gateway.infrastructure.sqlalchemy_repository import (
+    SQLAlchemyChatSessionRepository,
+    SQLAlchemyUserRepository,
+)
+from api_gateway.infrastructure.write_behind import WriteBehindWriter
+
+
+@pytest.fixture
+def session_factory(db_engine):
+    """会话工厂"""
+    return async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+async def persisted_session(session_factory, sample_user, sample_chat_session):
+    """已落库的用户与会话"""
+    async with session_factory() as db:
+        await SQLAlchemyUserRepository(db).save(sample_user)
+        await SQLAlchemyChatSessionRepository(db).save(sample_chat_session)
+    return sample_chat_session
+
+
+async def _enqueue_turn(writer: WriteBehindWriter, session_id: str, tokens: int = 5):
+    """按 _persist_turn 的顺序提交一轮对话"""
+    user_msg = _message(session_id, "Question", tokens)
+    assistant_msg = _message(session_id, "Answer", tokens)
+    await writer.enqueue_message(user_msg)
+    await writer.enqueue_message(assistant_msg)
+    await writer.enqueue_session_update(session_id, 2 * tokens, assistant_msg.created_at)
+
+
+async def _stored(session_factory, session_id: str) -> tuple[int, int]:
+    async with session_factory() as db:
+        count = await db.scalar(select(func.count()).select_from(MessageModel))
+        total = await db.scalar(
+            select(ChatSessionModel.total_tokens).where(ChatSessionModel.id == session_id)
+        )
+    return count, total
+
+
+def _message(session_id: str, content: str, tokens: int) -> Message:
+    return Message(
+        id=str(uuid.uuid4()),
+        session_id=session_id,
+        role=MessageRole.USER,
+        content=content,
+        tokens=tokens,
+    )
+
+
+@pytest.mark.db
+class TestWriteBehindWriter:
+    """测试 write-behind 写入器"""
+
+    @pytest.mark.asyncio
+    async def test_flush_on_stop(self, session_factory, persisted_session, tmp_path):
+        """测试关闭时刷盘：消息批量写入，计数器累加"""
+        writer = WriteBehindWriter(
+            session_factory=session_factory,
+            max_batch=3,
+            flush_interval_ms=5,
+            journal_path=str(tmp_path / "journal.jsonl"),
+        )
+        await writer.start()
+
+        for i in range(5):
+            msg = _message(persisted_session.id, f"Message {i}", 10)
+            await writer.enqueue_message(msg)
+            await writer.enqueue_session_update(persisted_session.id, msg.tokens, msg.created_at)
+
+        await writer.stop()
+
+        async with session_factory() as db:
+            count = await db.scalar(select(func.count()).select_from(MessageModel))
+            total = await db.scalar(
+                select(ChatSessionModel.total_tokens).where(
+                    ChatSessionModel.id == persisted_session.id
+                )
+            )
+        assert count == 5
+        assert total == 50
+        assert not (tmp_path / "journal.jsonl").exists()
+
+    @pytest.mark.asyncio
+    async def test_flush_marks_session_and_owner(
+        self, session_factory, persisted_session, monkeypatch
+    ):
+        """测试配置只读副本时，落库后会话与所属用户都进入粘滞窗口"""
+        tracker = ReadYourWritesTracker()
+        monkeypatch.setattr(read_routing, "_tracker", tracker)
+        writer = WriteBehindWriter(session_factory=session_factory, track_owners=True)
+        await writer.start()
+        await _enqueue_turn(writer, persisted_session.id)
+        await writer.stop()
+
+        assert tracker.is_sticky(persisted_session.id)
+        assert tracker.is_sticky(persisted_session.owner_id)
+
+    @pytest.mark.asyncio
+    async def test_spill_and_replay(self, session_factory, persisted_session, tmp_path):
+        """测试数据库不可用时写入日志，恢复后回放"""
+        journal = tmp_path / "journal.jsonl"
+
+        def broken_factory():
+            raise ConnectionError("database is down")
+
+        writer = WriteBehindWriter(
+            session_factory=broken_factory, flush_interval_ms=1, journal_path=str(journal)
+        )
+        await writer.start()
+        msg = _message(persisted_session.id, "Hello", 7)
+        await writer.enqueue_message(msg)
+        await writer.enqueue_session_update(persisted_session.id, msg.tokens, msg.created_at)
+        await writer.stop()
+
+        assert journal.exists()
+        assert len(journal.read_text(encoding="utf-8").splitlines()) == 2
+
+        # 数据库恢复后，启动时回放日志
+        writer = WriteBehindWriter(session_factory=session_factory, journal_path=str(journal))
+        await writer.start()
+        await writer.stop()
+
+        assert not journal.exists()
+        async with session_factory() as db:
+            stored = await db.scalar(select(MessageModel).where(MessageModel.id == msg.id))
+            total = await db.scalar(
+                select(ChatSessionModel.total_tokens).where(
+                    ChatSessionModel.id == persisted_session.id
+                )
+            )
+        assert stored.content == "Hello"
+        assert total == 7
+
+    @pytest.mark.asyncio
+    async def test_bad_turn_goes_to_dead_letter(
+        self, db_engine, session_factory, persisted_session, tmp_path
+    ):
+        """测试整批失败时逐轮重试：违反外键的一轮进死信，其余照常落库且不进日志"""
+        # SQLite 默认不检查外键（内存库只有一个连接）
+        async with db_engine.connect() as conn:
+            await conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+        journal = tmp_path / "journal.jsonl"
+        writer = WriteBehindWriter(
+            session_factory=session_factory, flush_interval_ms=50, journal_path=str(journal)
+        )
+        await writer.start()
+        await _enqueue_turn(writer, persisted_session.id)
+        await _enqueue_turn(writer, str(uuid.uuid4()))  # 会话不存在
+        await _enqueue_turn(writer, persisted_session.id)
+        await writer.stop()
+
+        assert await _stored(session_factory, persisted_session.id) == (4, 20)
+        assert not journal.exists()
+        dead = journal.with_suffix(".jsonl.dead").read_text(encoding="utf-8").splitlines()
+        assert len(dead) == 3
+
+    @pytest.mark.asyncio
+    async def test_replay_is_idempotent(self, session_factory, persisted_session, tmp_path):
+        """测试已落库的条目再次回放（提交成功但确认丢失）时不重复写入、不重复计数"""
+        journal = tmp_path / "journal.jsonl"
+
+        def broken_factory():
+            raise ConnectionError("database is down")
+
+        writer = WriteBehindWriter(
+            session_factory=broken_factory, flush_interval_ms=1, journal_path=str(journal)
+        )
+        await writer.start()
+        await _enqueue_turn(writer, persisted_session.id)
+        await writer.stop()
+        entries = journal.read_text(encoding="utf-8")
+
+        for _ in range(2):
+            journal.write_text(entries, encoding="utf-8")
+            writer = WriteBehindWriter(session_factory=session_factory, journal_path=str(journal))
+            await writer.start()
+            await writer.stop()
+
+        assert await _stored(session_factory, persisted_session.id) == (2, 10)
+        assert not journal.exists()
+        assert not journal.with_suffix(".jsonl.dead").exists()
+
+    @pytest.mark.asyncio
+    async def test_leftover_replay_file(self, session_factory, persisted_session, tmp_path):
+        """测试上次回放中途退出遗留的 .replay 不被新日志覆盖，启动时与新日志一并回放"""
+        journal = tmp_path / "journal.jsonl"
+
+        def broken_factory():
+            raise ConnectionError("database is down")
+
+        for path in (journal.with_suffix(".jsonl.replay"), journal):
+            spilled = tmp_path / f"{path.name}.tmp"
+            writer = WriteBehindWriter(
+                session_factory=broken_factory, flush_interval_ms=1, journal_path=str(spilled)
+            )
+            await writer.start()
+            await _enqueue_turn(writer, persisted_session.id)
+            await writer.stop()
+            spilled.rename(path)
+
+        writer = WriteBehindWriter(session_factory=session_factory, journal_path=str(journal))
+        await writer.start()
+        await writer.stop()
+
+        assert await _stored(session_factory, persisted_session.id) == (4, 20)
+        assert not journal.exists()
+        assert not journal.with_suffix(".jsonl.replay").exists()
+
+    @pytest.mark.asyncio
+    async def test_stop_spills_inflight_batch(self, persisted_session, tmp_path):
+        """测试刷盘卡住、关闭超时取消任务时，手中的批次转存日志而不丢失"""
+        journal = tmp_path / "journal.jsonl"
+
+        class HangingSession:
+            async def __aenter__(self):
+                await asyncio.Event().wait()
+
+            async def __aexit__(self, *exc):
+                return False
+
+        writer = WriteBehindWriter(
+            session_factory=HangingSession, flush_interval_ms=1, journal_path=str(journal)
+        )
+        await writer.start()
+        await _enqueue_turn(writer, persisted_session.id)
+        await writer.stop(timeout=0.05)
+
+        assert len(journal.read_text(encoding="utf-8").splitlines()) == 3
+
+    @pytest.mark.asyncio
+    async def test_shared_journal_replayed_once(self, session_factory, persisted_session, tmp_path):
+        """测试多个 worker 共用日志路径：一个 worker 回放期间，其他 worker 跳过回放"""
+        journal = tmp_path / "journal.jsonl"
+
+        def broken_factory():
+            raise ConnectionError("database is down")
+
+        writer = WriteBehindWriter(
+            session_factory=broken_factory, flush_interval_ms=1, journal_path=str(journal)
+        )
+        await writer.start()
+        await _enqueue_turn(writer, persisted_session.id)
+        await writer.stop()
+
+        gate = asyncio.Event()
+
+        class GatedSession:
+            def __init__(self):
+                self.session = session_factory()
+
+            async def __aenter__(self):
+                await gate.wait()
+                return await self.session.__aenter__()
+
+            async def __aexit__(self, *exc):
+                return await self.session.__aexit__(*exc)
+
+        first = WriteBehindWriter(session_factory=GatedSession, journal_path=str(journal))
+        starting = asyncio.create_task(first.start())
+        while not journal.with_suffix(".jsonl.replay").exists():
+            await asyncio.sleep(0.01)
+
+        second = WriteBehindWriter(session_factory=session_factory, journal_path=str(journal))
+        await second.start()
+        await second.stop()
+        assert await _stored(session_factory, persisted_session.id) == (0, 0)
+
+        gate.set()
+        await starting
+        await first.stop()
+
+        assert await _stored(session_factory, persisted_session.id) == (2, 10)
+        assert not journal.exists()
+        assert not journal.with_suffix(".jsonl.replay").exists()
+        assert not journal.with_suffix(".jsonl.dead").exists()
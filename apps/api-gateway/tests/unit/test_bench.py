@@ -0,0 +1,74 @@
+"""
+测试压测脚本 scripts/bench.py 的统计与回归对比逻辑
+"""
+
+import importlib.util
+import random
+from pathlib import Path
+
+import pytest
+
+BENCH_PATH = Path(__file__).parents[4] / "scripts" / "bench.py"
+if not BENCH_PATH.exists():
+    pytest.skip("scripts/bench.py 不在当前检出中", allow_module_level=True)
+
+_spec = importlib.util.spec_from_file_location("bench", BENCH_PATH)
+bench = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bench)
+
+
+class TestBenchmarkStats:
+    """测试压测统计"""
+
+    def test_non_stream_excluded_from_ttft(self):
+        """测试非流式请求只计入总耗时，不计入 TTFT"""
+        stats = bench.BenchmarkStats()
+        for i in range(4):
+            stats.add_result(True, first_token_latency=0.1, total_latency=1.0 + i / 10)
+        stats.add_result(True, total_latency=30.0, output_tokens=200)
+        stats.add_result(False, error_code=503)
+
+        summary = stats.summary()
+        assert summary["success"] == 5
+        assert summary["ttft"]["count"] == 4
+        assert summary["ttft"]["p95"] == pytest.approx(0.1)
+        assert summary["total_latency"]["count"] == 5
+        assert summary["total_latency"]["max"] == 30.0
+
+
+def _write_result(path: Path, seed: int, scale: float) -> Path:
+    """合成一次压测结果：TTFT / 总耗时样本按 scale 放大"""
+    rng = random.Random(seed)
+    stats = bench.BenchmarkStats()
+    for _ in range(300):
+        ttft = rng.gauss(0.5, 0.05) * scale
+        stats.add_result(True, first_token_latency=ttft, total_latency=ttft + rng.gauss(2, 0.2))
+    stats.duration = 30.0
+    bench.write_json(path, {"profile": "DEV_32G", "mode": "open", "rate": 10}, stats)
+    return path
+
+
+class TestCompare:
+    """测试 compare 的退化判定（固定随机种子，结果确定）"""
+
+    def test_regression_detected(self, tmp_path):
+        """测试 TTFT 整体变慢 30%：判定退化，差值置信区间在 0 之上"""
+        base = _write_result(tmp_path / "base.json", seed=1, scale=1.0)
+        new = _write_result(tmp_path / "new.json", seed=2, scale=1.3)
+
+        rows = bench.compare_results(
+            bench._load_result(base), bench._load_result(new), 0.10, 0.01, 200, seed=0
+        )
+        ttft_p95 = next(row for row in rows if row["metric"] == "TTFT P95")
+        assert ttft_p95["regression"]
+        assert ttft_p95["change"] > 0.10 and ttft_p95["ci"][0] > 0
+        assert bench.compare_main([str(base), str(new), "--bootstrap", "200"]) == 1
+
+    def test_noise_not_flagged(self, tmp_path):
+        """测试同分布的两次结果（仅采样噪声）与性能提升均不判定退化"""
+        base = _write_result(tmp_path / "base.json", seed=1, scale=1.0)
+        same = _write_result(tmp_path / "same.json", seed=2, scale=1.0)
+        faster = _write_result(tmp_path / "faster.json", seed=3, scale=0.7)
+
+        assert bench.compare_main([str(base), str(same), "--bootstrap", "200"]) == 0
+        assert bench.compare_main([str(base), str(faster), "--bootstrap", "200"]) == 0
@@ -0,0 +1,174 @@
+"""
+测试读穿透会话缓存
+"""
+
+import uuid
+from unittest.mock import patch
+
+import pytest
+
+from api_gateway.domain.entities import Message, MessageRole
+from api_gateway.infrastructure.cached_repository import (
+    CachedChatSessionRepository,
+    CachedUnitOfWork,
+    LocalVersionStore,
+    SessionCache,
+)
+from api_gateway.infrastructure.memory_repository import (
+    InMemoryChatSessionRepository,
+    InMemoryMessageRepository,
+    InMemoryUnitOfWork,
+)
+
+
+def _message(session_id: str, content: str, tokens: int = 10) -> Message:
+    return Message(
+        id=str(uuid.uuid4()),
+        session_id=session_id,
+        role=MessageRole.USER,
+        content=content,
+        tokens=tokens,
+    )
+
+
+@pytest.fixture
+async def inner_repo(sample_chat_session):
+    """已保存示例会话的内存仓储"""
+    repo = InMemoryChatSessionRepository()
+    await repo.save(sample_chat_session)
+    return repo
+
+
+class TestCachedChatSessionRepository:
+    """测试带缓存的会话仓储"""
+
+    @pytest.mark.asyncio
+    async def test_hit_skips_inner(self, inner_repo, sample_chat_session):
+        """测试命中时不访问底层仓储"""
+        repo = CachedChatSessionRepository(inner_repo, SessionCache(LocalVersionStore()))
+
+        await repo.get_by_id(sample_chat_session.id, with_messages=False)
+        await repo.get_context_window(sample_chat_session.id, 1000)
+
+        with (
+            patch.object(inner_repo, "get_by_id") as get_by_id,
+            patch.object(inner_repo, "get_context_window") as get_window,
+        ):
+            header = await repo.get_by_id(sample_chat_session.id, with_messages=False)
+            window = await repo.get_context_window(sample_chat_session.id, 1000)
+
+        get_by_id.assert_not_called()
+        get_window.assert_not_called()
+        assert header.id == sample_chat_session.id
+        assert window == []
+
+    @pytest.mark.asyncio
+    async def test_append_keeps_cache_current(self, inner_repo, sample_chat_session):
+        """测试写路径同步更新缓存"""
+        repo = CachedChatSessionRepository(inner_repo, SessionCache(LocalVersionStore()))
+        await repo.get_by_id(sample_chat_session.id, with_messages=False)
+        await repo.get_context_window(sample_chat_session.id, 1000)
+
+        for i in range(3):
+            await repo.append_message(_message(sample_chat_session.id, f"Message {i}"))
+
+        with patch.object(inner_repo, "get_context_window") as get_window:
+            window = await repo.get_context_window(sample_chat_session.id, 25)
+            header = await repo.get_by_id(sample_chat_session.id, with_messages=False)
+
+        get_window.assert_not_called()
+        assert [m.content for m in window] == ["Message 1", "Message 2"]
+        assert header.total_tokens == 30
+
+    @pytest.mark.asyncio
+    async def test_other_worker_write_invalidates(self, inner_repo, sample_chat_session):
+        """测试其他 worker 递增版本号后缓存失效"""
+        store = LocalVersionStore()
+        repo = CachedChatSessionRepository(inner_repo, SessionCache(store))
+        other = CachedChatSessionRepository(inner_repo, SessionCache(store))
+
+        await repo.get_by_id(sample_chat_session.id, with_messages=False)
+        await repo.get_context_window(sample_chat_session.id, 1000)
+        await other.append_message(_message(sample_chat_session.id, "from other worker"))
+
+        window = await repo.get_context_window(sample_chat_session.id, 1000)
+        assert [m.content for m in window] == ["from other worker"]
+
+    @pytest.mark.asyncio
+    async def test_append_during_fill_skips_stale_window(self, inner_repo, sample_chat_session):
+        """测试回源加载窗口期间有追加写入时，不回填过期窗口"""
+        repo = CachedChatSessionRepository(inner_repo, SessionCache(LocalVersionStore()))
+        await repo.get_by_id(sample_chat_session.id, with_messages=False)
+        load = inner_repo.get_context_window
+
+        async def load_then_append(session_id, max_tokens):
+            messages = await load(session_id, max_tokens)
+            await repo.append_message(_message(session_id, "during fill"))
+            return messages
+
+        with patch.object(inner_repo, "get_context_window", side_effect=load_then_append):
+            assert await repo.get_context_window(sample_chat_session.id, 1000) == []
+
+        window = await repo.get_context_window(sample_chat_session.id, 1000)
+        assert [m.content for m in window] == ["during fill"]
+
+    @pytest.mark.asyncio
+    async def test_window_eviction_falls_back(self, inner_repo, sample_chat_session):
+        """测试窗口挤出旧消息后，超出覆盖范围的预算回源"""
+        repo = CachedChatSessionRepository(
+            inner_repo, SessionCache(LocalVersionStore(), window_size=2)
+        )
+        await repo.get_by_id(sample_chat_session.id, with_messages=False)
+        await repo.get_context_window(sample_chat_session.id, 1000)
+        for i in range(3):
+            await repo.append_message(_message(sample_chat_session.id, f"Message {i}"))
+
+        window = await repo.get_context_window(sample_chat_session.id, 1000)
+        assert len(window) == 3
+
+    @pytest.mark.asyncio
+    async def test_unit_of_work_rollback_discards(self, inner_repo, sample_chat_session):
+        """测试工作单元回滚时不更新缓存"""
+        cache = SessionCache(LocalVersionStore())
+        repo = CachedChatSessionRepository(inner_repo, cache)
+        await repo.get_by_id(sample_chat_session.id, with_messages=False)
+
+        uow = CachedUnitOfWork(
+            InMemoryUnitOfWork(inner_repo, InMemoryMessageRepository(sessions=inner_repo)), cache
+        )
+        with pytest.raises(RuntimeError):
+            async with uow:
+                await uow.sessions.append_message(_message(sample_chat_session.id, "lost"))
+                raise RuntimeError("stream failed")
+
+        _, entry = await cache.lookup(sample_chat_session.id)
+        assert entry is not None
+        assert entry.header.total_tokens == 0
+
+
+class TestVersionStore:
+    """测试版本号存储与缓存条目过期"""
+
+    @pytest.mark.asyncio
+    async def test_local_store_bounded_without_rollback(self):
+        """测试本地版本号有界，淘汰后版本号不回退到旧值"""
+        store = LocalVersionStore(max_keys=2)
+        assert await store.bump("a") == 1
+        await store.bump("b")
+        await store.bump("c")  # 淘汰 a
+
+        assert len(store._versions) == 2
+        assert await store.get("a") > 1
+        assert await store.bump("a") > 2
+
+    @pytest.mark.asyncio
+    async def test_entry_expires(self, sample_chat_session):
+        """测试缓存条目超过 TTL 后失效"""
+        now = [0.0]
+        cache = SessionCache(LocalVersionStore(), ttl_seconds=10, clock=lambda: now[0])
+        cache.put_header(sample_chat_session.id, 0, sample_chat_session)
+
+        assert (await cache.lookup(sample_chat_session.id))[1] is not None
+        now[0] = 10
+        assert (await cache.lookup(sample_chat_session.id))[1] is None
+        assert len(cache) == 0
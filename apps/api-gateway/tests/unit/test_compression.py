@@ -0,0 +1,35 @@
+"""
+测试长文本压缩列
+"""
+
+import pytest
+
+from api_gateway.infrastructure import models
+from api_gateway.infrastructure.models import compress_text, decompress_text
+
+LONG_TEXT = "连接池耗尽时请求会排队等待。Connection pool exhaustion shows up as timeouts. " * 50
+
+
+class TestCompressedText:
+    """测试压缩格式与兼容性"""
+
+    @pytest.mark.parametrize("algorithm", ["auto", "zstd", "zlib", "none"])
+    def test_round_trip(self, algorithm):
+        """测试各算法往返一致，长文本被压缩"""
+        blob = compress_text(LONG_TEXT, algorithm, 512)
+        assert decompress_text(blob) == LONG_TEXT
+        if algorithm != "none":
+            assert len(blob) < len(LONG_TEXT.encode("utf-8")) / 2
+
+    def test_short_text_and_legacy_rows(self):
+        """测试短文本不压缩，无标记的旧数据按 UTF-8 读取"""
+        assert compress_text("你好", "zlib", 512) == b"\xfc" + "你好".encode()
+        assert decompress_text("旧数据 legacy".encode()) == "旧数据 legacy"
+        assert decompress_text(b"") == ""
+
+    def test_zlib_fallback_without_zstandard(self, monkeypatch):
+        """测试未安装 zstandard 时回退 zlib"""
+        monkeypatch.setattr(models, "_zstd", lambda: None)
+        blob = compress_text(LONG_TEXT, "zstd", 512)
+        assert blob[0] == 0xFE
+        assert decompress_text(blob) == LONG_TEXT
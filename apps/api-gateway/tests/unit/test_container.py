@@ -0,0 +1,60 @@
+"""
+测试依赖注入容器
+"""
+
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+
+import pytest
+
+from api_gateway.infrastructure.memory_repository import InMemoryChatSessionRepository
+from api_gateway.infrastructure.sqlalchemy_repository import SQLAlchemyChatSessionRepository
+from api_gateway.presentation import container as container_module
+from api_gateway.presentation.container import AppContainer, get_container
+
+
+@pytest.fixture
+def memory_app_container():
+    """内存模式的应用级容器"""
+    with patch.object(container_module.settings, "DATABASE_URL", "memory://"):
+        app_container = AppContainer()
+    with patch.object(container_module, "_app_container", app_container):
+        yield app_container
+
+
+request_container = asynccontextmanager(get_container)
+
+
+class TestContainer:
+    """测试容器作用域"""
+
+    @pytest.mark.asyncio
+    async def test_memory_state_shared_across_requests(
+        self, memory_app_container, sample_chat_session
+    ):
+        """测试内存模式下仓储跨请求共享，且不打开数据库会话"""
+        with patch.object(container_module, "AsyncSessionLocal", side_effect=AssertionError):
+            async with request_container() as first:
+                await first.session_repo.save(sample_chat_session)
+            async with request_container() as second:
+                pass
+
+        assert second is first
+        assert isinstance(second.session_repo, InMemoryChatSessionRepository)
+        assert await second.session_repo.get_by_id(sample_chat_session.id) is not None
+
+    @pytest.mark.asyncio
+    async def test_database_mode_reuses_shared_components(self, db_session):
+        """测试数据库模式下每请求只注入数据库会话"""
+        app_container = AppContainer()
+        with (
+            patch.object(container_module, "_app_container", app_container),
+            patch.object(container_module, "AsyncSessionLocal", return_value=db_session),
+        ):
+            async with request_container() as first, request_container() as second:
+                assert first.session_repo.session is db_session
+
+        assert first is not second
+        assert isinstance(first.session_repo, SQLAlchemyChatSessionRepository)
+        assert first.llm_client is second.llm_client is app_container.llm_client
+        assert first.chat_service is app_container.chat_service
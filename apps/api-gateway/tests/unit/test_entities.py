@@ -4,7 +4,7 @@
 
 from datetime import datetime
 
-from api_gateway.domain.entities import Message, MessageRole
+from api_gateway.domain.entities import ChatSession, Message, MessageHistory, MessageRole
 
 
 class TestMessage:
@@ -24,6 +24,12 @@ class TestMessage:
         assert MessageRole.ASSISTANT.value == "assistant"
         assert MessageRole.SYSTEM.value == "system"
 
+    def test_role_interned_and_slotted(self):
+        """测试字符串角色转换为枚举单例，实例不带 __dict__"""
+        msg = Message(id="1", session_id="s", role="assistant", content="hi")
+        assert msg.role is MessageRole.ASSISTANT
+        assert not hasattr(msg, "__dict__")
+
 
 class TestChatSession:
     """测试会话实体"""
@@ -87,6 +93,42 @@ class TestChatSession:
         assert context[1].content == "Message 4"
 
 
+class TestMessageHistory:
+    """测试列式消息历史"""
+
+    def test_matches_list_semantics(self, sample_chat_session):
+        """测试与列表存储的会话取窗口结果一致"""
+        import uuid
+        from datetime import timedelta
+
+        base = datetime(2025, 1, 1, 12, 0, 0, 123456)
+        for i in range(6):
+            sample_chat_session.add_message(
+                Message(
+                    id=str(uuid.uuid4()),
+                    session_id=sample_chat_session.id,
+                    role=MessageRole.USER if i % 2 == 0 else MessageRole.ASSISTANT,
+                    content=f"Message {i}",
+                    tokens=i * 5,
+                    created_at=base + timedelta(seconds=i),
+                )
+            )
+        compact = ChatSession(
+            id=sample_chat_session.id,
+            owner_id=None,
+            name="compact",
+            messages=MessageHistory(sample_chat_session.id, sample_chat_session.messages),
+        )
+
+        assert compact.messages == sample_chat_session.messages
+        assert compact.messages[-1].created_at == base + timedelta(seconds=5)
+        assert compact.messages.total_tokens == 75
+        for budget in (0, 1, 25, 45, 70, 75, 1000):
+            assert compact.get_context_messages(budget) == (
+                sample_chat_session.get_context_messages(budget)
+            )
+
+
 class TestUser:
     """测试用户实体"""
 
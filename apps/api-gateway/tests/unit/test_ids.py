@@ -0,0 +1,52 @@
+"""
+测试 ID 生成
+"""
+
+import uuid
+
+import pytest
+
+from api_gateway.infrastructure.models import uuid_bytes_to_str, uuid_str_to_bytes
+from api_gateway.utils.ids import new_id, uuid7
+
+
+class TestUUID7:
+    """测试 UUIDv7"""
+
+    def test_version_and_variant(self):
+        """测试版本号与变体位"""
+        value = uuid7()
+        assert value.version == 7
+        assert value.variant == uuid.RFC_4122
+
+    def test_monotonic(self):
+        """测试连续生成的 ID 单调递增（聚簇索引顺序追加）"""
+        ids = [uuid7() for _ in range(10000)]
+        assert ids == sorted(ids)
+        assert len(set(ids)) == len(ids)
+
+    def test_new_id_is_string(self):
+        """测试字符串形式可被 UUIDBinary 解析"""
+        assert uuid.UUID(new_id()).version == 7
+
+
+class TestUUIDConversion:
+    """测试 UUIDBinary 使用的字符串/字节转换"""
+
+    def test_round_trip(self):
+        """测试与 uuid 模块结果一致"""
+        for value in [uuid.uuid4(), uuid7()]:
+            raw = uuid_str_to_bytes(str(value))
+            assert raw == value.bytes
+            assert uuid_bytes_to_str(raw) == str(value)
+
+    def test_non_canonical_input(self):
+        """测试大写与大括号写法回退到 uuid 模块解析"""
+        value = uuid.uuid4()
+        assert uuid_str_to_bytes(str(value).upper()) == value.bytes
+        assert uuid_str_to_bytes(f"{{{value}}}") == value.bytes
+
+    def test_invalid_input(self):
+        """测试非法字符串抛出 ValueError"""
+        with pytest.raises(ValueError):
+            uuid_str_to_bytes("not-a-uuid")
@@ -0,0 +1,116 @@
+"""
+测试内存仓储
+"""
+
+import pytest
+
+from api_gateway.domain.entities import ChatSession, Message, MessageRole, User
+from api_gateway.infrastructure.memory_repository import (
+    InMemoryChatSessionRepository,
+    InMemoryMessageRepository,
+    InMemoryUserRepository,
+)
+
+
+def _message(session_id: str, i: int) -> Message:
+    return Message(
+        id=f"{session_id}-{i}",
+        session_id=session_id,
+        role=MessageRole.USER,
+        content=f"Message {i}",
+        tokens=10,
+    )
+
+
+class TestInMemoryChatSessionRepository:
+    """测试内存会话仓储"""
+
+    @pytest.mark.asyncio
+    async def test_owner_index_ordered_by_last_write(self):
+        """测试按用户获取会话，最近写入的排在前面"""
+        repo = InMemoryChatSessionRepository()
+        for name in ("a", "b", "c"):
+            await repo.save(ChatSession(id=name, owner_id="u1", name=name))
+        await repo.save(ChatSession(id="x", owner_id="u2", name="x"))
+
+        await repo.append_message(_message("a", 0))
+        assert [s.id for s in await repo.get_by_owner("u1")] == ["a", "c", "b"]
+
+        await repo.delete("c")
+        assert [s.id for s in await repo.get_by_owner("u1")] == ["a", "b"]
+        assert [s.id for s in await repo.get_by_owner("u2")] == ["x"]
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction_and_bounded_history(self):
+        """测试会话数 LRU 淘汰与每会话消息上限"""
+        repo = InMemoryChatSessionRepository(max_sessions=2, max_messages=3)
+        await repo.save(ChatSession(id="a", owner_id="u1", name="a"))
+        await repo.save(ChatSession(id="b", owner_id="u1", name="b"))
+        await repo.get_by_id("a")  # a 变为最近访问
+        await repo.save(ChatSession(id="c", owner_id="u1", name="c"))
+
+        assert await repo.get_by_id("b") is None
+        assert [s.id for s in await repo.get_by_owner("u1")] == ["c", "a"]
+
+        for i in range(5):
+            await repo.append_message(_message("a", i))
+        session = await repo.get_by_id("a")
+        assert [m.content for m in session.messages] == ["Message 2", "Message 3", "Message 4"]
+        assert session.total_tokens == 50
+
+
+class TestInMemoryMessageRepository:
+    """测试内存消息仓储"""
+
+    @pytest.mark.asyncio
+    async def test_bounded_messages(self):
+        """测试每会话消息上限与会话数淘汰"""
+        repo = InMemoryMessageRepository(max_sessions=1, max_messages=3)
+        for i in range(5):
+            await repo.save(_message("a", i))
+
+        assert [m.content for m in await repo.get_by_session("a", limit=2)] == [
+            "Message 3",
+            "Message 4",
+        ]
+        assert len(await repo.get_by_session("a")) == 3
+
+        await repo.save(_message("b", 0))
+        assert await repo.get_by_session("a") == []
+
+    @pytest.mark.asyncio
+    async def test_reads_session_history(self):
+        """测试共用会话历史：消息只存一份，上限由会话仓储决定"""
+        sessions = InMemoryChatSessionRepository(max_messages=3)
+        repo = InMemoryMessageRepository(sessions=sessions)
+        await sessions.save(ChatSession(id="a", owner_id="u1", name="a"))
+        for i in range(4):
+            await sessions.append_message(_message("a", i))
+        await repo.save(_message("a", 4))
+        await repo.save(_message("missing", 0))
+
+        session = await sessions.get_by_id("a")
+        assert [m.content for m in await repo.get_by_session("a", limit=2)] == [
+            "Message 3",
+            "Message 4",
+        ]
+        assert [m.content for m in session.messages] == ["Message 2", "Message 3", "Message 4"]
+        assert session.total_tokens == 40
+        assert repo._storage == {}
+        assert await repo.get_by_session("missing") == []
+
+
+class TestInMemoryUserRepository:
+    """测试内存用户仓储"""
+
+    @pytest.mark.asyncio
+    async def test_username_index(self):
+        """测试用户名索引随改名更新"""
+        repo = InMemoryUserRepository()
+        user = User(id="1", username="alice", email="a@x", hashed_password="x")
+        await repo.save(user)
+        assert await repo.get_by_username("alice") is user
+
+        await repo.save(User(id="1", username="alice2", email="a@x", hashed_password="x"))
+        assert await repo.get_by_username("alice") is None
+        assert (await repo.get_by_username("alice2")).id == "1"
@@ -0,0 +1,40 @@
+"""
+测试分区 DDL 辅助函数
+"""
+
+from datetime import date
+
+from api_gateway.infrastructure.partitioning import (
+    add_months,
+    month_range,
+    mysql_partition_definitions,
+    partition_name,
+    postgres_partition_ddl,
+)
+
+
+class TestPartitionHelpers:
+    """测试按月分区计算"""
+
+    def test_month_arithmetic(self):
+        """测试跨年的月份加减与区间"""
+        assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+        assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+        assert month_range(date(2026, 11, 20), date(2027, 1, 5)) == [
+            date(2026, 11, 1),
+            date(2026, 12, 1),
+            date(2027, 1, 1),
+        ]
+
+    def test_ddl(self):
+        """测试 MySQL / PostgreSQL 分区 DDL"""
+        months = [date(2026, 12, 1)]
+        assert partition_name(months[0]) == "p202612"
+        assert mysql_partition_definitions(months) == (
+            "PARTITION p202612 VALUES LESS THAN ('2027-01-01'),\n"
+            "    PARTITION pmax VALUES LESS THAN (MAXVALUE)"
+        )
+        assert postgres_partition_ddl(months[0]) == (
+            "CREATE TABLE IF NOT EXISTS messages_p202612 PARTITION OF messages "
+            "FOR VALUES FROM ('2026-12-01') TO ('2027-01-01')"
+        )
@@ -0,0 +1,61 @@
+"""
+测试档位解析与显存探测
+"""
+
+import time
+
+import pytest
+
+from api_gateway import config
+from api_gateway.config import Settings, detect_gpu_memory, resolve_profile
+
+
+@pytest.fixture
+def probes(monkeypatch):
+    """替换 NVML 探测并重置缓存，记录探测次数"""
+    calls = []
+
+    def fake_probe(result):
+        calls.append(1)
+        result.append(48)
+
+    monkeypatch.setattr(config, "_probe_gpu_memory", fake_probe)
+    monkeypatch.setattr(config, "_gpu_probed", False)
+    monkeypatch.setattr(config, "_gpu_memory", None)
+    config._resolve_profile.cache_clear()
+    yield calls
+    config._resolve_profile.cache_clear()
+
+
+class TestResolveProfile:
+    """测试档位解析"""
+
+    def test_multi_user_probes_once(self, probes):
+        """测试多人模式只探测一次显存，结果缓存"""
+        settings = Settings(SINGLE_USER=False, FORCE_PROFILE=None)
+
+        first = resolve_profile(settings)
+        assert resolve_profile(settings) is first
+        assert detect_gpu_memory() == 48
+        assert first.name == "SRV_48G" and first.gpu_memory_gb == 48
+        assert len(probes) == 1
+
+    @pytest.mark.parametrize(
+        ("single_user", "force_profile", "expected"),
+        [(True, None, "SINGLE_32G"), (False, "SRV_80G", "SRV_80G")],
+    )
+    def test_skips_probe(self, probes, single_user, force_profile, expected):
+        """测试单人模式与强制档位不探测显存"""
+        settings = Settings(SINGLE_USER=single_user, FORCE_PROFILE=force_profile)
+
+        assert resolve_profile(settings).name == expected
+        assert probes == []
+
+    def test_probe_timeout(self, probes, monkeypatch):
+        """测试 NVML 卡住时按超时返回未检测到"""
+        monkeypatch.setattr(config, "_probe_gpu_memory", lambda result: time.sleep(1))
+
+        started = time.perf_counter()
+        assert detect_gpu_memory(timeout=0.05) is None
+        assert time.perf_counter() - started < 0.5
+        assert resolve_profile(Settings(SINGLE_USER=False, FORCE_PROFILE=None)).name == "DEV_32G"
@@ -0,0 +1,99 @@
+"""
+测试采样剖析与事件循环阻塞检测
+"""
+
+import asyncio
+import logging
+import time
+
+import httpx
+import pytest
+
+from api_gateway.config import settings
+from api_gateway.main import app
+from api_gateway.utils.profiling import LoopWatchdog, profile_loop
+
+
+def busy_work(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+
+
+class TestSamplingProfiler:
+    """测试采样剖析"""
+
+    async def test_collapsed_stacks(self):
+        """测试折叠栈格式，阻塞事件循环的函数出现在栈中"""
+        task = asyncio.create_task(profile_loop(0.3, interval=0.002))
+        await asyncio.sleep(0.01)
+        busy_work(0.2)
+        profiler = await task
+
+        assert profiler.samples > 0
+        lines = profiler.collapsed().splitlines()
+        stack, count = lines[0].rsplit(" ", 1)
+        assert int(count) > 0
+        assert any("busy_work (test_profiling.py:" in line for line in lines)
+
+    async def test_single_profile_at_a_time(self):
+        """测试同一时刻只允许一个剖析"""
+        task = asyncio.create_task(profile_loop(0.1))
+        await asyncio.sleep(0.01)
+        assert await profile_loop(0.1) is None
+        assert await task is not None
+
+
+class TestLoopWatchdog:
+    """测试事件循环阻塞检测"""
+
+    async def test_logs_blocking_stack(self, caplog):
+        """测试阻塞超过阈值时记录堆栈与阻塞时长"""
+        watchdog = LoopWatchdog(threshold=0.05)
+        watchdog.start()
+        try:
+            await asyncio.sleep(0.05)
+            with caplog.at_level(logging.WARNING, logger="api_gateway.utils.profiling"):
+                time.sleep(0.2)
+                await asyncio.sleep(0.05)
+        finally:
+            watchdog.stop()
+
+        stacks = [r.stack for r in caplog.records if hasattr(r, "stack")]
+        assert stacks and "test_logs_blocking_stack" in stacks[0]
+        assert watchdog.blocked_count == 1
+        assert watchdog.max_blocked >= 0.1
+
+
+class TestAdminRoutes:
+    """测试运维诊断接口鉴权"""
+
+    @pytest.fixture
+    async def client(self):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://gateway"
+        ) as client:
+            yield client
+
+    async def test_disabled_without_token(self, client, monkeypatch):
+        """测试未配置 ADMIN_TOKEN 时接口不存在"""
+        monkeypatch.setattr(settings, "ADMIN_TOKEN", "")
+        response = await client.post("/admin/profile?seconds=0.1")
+        assert response.status_code == 404
+
+    async def test_requires_token(self, client, monkeypatch):
+        """测试令牌校验与时长上限"""
+        monkeypatch.setattr(settings, "ADMIN_TOKEN", "secret")
+        response = await client.post(
+            "/admin/profile?seconds=0.1", headers={"Authorization": "Bearer wrong"}
+        )
+        assert response.status_code == 401
+
+        headers = {"Authorization": "Bearer secret"}
+        response = await client.post("/admin/profile?seconds=3600", headers=headers)
+        assert response.status_code == 400
+
+        response = await client.post("/admin/profile?seconds=0.1", headers=headers)
+        assert response.status_code == 200
+        assert int(response.headers["X-Profile-Samples"]) > 0
+        assert response.headers["Content-Disposition"].endswith('.collapsed"')
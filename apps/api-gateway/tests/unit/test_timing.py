@@ -0,0 +1,72 @@
+"""
+测试请求时间线与 Server-Timing
+"""
+
+import httpx
+import pytest
+
+from api_gateway.config import settings
+from api_gateway.main import app
+from api_gateway.routes import chat
+from api_gateway.utils.timing import RequestTimeline, mark, timed
+
+CHAT_BODY = {"model": "qwen3-14b", "messages": [{"role": "user", "content": "你好"}]}
+
+
+class TestRequestTimeline:
+    """测试时间线记录"""
+
+    def test_span_mark_and_header(self):
+        """测试阶段累加、首次标记与 Server-Timing 格式"""
+        timeline = RequestTimeline("req-1")
+        with timeline.span("db"):
+            pass
+        with timeline.span("db"):
+            pass
+        timeline.mark("ttft")
+        first = timeline.phases["ttft"]
+        timeline.mark("ttft")
+
+        assert timeline.phases["ttft"] == first
+        header = timeline.server_timing()
+        assert header.startswith("db;dur=")
+        assert "ttft;dur=" in header and header.endswith(';desc="Total"')
+
+    def test_noop_without_timeline(self):
+        """测试上下文中没有时间线时为空操作"""
+        with timed("db"):
+            mark("ttft")
+
+
+class TestServerTiming:
+    """测试响应中的计时输出"""
+
+    @pytest.fixture
+    async def client(self, monkeypatch):
+        monkeypatch.setattr(settings, "USE_MOCK", True)
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://gateway"
+        ) as client:
+            yield client
+
+    async def test_non_stream_header(self, client):
+        """测试非流式响应带 Server-Timing 头"""
+        response = await client.post("/v1/chat/completions", json=CHAT_BODY)
+
+        timing = response.headers["Server-Timing"]
+        assert "admission;dur=" in timing and "tokenize;dur=" in timing
+
+    async def test_stream_trailer(self, client, monkeypatch):
+        """测试流式响应以最后一条 SSE 注释输出计时"""
+
+        async def fast_stream(req_id, model):
+            yield {"event": "message", "data": '{"choices": []}'}
+            yield {"event": "message", "data": "[DONE]"}
+
+        monkeypatch.setattr(chat, "mock_stream_generator", fast_stream)
+        response = await client.post("/v1/chat/completions", json={**CHAT_BODY, "stream": True})
+
+        assert "Server-Timing" not in response.headers
+        last = response.text.strip().splitlines()[-1]
+        assert last.startswith(": server-timing: ")
+        assert "ttft;dur=" in last and "stream;dur=" in last
@@ -0,0 +1,188 @@
+"""
+测试分布式追踪
+"""
+
+import functools
+import json
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+from api_gateway.config import settings
+from api_gateway.infrastructure.database import create_engine_for
+from api_gateway.main import app
+from api_gateway.routes import chat
+from api_gateway.utils import tracing
+from api_gateway.utils.tracing import (
+    SpanExporter,
+    parse_traceparent,
+    should_sample,
+    start_span,
+)
+
+CHAT_BODY = {"model": "qwen3-14b", "messages": [{"role": "user", "content": "你好"}]}
+PARENT = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+class CollectingExporter:
+    def __init__(self):
+        self.spans = []
+
+    def enqueue(self, span):
+        self.spans.append(span)
+
+
+@pytest.fixture
+def spans(monkeypatch):
+    monkeypatch.setattr(settings, "TRACING_ENABLED", True)
+    monkeypatch.setattr(settings, "TRACE_SAMPLE_RATIO", 1.0)
+    exporter = CollectingExporter()
+    monkeypatch.setattr(tracing, "_exporter", exporter)
+    return exporter.spans
+
+
+class TestTraceContext:
+    """测试 traceparent 解析与采样"""
+
+    def test_parse_traceparent(self):
+        assert parse_traceparent(PARENT) == (
+            "0af7651916cd43dd8448eb211c80319c",
+            "b7ad6b7169203331",
+            True,
+        )
+        assert parse_traceparent(PARENT[:-1] + "0")[2] is False
+        for invalid in (
+            None,
+            "",
+            "00-abc-def-01",
+            "ff" + PARENT[2:],
+            "00-" + "0" * 32 + PARENT[35:],
+        ):
+            assert parse_traceparent(invalid) is None
+
+    def test_ratio_sampling(self):
+        """测试按 trace_id 采样：同一 trace 结论稳定，比例近似"""
+        ids = [f"{i:032x}" for i in range(0, 2**64, 2**54)]
+        assert all(should_sample(trace_id, 1.0) for trace_id in ids)
+        assert not any(should_sample(trace_id, 0.0) for trace_id in ids)
+        sampled = sum(should_sample(trace_id, 0.25) for trace_id in ids)
+        assert sampled == len(ids) // 4
+
+    def test_disabled_is_noop(self, monkeypatch):
+        monkeypatch.setattr(settings, "TRACING_ENABLED", False)
+        with start_span("admission") as span:
+            assert span.traceparent is None
+        assert tracing.current_span() is None
+
+
+class TestRequestTracing:
+    """测试请求级 trace"""
+
+    @pytest.fixture
+    async def client(self):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://gateway"
+        ) as client:
+            yield client
+
+    async def test_trace_propagates_to_upstream(self, client, spans, monkeypatch):
+        """测试根 span 沿用入站 traceparent，上游请求携带子 span 的 traceparent"""
+        seen = {}
+
+        def upstream(request: httpx.Request) -> httpx.Response:
+            seen["traceparent"] = request.headers.get("traceparent")
+            return httpx.Response(
+                200,
+                json={
+                    "id": "chatcmpl-1",
+                    "created": 0,
+                    "model": "qwen3-14b",
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": "你好"},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                },
+            )
+
+        monkeypatch.setattr(settings, "USE_MOCK", False)
+        monkeypatch.setattr(
+            chat.httpx,
+            "AsyncClient",
+            functools.partial(httpx.AsyncClient, transport=httpx.MockTransport(upstream)),
+        )
+        response = await client.post(
+            "/v1/chat/completions", json=CHAT_BODY, headers={"traceparent": PARENT}
+        )
+
+        assert response.status_code == 200
+        by_name = {span.name: span for span in spans}
+        root = by_name["POST /v1/chat/completions"]
+        assert root.trace_id == "0af7651916cd43dd8448eb211c80319c"
+        assert root.parent_id == "b7ad6b7169203331"
+        assert by_name["admission"].parent_id == root.span_id
+        assert seen["traceparent"] == by_name["upstream"].traceparent
+        assert by_name["upstream"].attributes["http.status_code"] == 200
+        # 请求 ID 只生成一次
+        assert response.json()["id"] == "chatcmpl-1"
+        assert root.attributes["request_id"] == response.headers["X-Request-ID"]
+
+    async def test_stream_root_span_ends_after_body(self, client, spans, monkeypatch):
+        """测试流式响应的根 span 在流结束后结束，响应 ID 与 X-Request-ID 一致"""
+        monkeypatch.setattr(settings, "USE_MOCK", True)
+
+        async def fast_stream(req_id, model):
+            yield {"event": "message", "data": req_id}
+            yield {"event": "message", "data": "[DONE]"}
+
+        monkeypatch.setattr(chat, "mock_stream_generator", fast_stream)
+        response = await client.post("/v1/chat/completions", json={**CHAT_BODY, "stream": True})
+
+        assert f"data: {response.headers['X-Request-ID']}" in response.text
+        root = spans[-1]
+        assert root.name == "POST /v1/chat/completions"
+        assert root.end_ns > 0
+
+
+class TestDatabaseSpans:
+    """测试 SQL span"""
+
+    async def test_query_span_under_current_span(self, spans):
+        engine = create_engine_for("sqlite+aiosqlite:///:memory:")
+        try:
+            with start_span("request") as parent:
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+        finally:
+            await engine.dispose()
+
+        query = next(span for span in spans if span.name == "db.SELECT")
+        assert query.parent_id == parent.span_id
+        assert query.attributes["db.system"] == "sqlite"
+
+
+class TestSpanExporter:
+    """测试 OTLP/JSON 文件导出"""
+
+    def test_file_export(self, spans, monkeypatch, tmp_path):
+        monkeypatch.setattr(settings, "TRACE_EXPORTER", "file")
+        monkeypatch.setattr(settings, "TRACE_FILE", str(tmp_path / "traces.jsonl"))
+        with start_span("request", attributes={"retries": 2, "cached": True}) as span:
+            span.set_error("boom")
+
+        exporter = SpanExporter()
+        exporter.export(spans)
+
+        payload = json.loads((tmp_path / "traces.jsonl").read_text(encoding="utf-8"))
+        resource = payload["resourceSpans"][0]
+        assert resource["resource"]["attributes"][0]["value"] == {
+            "stringValue": settings.TRACE_SERVICE_NAME
+        }
+        exported = resource["scopeSpans"][0]["spans"][0]
+        assert exported["traceId"] == span.trace_id
+        assert exported["status"]["code"] == 2
+        assert {"key": "retries", "value": {"intValue": "2"}} in exported["attributes"]
+        assert exporter.exported == 1
@@ -8,6 +8,11 @@ import pytest
 
 from api_gateway.application.use_cases import ChatCompletionUseCase
 from api_gateway.domain.services import ChatService
+from api_gateway.infrastructure.memory_repository import (
+    InMemoryChatSessionRepository,
+    InMemoryMessageRepository,
+    InMemoryUnitOfWork,
+)
 
 
 class TestChatCompletionUseCase:
@@ -20,7 +25,7 @@ class TestChatCompletionUseCase:
         session_repo = AsyncMock()
         message_repo = AsyncMock()
         session_repo.get_by_id.return_value = sample_chat_session
-        session_repo.save.return_value = sample_chat_session
+        session_repo.get_context_window.return_value = []
 
         # Mock LLM 客户端
         llm_client = AsyncMock()
@@ -49,7 +54,104 @@ class TestChatCompletionUseCase:
 
         # 验证
         assert "".join(result) == "Hello World"
-        assert message_repo.save.call_count == 2  # user + assistant
+        assert session_repo.append_message.call_count == 2  # user + assistant
+        session_repo.get_by_id.assert_called_once_with(sample_chat_session.id, with_messages=False)
+        session_repo.save.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_execute_with_persistence_queue(self, sample_chat_session):
+        """测试 write-behind 模式下不在请求路径上落库"""
+        session_repo = AsyncMock()
+        message_repo = AsyncMock()
+        persistence_queue = AsyncMock()
+        session_repo.get_by_id.return_value = sample_chat_session
+        session_repo.get_context_window.return_value = []
+
+        llm_client = AsyncMock()
+
+        async def mock_stream(*args, **kwargs):
+            """Mock 流式生成"""
+            for chunk in ["Hello", " ", "World"]:
+                yield chunk
+
+        llm_client.chat_completion_stream = mock_stream
+
+        use_case = ChatCompletionUseCase(
+            session_repo=session_repo,
+            message_repo=message_repo,
+            llm_client=llm_client,
+            chat_service=ChatService(),
+            persistence_queue=persistence_queue,
+        )
+
+        async for _ in use_case.execute(
+            session_id=sample_chat_session.id, user_message="Test message", stream=True
+        ):
+            pass
+
+        session_repo.append_message.assert_not_called()
+        assert persistence_queue.enqueue_message.call_count == 2
+        persistence_queue.enqueue_session_update.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_execute_with_unit_of_work(self, sample_chat_session):
+        """测试工作单元模式下整轮对话一次提交"""
+        session_repo = InMemoryChatSessionRepository()
+        message_repo = InMemoryMessageRepository(sessions=session_repo)
+        await session_repo.save(sample_chat_session)
+
+        llm_client = AsyncMock()
+
+        async def mock_stream(*args, **kwargs):
+            """Mock 流式生成"""
+            yield "Hi"
+
+        llm_client.chat_completion_stream = mock_stream
+
+        use_case = ChatCompletionUseCase(
+            session_repo=session_repo,
+            message_repo=message_repo,
+            llm_client=llm_client,
+            chat_service=ChatService(),
+            unit_of_work=InMemoryUnitOfWork(session_repo, message_repo),
+        )
+
+        async for _ in use_case.execute(session_id=sample_chat_session.id, user_message="Hello"):
+            pass
+
+        stored = await message_repo.get_by_session(sample_chat_session.id)
+        assert [m.content for m in stored] == ["Hello", "Hi"]
+        session = await session_repo.get_by_id(sample_chat_session.id)
+        assert session.total_tokens == sum(m.tokens for m in stored)
+
+    @pytest.mark.asyncio
+    async def test_execute_does_not_duplicate_user_message(self, sample_chat_session):
+        """测试上下文中新消息只出现一次，历史只取预算内窗口"""
+        session_repo = InMemoryChatSessionRepository()
+        await session_repo.save(sample_chat_session)
+
+        captured = {}
+        llm_client = AsyncMock()
+
+        async def mock_stream(messages, **kwargs):
+            """记录上下文"""
+            captured["messages"] = messages
+            yield "ok"
+
+        llm_client.chat_completion_stream = mock_stream
+
+        use_case = ChatCompletionUseCase(
+            session_repo=session_repo,
+            message_repo=InMemoryMessageRepository(),
+            llm_client=llm_client,
+            chat_service=ChatService(),
+        )
+
+        async for _ in use_case.execute(session_id=sample_chat_session.id, user_message="Hello"):
+            pass
+
+        user_turns = [m for m in captured["messages"] if m["role"] == "user"]
+        assert user_turns == [{"role": "user", "content": "Hello"}]
 
     @pytest.mark.asyncio
     async def test_execute_validates_message_length(self, sample_chat_session):
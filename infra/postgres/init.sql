@@ -47,18 +47,29 @@ CREATE TABLE IF NOT EXISTS messages (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     session_id UUID REFERENCES chat_sessions(id) ON DELETE CASCADE,
     role message_role NOT NULL,
-    content TEXT NOT NULL,
+    content BYTEA NOT NULL,  -- CompressedText：首字节为格式标记
     tokens INTEGER DEFAULT 0,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- 冷会话消息归档（zlib 压缩的 JSON）
+CREATE TABLE IF NOT EXISTS message_archives (
+    session_id UUID PRIMARY KEY REFERENCES chat_sessions(id) ON DELETE CASCADE,
+    message_count INTEGER NOT NULL,
+    total_tokens INTEGER NOT NULL DEFAULT 0,
+    first_message_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_message_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    archived_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    payload BYTEA NOT NULL
+);
+
 -- 文档表
 CREATE TABLE IF NOT EXISTS documents (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
     owner_id UUID REFERENCES users(id) ON DELETE CASCADE,
     department_id UUID REFERENCES departments(id) ON DELETE SET NULL,
     title VARCHAR(200) NOT NULL,
-    content TEXT NOT NULL,
+    content BYTEA NOT NULL,
     file_path VARCHAR(500),
     is_public BOOLEAN DEFAULT FALSE,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
@@ -90,17 +101,17 @@ CREATE TABLE IF NOT EXISTS audit_logs (
 );
 
 -- 创建索引
-CREATE INDEX idx_messages_session_id ON messages(session_id);
+CREATE INDEX ix_messages_session_id_created_at ON messages(session_id, created_at);
 CREATE INDEX idx_messages_created_at ON messages(created_at);
+CREATE INDEX ix_message_archives_archived_at ON message_archives(archived_at);
 CREATE INDEX idx_chat_sessions_owner_id ON chat_sessions(owner_id);
 CREATE INDEX idx_chat_sessions_updated_at ON chat_sessions(updated_at);
 CREATE INDEX idx_documents_owner_id ON documents(owner_id);
 CREATE INDEX idx_audit_logs_user_id ON audit_logs(user_id);
 CREATE INDEX idx_audit_logs_created_at ON audit_logs(created_at);
 
--- 全文搜索索引
-CREATE INDEX idx_messages_content_gin ON messages USING gin(to_tsvector('english', content));
-CREATE INDEX idx_documents_content_gin ON documents USING gin(to_tsvector('english', content));
+-- content 为压缩存储（CompressedText），不再建立基于 content 的全文索引；
+-- 如需全文检索，需另建明文检索字段或使用外部检索服务
 
 -- 更新时间触发器函数
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -46,20 +46,32 @@ CREATE TABLE IF NOT EXISTS messages (
     id BINARY(16) PRIMARY KEY DEFAULT (UUID_TO_BIN(UUID(), 1)),
     session_id BINARY(16) NOT NULL,
     role ENUM('system', 'user', 'assistant') NOT NULL,
-    content LONGTEXT NOT NULL,
+    content LONGBLOB NOT NULL,  -- CompressedText：首字节为格式标记
     tokens INT NOT NULL DEFAULT 0,
     created_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
     CONSTRAINT fk_messages_session FOREIGN KEY (session_id) REFERENCES chat_sessions(id) ON DELETE CASCADE,
-    INDEX idx_messages_session_id (session_id),
+    INDEX ix_messages_session_id_created_at (session_id, created_at),
     INDEX idx_messages_created_at (created_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+CREATE TABLE IF NOT EXISTS message_archives (
+    session_id BINARY(16) PRIMARY KEY,
+    message_count INT NOT NULL,
+    total_tokens INT NOT NULL DEFAULT 0,
+    first_message_at DATETIME(6) NOT NULL,
+    last_message_at DATETIME(6) NOT NULL,
+    archived_at DATETIME(6) NOT NULL,
+    payload LONGBLOB NOT NULL,
+    CONSTRAINT fk_message_archives_session FOREIGN KEY (session_id) REFERENCES chat_sessions(id) ON DELETE CASCADE,
+    INDEX ix_message_archives_archived_at (archived_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 CREATE TABLE IF NOT EXISTS documents (
     id BINARY(16) PRIMARY KEY DEFAULT (UUID_TO_BIN(UUID(), 1)),
     owner_id BINARY(16) NOT NULL,
     department_id BINARY(16) NULL,
     title VARCHAR(200) NOT NULL,
-    content LONGTEXT NOT NULL,
+    content LONGBLOB NOT NULL,  -- CompressedText：首字节为格式标记
     file_path VARCHAR(500) NULL,
     is_public TINYINT(1) NOT NULL DEFAULT 0,
     created_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
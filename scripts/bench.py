@@ -2,20 +2,108 @@
 并发压测脚本
 
 用法：
+    # 闭环：每轮并发 N 个请求，等最慢的请求返回后再开始下一轮
     python scripts/bench.py --concurrency 50 --rounds 100 --url http://127.0.0.1:8001/v1/chat/completions
 
+    # 开环：按目标到达率发送（泊松 / 匀速），不等待前序请求完成
+    python scripts/bench.py --mode open --rate 20 --duration 60
+    python scripts/bench.py --mode open --rate 20 --duration 60 --arrival constant
+
+    # 阶梯加压：从 --rate 起每级增加 --ramp-step，直至违反 SLO，给出饱和吞吐
+    python scripts/bench.py --mode ramp --rate 5 --ramp-step 5 --ramp-max 200 --slo-p95 2.0
+
+    # 结果写入 JSON（含配置元数据与原始样本）/ 追加一行 CSV，便于跨版本跟踪
+    python scripts/bench.py --mode open --rate 20 --out results/v1.2.json --csv results/history.csv
+
+    # 对比两次结果：bootstrap 95% 置信区间，超过阈值的退化以退出码 1 失败（可用于 CI）
+    python scripts/bench.py compare results/v1.1.json results/v1.2.json --threshold 0.10
+
+    # 轨迹回放：按原始到达间隔（可加速）重放真实请求
+    python scripts/bench.py --mode replay --trace scripts/traces/sample.jsonl --speedup 2
+    python scripts/bench.py --mode replay --trace traces.jsonl --rate 20   # 忽略时间戳，泊松到达
+
+轨迹文件每行一个 JSON：messages（必填）、max_tokens、stream、model 等请求字段原样发送，
+可选 timestamp（Unix 秒或 ISO 时间）决定到达间隔；无时间戳时按 --rate 泊松到达。
+
+开环与回放模式的延迟从“计划发送时刻”起算：客户端或网关排队造成的延迟全部计入，
+避免闭环压测的协调遗漏（coordinated omission）——服务变慢时闭环会自动降低发送速率，
+掩盖排队效应。
+
 输出：
-    - 平均/P95 首 token 延迟
+    - 首 token 延迟（TTFT，仅流式请求；首个含 content 的 SSE chunk，role-only chunk 与心跳不计）
+    - token 间隔（ITL）P50/P95/P99
+    - 输出 token 数、单流解码速度与聚合输出吞吐（tokens/s）
     - 平均/P95 总耗时
     - 错误率（413/429/503）
     - 吞吐量（RPS）
+    - --hdr-out 时导出 HdrHistogram 百分位分布（.hgrm，可用 HdrHistogram Plotter 作图）
+
+所有请求共用一个 httpx 连接池（--max-connections），避免每请求新建客户端的握手与
+初始化开销计入延迟。
 """
-import asyncio
+
 import argparse
+import asyncio
+import csv
+import json
+import math
+import platform
+import random
+import statistics
+import subprocess
+import sys
 import time
+from collections.abc import Iterable, Iterator
+from datetime import UTC, datetime
+from pathlib import Path
+
 import httpx
-from typing import List, Dict, Any
-import statistics
+
+DEFAULT_PAYLOAD = {
+    "model": "qwen3-14b",
+    "messages": [{"role": "user", "content": "你好，请简单介绍一下你自己。"}],
+    "stream": True,
+    "max_tokens": 100,
+}
+
+# 开环 / 阶梯加压未指定 --rate 时的到达率（回放未指定时使用轨迹时间戳）
+DEFAULT_RATE = 10.0
+
+
+def percentile(values: list[float], p: float) -> float:
+    """线性插值分位数（p 取 0-100）；无样本时返回 nan"""
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    low = math.floor(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def write_hgrm(path: Path, values: list[float], ticks_per_half: int = 5):
+    """以 HdrHistogram 百分位分布文本格式写出（值单位：毫秒）"""
+    ordered = sorted(v * 1000 for v in values)
+    count = len(ordered)
+    lines = [f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>14}", ""]
+
+    def row(q: float) -> str:
+        index = min(count - 1, max(0, math.ceil(q * count) - 1))
+        inverse = f"{1 / (1 - q):14.2f}" if q < 1 else f"{'inf':>14}"
+        return f"{ordered[index]:12.3f} {q:14.12f} {index + 1:10d} {inverse}"
+
+    half = 0
+    while count and 1 / 0.5**half <= count * 2:
+        low, high = 1 - 0.5**half, 1 - 0.5 ** (half + 1)
+        lines.extend(row(low + (high - low) * i / ticks_per_half) for i in range(ticks_per_half))
+        half += 1
+    if count:
+        lines.append(row(1.0))
+        mean, std = statistics.mean(ordered), statistics.pstdev(ordered)
+        lines.append(f"#[Mean    = {mean:12.3f}, StdDeviation   = {std:12.3f}]")
+        lines.append(f"#[Max     = {ordered[-1]:12.3f}, Total count    = {count:12d}]")
+        lines.append(f"#[Buckets = {0:12d}, SubBuckets     = {0:12d}]")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
 
 
 class BenchmarkStats:
@@ -24,30 +112,59 @@ class BenchmarkStats:
     def __init__(self):
         self.total = 0
         self.success = 0
-        self.errors: Dict[int, int] = {}
+        self.errors: dict[int, int] = {}
+
+        # 仅流式请求：非流式请求没有首 token 时刻，完整耗时计入会抬高 TTFT 分位数
+        self.first_token_latencies: list[float] = []
+        self.total_latencies: list[float] = []
+        self.inter_token_latencies: list[float] = []
+        self.output_tokens: list[int] = []
+        # 单流解码速度：首 token 之后的 token 数 / 首末 token 间隔
+        self.decode_rates: list[float] = []
+        # 实际发送时刻相对计划时刻的滞后（开环模式），过大说明压测端本身跟不上
+        self.send_lags: list[float] = []
 
-        self.first_token_latencies: List[float] = []
-        self.total_latencies: List[float] = []
+        self.duration = 0.0
+        # 模式相关的附加结果（如阶梯加压的各级数据）
+        self.extra: dict = {}
 
     def add_result(
         self,
         success: bool,
         error_code: int = 0,
-        first_token_latency: float = 0,
+        first_token_latency: float | None = None,
         total_latency: float = 0,
+        token_times: list[float] | None = None,
+        output_tokens: int = 0,
     ):
-        """添加结果"""
+        """添加结果；token_times 为各 content chunk 的到达时刻，非流式请求不给 first_token_latency"""
         self.total += 1
 
         if success:
             self.success += 1
-            self.first_token_latencies.append(first_token_latency)
+            if first_token_latency is not None:
+                self.first_token_latencies.append(first_token_latency)
             self.total_latencies.append(total_latency)
+            self.output_tokens.append(output_tokens)
+            if token_times and len(token_times) > 1:
+                self.inter_token_latencies.extend(
+                    b - a for a, b in zip(token_times, token_times[1:], strict=False)
+                )
+                span = token_times[-1] - token_times[0]
+                if span > 0:
+                    # chunk 数可能少于 token 数（usage 给出准确值），按 token 数折算
+                    steps = max(output_tokens, len(token_times)) - 1
+                    self.decode_rates.append(steps / span)
         else:
             self.errors[error_code] = self.errors.get(error_code, 0) + 1
 
+    @property
+    def error_rate(self) -> float:
+        return (self.total - self.success) / self.total if self.total else 0.0
+
     def print_summary(self, duration: float):
         """打印摘要"""
+        self.duration = duration
         print("\n" + "=" * 60)
         print("压测结果")
         print("=" * 60)
@@ -61,90 +178,737 @@ class BenchmarkStats:
             for code, count in sorted(self.errors.items()):
                 print(f"  {code}: {count} 次 ({count/self.total*100:.1f}%)")
 
+        # statistics.quantiles 至少需要 2 个样本，统一用 percentile
         if self.first_token_latencies:
-            print(f"\n首 token 延迟:")
-            print(f"  平均: {statistics.mean(self.first_token_latencies):.3f}s")
-            print(f"  P50: {statistics.median(self.first_token_latencies):.3f}s")
-            print(
-                f"  P95: {statistics.quantiles(self.first_token_latencies, n=20)[18]:.3f}s"
-            )
-            print(f"  P99: {statistics.quantiles(self.first_token_latencies, n=100)[98]:.3f}s")
+            ttft = self.first_token_latencies
+            print("\n首 token 延迟（流式请求）:")
+            print(f"  平均: {statistics.mean(ttft):.3f}s")
+            print(f"  P50: {percentile(ttft, 50):.3f}s")
+            print(f"  P95: {percentile(ttft, 95):.3f}s")
+            print(f"  P99: {percentile(ttft, 99):.3f}s")
 
         if self.total_latencies:
-            print(f"\n总耗时:")
-            print(f"  平均: {statistics.mean(self.total_latencies):.3f}s")
-            print(f"  P50: {statistics.median(self.total_latencies):.3f}s")
-            print(f"  P95: {statistics.quantiles(self.total_latencies, n=20)[18]:.3f}s")
-            print(f"  P99: {statistics.quantiles(self.total_latencies, n=100)[98]:.3f}s")
+            total = self.total_latencies
+            print("\n总耗时:")
+            print(f"  平均: {statistics.mean(total):.3f}s")
+            print(f"  P50: {percentile(total, 50):.3f}s")
+            print(f"  P95: {percentile(total, 95):.3f}s")
+            print(f"  P99: {percentile(total, 99):.3f}s")
+
+        if self.inter_token_latencies:
+            itl = self.inter_token_latencies
+            print("\ntoken 间隔（ITL）:")
+            print(f"  P50: {percentile(itl, 50) * 1000:.1f}ms")
+            print(f"  P95: {percentile(itl, 95) * 1000:.1f}ms")
+            print(f"  P99: {percentile(itl, 99) * 1000:.1f}ms")
+
+        if any(self.output_tokens):
+            print("\n输出 token:")
+            print(f"  总数: {sum(self.output_tokens)}")
+            if self.decode_rates:
+                print(f"  单流解码 P50: {percentile(self.decode_rates, 50):.1f} tokens/s")
+                print(f"  单流解码 P5: {percentile(self.decode_rates, 5):.1f} tokens/s")
+            print(f"  聚合吞吐: {sum(self.output_tokens) / duration:.1f} tokens/s")
+
+        if self.send_lags:
+            print(f"\n发送滞后 P99: {percentile(self.send_lags, 99) * 1000:.1f}ms")
 
         print(f"\n吞吐量: {self.success / duration:.2f} RPS")
         print("=" * 60 + "\n")
 
+    def summary(self) -> dict:
+        """汇总指标（秒 / RPS / tokens/s），无样本的分布为 None"""
 
-async def single_request(url: str, stats: BenchmarkStats):
-    """单个请求"""
-    payload = {
-        "model": "qwen3-14b",
-        "messages": [{"role": "user", "content": "你好，请简单介绍一下你自己。"}],
-        "stream": True,
-        "max_tokens": 100,
-    }
+        def dist(values: list[float]) -> dict | None:
+            if not values:
+                return None
+            return {
+                "count": len(values),
+                "mean": statistics.mean(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+                "max": max(values),
+            }
 
-    start = time.time()
-    first_token_time = None
+        duration = self.duration or math.inf
+        return {
+            "total": self.total,
+            "success": self.success,
+            "errors": {str(code): count for code, count in sorted(self.errors.items())},
+            "error_rate": self.error_rate,
+            "duration": self.duration,
+            "rps": self.success / duration,
+            "ttft": dist(self.first_token_latencies),
+            "total_latency": dist(self.total_latencies),
+            "itl": dist(self.inter_token_latencies),
+            "output_tokens": sum(self.output_tokens),
+            "output_tps": sum(self.output_tokens) / duration,
+            "decode_tps_p50": percentile(self.decode_rates, 50) if self.decode_rates else None,
+            "send_lag_p99": percentile(self.send_lags, 99) if self.send_lags else None,
+            **self.extra,
+        }
 
-    try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            async with client.stream("POST", url, json=payload) as response:
-                if response.status_code != 200:
-                    stats.add_result(False, error_code=response.status_code)
-                    return
+    def samples(self) -> dict[str, list[float]]:
+        """原始样本（微秒精度），供 compare 计算置信区间"""
+        return {
+            "ttft": [round(v, 6) for v in self.first_token_latencies],
+            "total_latency": [round(v, 6) for v in self.total_latencies],
+            "itl": [round(v, 6) for v in self.inter_token_latencies],
+        }
 
-                async for line in response.aiter_lines():
-                    if not line.strip():
-                        continue
+    def export_hdr(self, prefix: str):
+        """导出 TTFT / ITL / 总耗时的 .hgrm 文件"""
+        for name, values in (
+            ("ttft", self.first_token_latencies),
+            ("itl", self.inter_token_latencies),
+            ("total", self.total_latencies),
+        ):
+            if values:
+                path = Path(f"{prefix}.{name}.hgrm")
+                write_hgrm(path, values)
+                print(f"已导出 {path}")
 
-                    if first_token_time is None:
-                        first_token_time = time.time()
 
-                    if "data: [DONE]" in line:
-                        break
+def make_client(max_connections: int) -> httpx.AsyncClient:
+    """压测共用的连接池客户端"""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(120.0, connect=10.0),
+        limits=httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_connections
+        ),
+    )
 
-        total_time = time.time() - start
-        first_token_latency = (
-            first_token_time - start if first_token_time else total_time
-        )
+
+def _completion_tokens(chunk: dict) -> int | None:
+    usage = chunk.get("usage") or {}
+    return usage.get("completion_tokens")
+
+
+async def single_request(
+    client: httpx.AsyncClient,
+    url: str,
+    stats: BenchmarkStats,
+    intended: float | None = None,
+    payload: dict | None = None,
+):
+    """单个请求；intended 为开环模式的计划发送时刻，延迟从该时刻起算"""
+    payload = payload or DEFAULT_PAYLOAD
+
+    start = time.perf_counter()
+    if intended is not None:
+        stats.send_lags.append(start - intended)
+        start = intended
+    token_times: list[float] = []
+    usage_tokens = None
+
+    try:
+        if not payload.get("stream"):
+            response = await client.post(url, json=payload)
+            total_time = time.perf_counter() - start
+            if response.status_code != 200:
+                stats.add_result(False, error_code=response.status_code)
+                return
+            usage_tokens = _completion_tokens(response.json())
+            stats.add_result(True, total_latency=total_time, output_tokens=usage_tokens or 0)
+            return
+
+        async with client.stream("POST", url, json=payload) as response:
+            if response.status_code != 200:
+                stats.add_result(False, error_code=response.status_code)
+                return
+
+            # 只解析 data 行；event 行、心跳注释与 role-only chunk 不算 token
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                usage_tokens = _completion_tokens(chunk) or usage_tokens
+                choices = chunk.get("choices") or []
+                if choices and (choices[0].get("delta") or {}).get("content"):
+                    token_times.append(time.perf_counter())
+
+        total_time = time.perf_counter() - start
+        first_token_latency = token_times[0] - start if token_times else total_time
 
         stats.add_result(
-            True, first_token_latency=first_token_latency, total_latency=total_time
+            True,
+            first_token_latency=first_token_latency,
+            total_latency=total_time,
+            token_times=token_times,
+            output_tokens=usage_tokens or len(token_times),
         )
 
-    except Exception as e:
+    except Exception:
         stats.add_result(False, error_code=0)
 
 
-async def benchmark(url: str, concurrency: int, rounds: int):
+async def fetch_profile(client: httpx.AsyncClient, url: str) -> str:
+    """从 /v1/limits 读取网关档位，用于标注结果"""
+    limits_url = url.split("/v1/")[0] + "/v1/limits"
+    try:
+        response = await client.get(limits_url, timeout=5.0)
+        return response.json().get("profile", "unknown")
+    except Exception:
+        return "unknown"
+
+
+# ========================
+# 闭环
+# ========================
+
+
+async def benchmark(
+    client: httpx.AsyncClient, url: str, profile: str, concurrency: int, rounds: int
+):
     """压测主函数"""
     stats = BenchmarkStats()
 
-    print(f"开始压测:")
+    print("开始压测:")
     print(f"  URL: {url}")
+    print(f"  档位: {profile}")
     print(f"  并发数: {concurrency}")
     print(f"  轮次: {rounds}")
     print(f"  总请求数: {concurrency * rounds}")
     print()
 
-    start_time = time.time()
+    start_time = time.perf_counter()
 
     for round_num in range(rounds):
         print(f"轮次 {round_num + 1}/{rounds}...")
 
-        tasks = [single_request(url, stats) for _ in range(concurrency)]
+        tasks = [single_request(client, url, stats) for _ in range(concurrency)]
         await asyncio.gather(*tasks)
 
-    duration = time.time() - start_time
+    duration = time.perf_counter() - start_time
 
     stats.print_summary(duration)
+    return stats
+
+
+# ========================
+# 开环
+# ========================
+
+
+def arrival_offsets(
+    rate: float, duration: float, arrival: str, rng: random.Random
+) -> Iterator[float]:
+    """[0, duration) 内的计划发送时刻（相对起点的秒数）"""
+    t = 0.0
+    while True:
+        t += rng.expovariate(rate) if arrival == "poisson" else 1 / rate
+        if t >= duration:
+            return
+        yield t
+
+
+async def run_schedule(
+    client: httpx.AsyncClient, url: str, schedule: Iterable[tuple[float, dict | None]]
+) -> tuple[BenchmarkStats, float]:
+    """按 (计划时刻, 请求体) 序列发送，等待所有请求完成；返回统计与总耗时"""
+    stats = BenchmarkStats()
+    tasks = []
+    start = time.perf_counter()
+
+    for offset, payload in schedule:
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(
+            asyncio.create_task(single_request(client, url, stats, start + offset, payload))
+        )
+
+    await asyncio.gather(*tasks)
+    stats.duration = time.perf_counter() - start
+    return stats, stats.duration
+
+
+async def open_loop(
+    client: httpx.AsyncClient,
+    url: str,
+    rate: float,
+    duration: float,
+    arrival: str,
+    rng: random.Random,
+) -> tuple[BenchmarkStats, float]:
+    """按到达率发送 duration 秒"""
+    offsets = arrival_offsets(rate, duration, arrival, rng)
+    return await run_schedule(client, url, ((offset, None) for offset in offsets))
+
+
+async def benchmark_open(
+    client: httpx.AsyncClient,
+    url: str,
+    profile: str,
+    rate: float,
+    duration: float,
+    arrival: str,
+    seed: int,
+):
+    """开环压测"""
+    print("开始开环压测:")
+    print(f"  URL: {url}")
+    print(f"  档位: {profile}")
+    print(f"  到达率: {rate} RPS（{arrival}）")
+    print(f"  时长: {duration}s")
+    print()
+
+    stats, elapsed = await open_loop(client, url, rate, duration, arrival, random.Random(seed))
+    stats.print_summary(elapsed)
+    return stats
+
+
+async def benchmark_ramp(
+    client: httpx.AsyncClient,
+    url: str,
+    profile: str,
+    start_rate: float,
+    step: float,
+    max_rate: float,
+    step_duration: float,
+    arrival: str,
+    slo_p95: float,
+    slo_metric: str,
+    slo_error_rate: float,
+    seed: int,
+):
+    """阶梯加压，找出满足 SLO 的最大吞吐"""
+    rng = random.Random(seed)
+    print("开始阶梯加压:")
+    print(f"  URL: {url}")
+    print(f"  档位: {profile}")
+    print(f"  SLO: {slo_metric} P95 ≤ {slo_p95}s，错误率 ≤ {slo_error_rate:.1%}")
+    print()
+    print(f"{'目标 RPS':>10}{'实际 RPS':>10}{'P50(s)':>9}{'P95(s)':>9}{'错误率':>9}")
+
+    saturation = None
+    breached = False
+    last_passing = stats = None
+    steps = []
+    rate = start_rate
+    while rate <= max_rate:
+        stats, elapsed = await open_loop(client, url, rate, step_duration, arrival, rng)
+        latencies = stats.first_token_latencies if slo_metric == "ttft" else stats.total_latencies
+        p95 = percentile(latencies, 95)
+        achieved = stats.success / elapsed
+        print(
+            f"{rate:>10.1f}{achieved:>10.2f}{percentile(latencies, 50):>9.3f}"
+            f"{p95:>9.3f}{stats.error_rate:>9.1%}"
+        )
+        steps.append(
+            {
+                "rate": rate,
+                "achieved_rps": achieved,
+                "p50": percentile(latencies, 50),
+                "p95": p95,
+                "error_rate": stats.error_rate,
+            }
+        )
+
+        # 无成功请求时 p95 为 nan，比较结果为 False，同样视为违反
+        if not (p95 <= slo_p95 and stats.error_rate <= slo_error_rate):
+            print(f"\n在 {rate:.1f} RPS 违反 SLO")
+            breached = True
+            break
+        saturation = max(saturation or 0.0, achieved)
+        last_passing = stats
+        rate += step
+
+    if saturation is None:
+        print(f"\n档位 {profile}: 起始速率即违反 SLO，请降低 --rate")
+    elif not breached:
+        # 未触及 SLO 边界，saturation 只是下界
+        print(
+            f"\n档位 {profile}: 直至 --ramp-max 未饱和 (≥ {saturation:.2f} RPS)，请调高 --ramp-max"
+        )
+    else:
+        print(f"\n档位 {profile} 饱和吞吐: {saturation:.2f} RPS")
+    # 结果取最后一个满足 SLO 的阶梯（若无则为起始阶梯）
+    result = last_passing or stats
+    if result is not None:
+        result.extra.update(
+            {"saturation_rps": saturation, "saturated": breached, "ramp_steps": steps}
+        )
+    return result
+
+
+# ========================
+# 轨迹回放
+# ========================
+
+
+def _timestamp(value) -> float:
+    if isinstance(value, int | float):
+        return float(value)
+    return datetime.fromisoformat(value).timestamp()
+
+
+def load_trace(path: Path, model: str) -> list[tuple[float | None, dict]]:
+    """读取轨迹：[(相对首条请求的秒数或 None, 请求体)]，跳过无 messages 的行"""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not record.get("messages"):
+                continue
+            ts = record.pop("timestamp", None)
+            record.setdefault("model", model)
+            record.setdefault("stream", True)
+            entries.append((None if ts is None else _timestamp(ts), record))
+
+    if entries and all(ts is not None for ts, _ in entries):
+        entries.sort(key=lambda e: e[0])
+        first = entries[0][0]
+        return [(ts - first, payload) for ts, payload in entries]
+    return [(None, payload) for _, payload in entries]
+
+
+def replay_schedule(
+    trace: list[tuple[float | None, dict]],
+    speedup: float,
+    rate: float | None,
+    rng: random.Random,
+) -> Iterator[tuple[float, dict]]:
+    """有时间戳且未指定 --rate 时按原始间隔 / speedup，否则按 rate 泊松到达"""
+    use_timestamps = rate is None and trace and trace[0][0] is not None
+    t = 0.0
+    for offset, payload in trace:
+        if use_timestamps:
+            yield offset / speedup, payload
+        else:
+            t += rng.expovariate(1.0 if rate is None else rate)
+            yield t, payload
+
+
+async def benchmark_replay(
+    client: httpx.AsyncClient,
+    url: str,
+    profile: str,
+    trace_path: Path,
+    speedup: float,
+    rate: float | None,
+    model: str,
+    seed: int,
+):
+    """轨迹回放压测"""
+    trace = load_trace(trace_path, model)
+    if not trace:
+        print(f"轨迹为空: {trace_path}")
+        return None
+
+    prompt_chars = [sum(len(m.get("content", "")) for m in p["messages"]) for _, p in trace]
+    max_tokens = [p.get("max_tokens") or 0 for _, p in trace]
+    timed = trace[0][0] is not None and rate is None
+    print("开始轨迹回放:")
+    print(f"  URL: {url}")
+    print(f"  档位: {profile}")
+    print(f"  轨迹: {trace_path}（{len(trace)} 条）")
+    if timed:
+        print(f"  原始时长: {trace[-1][0]:.1f}s，加速 x{speedup}")
+    else:
+        print(f"  到达率: {1.0 if rate is None else rate} RPS（poisson）")
+    print(
+        f"  输入字符 P50/P95/最大: {percentile(prompt_chars, 50):.0f}/"
+        f"{percentile(prompt_chars, 95):.0f}/{max(prompt_chars)}"
+    )
+    print(f"  max_tokens P50/最大: {percentile(max_tokens, 50):.0f}/{max(max_tokens)}")
+    print(f"  流式占比: {sum(p['stream'] for _, p in trace) / len(trace):.0%}")
+    print()
+
+    schedule = replay_schedule(trace, speedup, rate, random.Random(seed))
+    stats, elapsed = await run_schedule(client, url, schedule)
+    stats.print_summary(elapsed)
+    return stats
+
+
+# ========================
+# 结果输出与回归对比
+# ========================
+
+RESULT_VERSION = 1
+
+
+def _git_revision() -> dict:
+    root = Path(__file__).resolve().parent.parent
+    try:
+        sha = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                cwd=root,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return {"git_sha": None, "git_dirty": None}
+    return {"git_sha": sha, "git_dirty": dirty}
+
+
+def run_metadata(args, profile: str) -> dict:
+    """本次压测的配置，写入结果便于对比时核对条件是否一致"""
+    meta = {
+        "timestamp": datetime.now(UTC).isoformat(timespec="seconds"),
+        **_git_revision(),
+        "host": platform.node(),
+        "url": args.url,
+        "profile": profile,
+        "mode": args.mode,
+        "max_connections": args.max_connections,
+    }
+    if args.mode == "closed":
+        meta.update(concurrency=args.concurrency, rounds=args.rounds)
+    else:
+        rate = DEFAULT_RATE if args.rate is None and args.mode != "replay" else args.rate
+        meta.update(rate=rate, arrival=args.arrival, seed=args.seed)
+    if args.mode == "open":
+        meta["duration"] = args.duration
+    elif args.mode == "ramp":
+        meta.update(
+            ramp_step=args.ramp_step,
+            ramp_max=args.ramp_max,
+            step_duration=args.step_duration,
+            slo_p95=args.slo_p95,
+            slo_metric=args.slo_metric,
+            slo_error_rate=args.slo_error_rate,
+        )
+    elif args.mode == "replay":
+        meta.update(trace=str(args.trace), speedup=args.speedup)
+    return meta
+
+
+def _json_safe(value):
+    """nan / inf 不是合法 JSON，写为 null"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_json_safe(v) for v in value]
+    return value
+
+
+def write_json(path: Path, meta: dict, stats: BenchmarkStats):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    document = {
+        "version": RESULT_VERSION,
+        "meta": meta,
+        "summary": stats.summary(),
+        "samples": stats.samples(),
+    }
+    path.write_text(json.dumps(_json_safe(document), ensure_ascii=False), encoding="utf-8")
+    print(f"结果已写入: {path}")
+
+
+CSV_FIELDS = [
+    "timestamp",
+    "git_sha",
+    "git_dirty",
+    "profile",
+    "mode",
+    "concurrency",
+    "rate",
+    "total",
+    "success",
+    "error_rate",
+    "duration",
+    "rps",
+    "ttft_p50",
+    "ttft_p95",
+    "ttft_p99",
+    "total_p50",
+    "total_p95",
+    "total_p99",
+    "itl_p50",
+    "itl_p95",
+    "output_tps",
+    "saturation_rps",
+]
+
+
+def append_csv(path: Path, meta: dict, stats: BenchmarkStats):
+    summary = _json_safe(stats.summary())
+    row = {key: meta.get(key) for key in CSV_FIELDS}
+    row.update({key: summary.get(key) for key in CSV_FIELDS if key in summary})
+    for prefix, dist in (("ttft", "ttft"), ("total", "total_latency"), ("itl", "itl")):
+        for q in ("p50", "p95", "p99"):
+            key = f"{prefix}_{q}"
+            if key in row:
+                row[key] = (summary[dist] or {}).get(q)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    is_new = not path.exists() or path.stat().st_size == 0
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        if is_new:
+            writer.writeheader()
+        writer.writerow(row)
+    print(f"结果已追加: {path}")
+
+
+# (名称, 样本键, 分位数)；延迟越大越差，用 bootstrap 估计差值的置信区间
+LATENCY_METRICS = [
+    ("TTFT P50", "ttft", 50),
+    ("TTFT P95", "ttft", 95),
+    ("TTFT P99", "ttft", 99),
+    ("总耗时 P95", "total_latency", 95),
+    ("ITL P95", "itl", 95),
+]
+# (名称, 汇总键)；越大越好，仅有点估计
+THROUGHPUT_METRICS = [("RPS", "rps"), ("输出 tokens/s", "output_tps")]
+MAX_BOOTSTRAP_SAMPLES = 20000
+
+
+def bootstrap_diff_ci(
+    base: list[float],
+    new: list[float],
+    q: float,
+    iterations: int,
+    rng: random.Random,
+    confidence: float = 0.95,
+) -> tuple[float, float]:
+    """new 与 base 第 q 分位数之差的 bootstrap 置信区间"""
+    # 样本过多时先降采样，控制耗时
+    if len(base) > MAX_BOOTSTRAP_SAMPLES:
+        base = rng.sample(base, MAX_BOOTSTRAP_SAMPLES)
+    if len(new) > MAX_BOOTSTRAP_SAMPLES:
+        new = rng.sample(new, MAX_BOOTSTRAP_SAMPLES)
+    diffs = [
+        percentile(rng.choices(new, k=len(new)), q) - percentile(rng.choices(base, k=len(base)), q)
+        for _ in range(iterations)
+    ]
+    alpha = (1 - confidence) / 2 * 100
+    return percentile(diffs, alpha), percentile(diffs, 100 - alpha)
+
+
+def compare_results(
+    base: dict,
+    new: dict,
+    threshold: float,
+    max_error_rate_increase: float,
+    iterations: int,
+    seed: int = 0,
+) -> list[dict]:
+    """逐项对比，返回 [{metric, base, new, change, ci, regression}]"""
+    rng = random.Random(seed)
+    rows = []
+
+    for name, key, q in LATENCY_METRICS:
+        base_samples = base["samples"].get(key) or []
+        new_samples = new["samples"].get(key) or []
+        if not base_samples or not new_samples:
+            continue
+        b, n = percentile(base_samples, q), percentile(new_samples, q)
+        change = (n - b) / b if b > 0 else math.inf if n > 0 else 0.0
+        ci = bootstrap_diff_ci(base_samples, new_samples, q, iterations, rng)
+        # 退化：相对变差超过阈值，且置信区间不含 0（差异非噪声）
+        regression = change > threshold and ci[0] > 0
+        rows.append(
+            {
+                "metric": name,
+                "base": b,
+                "new": n,
+                "change": change,
+                "ci": ci,
+                "regression": regression,
+            }
+        )
+
+    for name, key in THROUGHPUT_METRICS:
+        b, n = base["summary"].get(key), new["summary"].get(key)
+        if not b or n is None:
+            continue
+        change = (n - b) / b
+        rows.append(
+            {
+                "metric": name,
+                "base": b,
+                "new": n,
+                "change": change,
+                "ci": None,
+                "regression": change < -threshold,
+            }
+        )
+
+    b, n = base["summary"]["error_rate"], new["summary"]["error_rate"]
+    rows.append(
+        {
+            "metric": "错误率",
+            "base": b,
+            "new": n,
+            "change": n - b,
+            "ci": None,
+            "regression": n - b > max_error_rate_increase,
+        }
+    )
+    return rows
+
+
+def _load_result(path: Path) -> dict:
+    document = json.loads(path.read_text(encoding="utf-8"))
+    if document.get("version") != RESULT_VERSION:
+        raise SystemExit(f"{path}: 不支持的结果版本 {document.get('version')}")
+    return document
+
+
+def compare_main(argv: list[str]) -> int:
+    """python scripts/bench.py compare base.json new.json，存在退化时返回 1"""
+    parser = argparse.ArgumentParser(
+        prog="bench.py compare", description="对比两次压测结果，检测性能退化"
+    )
+    parser.add_argument("base", type=Path, help="基线结果 JSON")
+    parser.add_argument("new", type=Path, help="新结果 JSON")
+    parser.add_argument(
+        "--threshold", type=float, default=0.10, help="相对变差超过该比例视为退化（默认 10%%）"
+    )
+    parser.add_argument(
+        "--max-error-rate-increase", type=float, default=0.01, help="错误率允许的绝对增量"
+    )
+    parser.add_argument("--bootstrap", type=int, default=1000, help="bootstrap 重采样次数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    base, new = _load_result(args.base), _load_result(args.new)
+    for key in ("profile", "mode", "concurrency", "rate"):
+        if base["meta"].get(key) != new["meta"].get(key):
+            print(f"警告: {key} 不一致（{base['meta'].get(key)} vs {new['meta'].get(key)}）")
+    print(f"基线: {args.base}（{base['meta'].get('git_sha')}）")
+    print(f"新:   {args.new}（{new['meta'].get('git_sha')}）")
+    print()
+
+    rows = compare_results(
+        base, new, args.threshold, args.max_error_rate_increase, args.bootstrap, args.seed
+    )
+    print(f"{'指标':<14}{'基线':>10}{'新':>10}{'变化':>9}  {'差值 95% CI':<22}")
+    for row in rows:
+        if row["metric"] == "错误率":
+            values = f"{row['base']:>10.1%}{row['new']:>10.1%}"
+        else:
+            values = f"{row['base']:>10.3f}{row['new']:>10.3f}"
+        change = f"{row['change']:+.1%}"
+        ci = f"[{row['ci'][0]:+.3f}, {row['ci'][1]:+.3f}]" if row["ci"] else ""
+        flag = "  退化" if row["regression"] else ""
+        print(f"{row['metric']:<14}{values}{change:>9}  {ci:<22}{flag}")
+
+    regressions = [row["metric"] for row in rows if row["regression"]]
+    if regressions:
+        print(f"\n检测到性能退化: {', '.join(regressions)}")
+        return 1
+    print("\n未检测到性能退化")
+    return 0
 
 
 def main():
@@ -154,13 +918,112 @@ def main():
         default="http://127.0.0.1:8001/v1/chat/completions",
         help="API 地址",
     )
-    parser.add_argument("--concurrency", "-c", type=int, default=10, help="并发数")
-    parser.add_argument("--rounds", "-r", type=int, default=10, help="轮次")
+    parser.add_argument(
+        "--mode",
+        choices=["closed", "open", "ramp", "replay"],
+        default="closed",
+        help="压测模式",
+    )
+    parser.add_argument("--concurrency", "-c", type=int, default=10, help="并发数（闭环）")
+    parser.add_argument("--rounds", "-r", type=int, default=10, help="轮次（闭环）")
+
+    open_group = parser.add_argument_group("开环 / 阶梯加压")
+    open_group.add_argument(
+        "--rate", type=float, help="到达率（RPS，默认 10），阶梯起始值；回放时覆盖轨迹时间戳"
+    )
+    open_group.add_argument("--duration", type=float, default=60, help="开环发送时长（秒）")
+    open_group.add_argument("--arrival", choices=["poisson", "constant"], default="poisson")
+    open_group.add_argument("--seed", type=int, default=42, help="泊松到达的随机种子")
+    open_group.add_argument("--ramp-step", type=float, default=5, help="每级增加的 RPS")
+    open_group.add_argument("--ramp-max", type=float, default=200, help="最大 RPS")
+    open_group.add_argument("--step-duration", type=float, default=30, help="每级时长（秒）")
+    open_group.add_argument("--slo-p95", type=float, default=2.0, help="P95 延迟上限（秒）")
+    open_group.add_argument(
+        "--slo-metric", choices=["ttft", "total"], default="ttft", help="SLO 使用的延迟"
+    )
+    open_group.add_argument("--slo-error-rate", type=float, default=0.01, help="错误率上限")
+
+    replay_group = parser.add_argument_group("轨迹回放")
+    replay_group.add_argument("--trace", type=Path, help="轨迹 JSONL 文件")
+    replay_group.add_argument("--speedup", type=float, default=1.0, help="到达间隔缩放倍数")
+    replay_group.add_argument("--model", default=DEFAULT_PAYLOAD["model"], help="轨迹缺省模型")
+
+    output_group = parser.add_argument_group("连接与输出")
+    output_group.add_argument(
+        "--max-connections", type=int, default=1000, help="共用连接池上限（开环应大于峰值并发）"
+    )
+    output_group.add_argument("--hdr-out", help="导出 .hgrm 的文件名前缀，如 results/run1")
+    output_group.add_argument("--out", type=Path, help="结果 JSON（元数据、汇总与原始样本）")
+    output_group.add_argument("--csv", type=Path, help="追加一行汇总到 CSV（文件不存在时写表头）")
 
     args = parser.parse_args()
+    if args.mode == "replay" and not args.trace:
+        parser.error("--mode replay 需要 --trace")
+    # 非正值会使到达时刻不前进或阶梯不上升，压测永不结束
+    for option, value in (
+        ("--rate", args.rate),
+        ("--duration", args.duration),
+        ("--ramp-step", args.ramp_step),
+        ("--step-duration", args.step_duration),
+        ("--speedup", args.speedup),
+    ):
+        if value is not None and value <= 0:
+            parser.error(f"{option} 必须大于 0")
+
+    stats, profile = asyncio.run(run(args))
+    if not stats:
+        return
+    if args.hdr_out:
+        stats.export_hdr(args.hdr_out)
+    if args.out or args.csv:
+        meta = run_metadata(args, profile)
+        if args.out:
+            write_json(args.out, meta, stats)
+        if args.csv:
+            append_csv(args.csv, meta, stats)
+
 
-    asyncio.run(benchmark(args.url, args.concurrency, args.rounds))
+async def run(args) -> tuple[BenchmarkStats | None, str]:
+    rate = DEFAULT_RATE if args.rate is None else args.rate
+    async with make_client(args.max_connections) as client:
+        profile = await fetch_profile(client, args.url)
+        if args.mode == "replay":
+            # 显式给出 --rate 时忽略轨迹时间戳
+            stats = await benchmark_replay(
+                client,
+                args.url,
+                profile,
+                args.trace,
+                args.speedup,
+                args.rate,
+                args.model,
+                args.seed,
+            )
+        elif args.mode == "open":
+            stats = await benchmark_open(
+                client, args.url, profile, rate, args.duration, args.arrival, args.seed
+            )
+        elif args.mode == "ramp":
+            stats = await benchmark_ramp(
+                client,
+                args.url,
+                profile,
+                rate,
+                args.ramp_step,
+                args.ramp_max,
+                args.step_duration,
+                args.arrival,
+                args.slo_p95,
+                args.slo_metric,
+                args.slo_error_rate,
+                args.seed,
+            )
+        else:
+            stats = await benchmark(client, args.url, profile, args.concurrency, args.rounds)
+    return stats, profile
 
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        sys.exit(compare_main(sys.argv[2:]))
     main()
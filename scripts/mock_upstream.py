@@ -0,0 +1,326 @@
+"""
+模拟上游（OpenAI 兼容）服务
+
+USE_MOCK 在 chat_completions 内部直接返回，跳过了转发、连接池、超时与排队；
+本脚本作为独立的上游进程运行，网关照常转发，可在无 GPU 的环境下端到端压测
+forward_stream / forward_completion。
+
+用法：
+    # 启动模拟上游（默认 8000 端口，与 UPSTREAM_OPENAI_BASE 默认值一致）
+    python scripts/mock_upstream.py --ttft lognormal:0.3,0.5 --itl exp:0.03 --output-tokens uniform:50,300
+
+    # 模拟 KV cache 饱和：最多 32 条序列同时解码，超出排队；每多一条并发序列 ITL 增加 2%
+    python scripts/mock_upstream.py --max-seqs 32 --batch-slowdown 0.02
+
+    # 故障注入：1% 返回 503，1% 流中途卡住 30 秒，1% 流截断（无 finish_reason 与 [DONE]）
+    python scripts/mock_upstream.py --error-rate 0.01 --stall-rate 0.01 --truncate-rate 0.01
+
+    # 网关指向模拟上游（.env）
+    UPSTREAM_OPENAI_BASE=http://127.0.0.1:8000
+    USE_MOCK=false
+
+分布写作 "类型:参数"（单位秒 / token）：
+    fixed:M           固定值（纯数字等价于 fixed）
+    exp:M             指数分布，均值 M
+    uniform:A,B       [A, B] 均匀分布
+    lognormal:M,S     对数正态，均值 M，对数标准差 S（长尾）
+
+第 n 个请求使用由 (--seed, n) 确定的随机数，相同到达顺序下各请求的延迟、输出长度
+与注入的故障完全一致，便于对比网关改动前后的结果。
+
+GET /stats 返回当前解码 / 排队序列数与累计计数。
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import time
+import uuid
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, field
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+VOCAB = ["你", "好", "的", "是", "模型", "回答", "，", "。", " the", " model", " token", "\n"]
+
+Sampler = Callable[[random.Random], float]
+
+
+def parse_distribution(spec: str) -> Sampler:
+    """解析分布描述，返回以 rng 为参数的采样函数"""
+    kind, _, params = spec.partition(":")
+    if not params:
+        kind, params = "fixed", kind
+    try:
+        values = [float(v) for v in params.split(",")]
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"无效的分布参数: {spec}") from exc
+
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "exp" and len(values) == 1:
+        mean = values[0]
+        return lambda rng: rng.expovariate(1 / mean) if mean > 0 else 0.0
+    if kind == "uniform" and len(values) == 2:
+        low, high = values
+        return lambda rng: rng.uniform(low, high)
+    if kind == "lognormal" and len(values) == 2:
+        mean, sigma = values
+        # 使均值为 mean：mu = ln(mean) - sigma² / 2
+        mu = math.log(mean) - sigma**2 / 2 if mean > 0 else 0.0
+        return lambda rng: rng.lognormvariate(mu, sigma) if mean > 0 else 0.0
+    raise argparse.ArgumentTypeError(f"无效的分布: {spec}")
+
+
+@dataclass
+class MockConfig:
+    model: str = "qwen3-14b"
+    ttft: Sampler = field(default_factory=lambda: parse_distribution("0.2"))
+    itl: Sampler = field(default_factory=lambda: parse_distribution("0.02"))
+    output_tokens: Sampler = field(default_factory=lambda: parse_distribution("128"))
+    prefill_per_1k: float = 0.0  # 每 1000 输入字符额外的预填充耗时
+    max_seqs: int = 0  # 同时解码的序列上限，0 = 不限
+    batch_slowdown: float = 0.0  # 每多一条并发序列 ITL 增加的比例
+    error_rate: float = 0.0
+    error_status: int = 503
+    stall_rate: float = 0.0
+    stall_seconds: float = 30.0
+    truncate_rate: float = 0.0
+    seed: int = 0
+
+
+@dataclass
+class RequestPlan:
+    """单个请求预先确定的行为"""
+
+    ttft: float
+    itls: list[float]
+    tokens: list[str]
+    error: bool
+    stall_at: int | None
+    truncate_at: int | None
+
+
+class MockUpstream:
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self._counter = itertools.count()
+        self._slots = asyncio.Semaphore(config.max_seqs) if config.max_seqs > 0 else None
+        self.running = 0
+        self.waiting = 0
+        self.counts = {"requests": 0, "errors": 0, "stalls": 0, "truncated": 0, "tokens": 0}
+
+    def plan(self, body: dict) -> RequestPlan:
+        cfg = self.config
+        rng = random.Random(f"{cfg.seed}:{next(self._counter)}")
+        error = rng.random() < cfg.error_rate
+        stall = rng.random() < cfg.stall_rate
+        truncate = rng.random() < cfg.truncate_rate
+
+        max_tokens = body.get("max_tokens") or 512
+        n = max(1, min(int(round(cfg.output_tokens(rng))), max_tokens))
+        input_chars = sum(len(str(m.get("content") or "")) for m in body.get("messages") or [])
+        ttft = max(0.0, cfg.ttft(rng)) + cfg.prefill_per_1k * input_chars / 1000
+        return RequestPlan(
+            ttft=ttft,
+            itls=[max(0.0, cfg.itl(rng)) for _ in range(n - 1)],
+            tokens=[rng.choice(VOCAB) for _ in range(n)],
+            error=error,
+            stall_at=rng.randrange(n) if stall else None,
+            truncate_at=rng.randrange(n) if truncate else None,
+        )
+
+    async def _acquire(self):
+        if self._slots is None:
+            return
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+    def _release(self):
+        if self._slots is not None:
+            self._slots.release()
+
+    def _scaled(self, delay: float) -> float:
+        """并发序列越多，单步解码越慢"""
+        return delay * (1 + self.config.batch_slowdown * max(0, self.running - 1))
+
+    async def generate(self, plan: RequestPlan) -> AsyncIterator[tuple[int, str]]:
+        """占用解码槽位，按计划节奏产出 (序号, token)；排队时间计入首 token 延迟"""
+        await self._acquire()
+        self.running += 1
+        try:
+            await asyncio.sleep(self._scaled(plan.ttft))
+            for i, token in enumerate(plan.tokens):
+                if i > 0:
+                    await asyncio.sleep(self._scaled(plan.itls[i - 1]))
+                if i == plan.stall_at:
+                    self.counts["stalls"] += 1
+                    await asyncio.sleep(self.config.stall_seconds)
+                self.counts["tokens"] += 1
+                yield i, token
+        finally:
+            self.running -= 1
+            self._release()
+
+
+def _chunk(req_id: str, created: int, model: str, delta: dict, finish: str | None) -> bytes:
+    data = {
+        "id": req_id,
+        "object": "chat.completion.chunk",
+        "created": created,
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+    }
+    return b"data: " + json.dumps(data, ensure_ascii=False).encode() + b"\n\n"
+
+
+def create_app(config: MockConfig) -> Starlette:
+    upstream = MockUpstream(config)
+
+    async def chat_completions(request: Request) -> Response:
+        body = await request.json()
+        plan = upstream.plan(body)
+        upstream.counts["requests"] += 1
+        model = body.get("model") or config.model
+        req_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        if plan.error:
+            upstream.counts["errors"] += 1
+            return JSONResponse(
+                {"error": {"message": "Injected upstream error", "type": "server_error"}},
+                status_code=config.error_status,
+            )
+
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in body.get("messages") or [])
+        finish = "length" if len(plan.tokens) == (body.get("max_tokens") or 512) else "stop"
+
+        if not body.get("stream"):
+            content = "".join([token async for _, token in upstream.generate(plan)])
+            return JSONResponse(
+                {
+                    "id": req_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": finish,
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": len(plan.tokens),
+                        "total_tokens": prompt_tokens + len(plan.tokens),
+                    },
+                }
+            )
+
+        async def stream() -> AsyncIterator[bytes]:
+            # 与 vLLM 一致：先发只含 role 的 chunk
+            yield _chunk(req_id, created, model, {"role": "assistant", "content": ""}, None)
+            async for i, token in upstream.generate(plan):
+                if i == plan.truncate_at:
+                    upstream.counts["truncated"] += 1
+                    return
+                yield _chunk(req_id, created, model, {"content": token}, None)
+            yield _chunk(req_id, created, model, {}, finish)
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    async def models(request: Request) -> Response:
+        return JSONResponse(
+            {
+                "object": "list",
+                "data": [{"id": config.model, "object": "model", "owned_by": "mock"}],
+            }
+        )
+
+    async def health(request: Request) -> Response:
+        return Response(status_code=200)
+
+    async def stats(request: Request) -> Response:
+        return JSONResponse(
+            {"running": upstream.running, "waiting": upstream.waiting, **upstream.counts}
+        )
+
+    return Starlette(
+        routes=[
+            Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+            Route("/v1/models", models),
+            Route("/health", health),
+            Route("/stats", stats),
+        ]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CxyGPT 模拟上游（OpenAI 兼容）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--model", default="qwen3-14b", help="/v1/models 返回的模型名")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+
+    timing = parser.add_argument_group("延迟与输出长度")
+    timing.add_argument("--ttft", type=parse_distribution, default="0.2", help="首 token 延迟")
+    timing.add_argument("--itl", type=parse_distribution, default="0.02", help="token 间隔")
+    timing.add_argument(
+        "--output-tokens",
+        type=parse_distribution,
+        default="128",
+        help="输出 token 数（不超过请求的 max_tokens）",
+    )
+    timing.add_argument(
+        "--prefill-per-1k", type=float, default=0.0, help="每 1000 输入字符增加的首 token 延迟"
+    )
+
+    saturation = parser.add_argument_group("并发饱和")
+    saturation.add_argument("--max-seqs", type=int, default=0, help="同时解码的序列上限，超出排队")
+    saturation.add_argument(
+        "--batch-slowdown", type=float, default=0.0, help="每多一条并发序列 ITL 增加的比例"
+    )
+
+    faults = parser.add_argument_group("故障注入（概率）")
+    faults.add_argument("--error-rate", type=float, default=0.0, help="直接返回错误状态码")
+    faults.add_argument("--error-status", type=int, default=503)
+    faults.add_argument("--stall-rate", type=float, default=0.0, help="流中途停顿")
+    faults.add_argument("--stall-seconds", type=float, default=30.0)
+    faults.add_argument("--truncate-rate", type=float, default=0.0, help="流截断，不发送 [DONE]")
+
+    args = parser.parse_args()
+    config = MockConfig(
+        model=args.model,
+        ttft=args.ttft,
+        itl=args.itl,
+        output_tokens=args.output_tokens,
+        prefill_per_1k=args.prefill_per_1k,
+        max_seqs=args.max_seqs,
+        batch_slowdown=args.batch_slowdown,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        stall_rate=args.stall_rate,
+        stall_seconds=args.stall_seconds,
+        truncate_rate=args.truncate_rate,
+        seed=args.seed,
+    )
+    print(f"模拟上游: http://{args.host}:{args.port}/v1/chat/completions")
+    uvicorn.run(
+        create_app(config), host=args.host, port=args.port, log_level="warning", access_log=False
+    )
+
+
+if __name__ == "__main__":
+    main()
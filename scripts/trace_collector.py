@@ -0,0 +1,124 @@
+"""
+本地追踪收集器（OTLP/HTTP JSON）
+
+开发环境中代替 OpenTelemetry Collector：接收网关（TRACE_EXPORTER=otlp）导出的 span，
+原样按行追加到文件，并在控制台按 trace 打印 span 树，便于查看一次请求的耗时分布。
+
+用法：
+    python scripts/trace_collector.py --port 4318 --out data/traces.jsonl
+
+    # 网关 .env
+    TRACING_ENABLED=true
+    TRACE_EXPORTER=otlp
+    TRACE_OTLP_ENDPOINT=http://127.0.0.1:4318/v1/traces
+
+    # 查看已写入文件的 trace（TRACE_EXPORTER=file 写出的文件格式相同）
+    python scripts/trace_collector.py --show data/traces.jsonl
+
+输出文件每行一个 ExportTraceServiceRequest，可直接交给 Collector 的 otlpjsonfile receiver
+导入 Jaeger / Tempo。仅支持 JSON 编码（不支持 protobuf）。
+"""
+
+import argparse
+import json
+from collections import defaultdict
+from pathlib import Path
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+def iter_spans(payload: dict):
+    """ExportTraceServiceRequest → (service, span)"""
+    for resource_spans in payload.get("resourceSpans", []):
+        service = next(
+            (
+                attr["value"].get("stringValue", "")
+                for attr in resource_spans.get("resource", {}).get("attributes", [])
+                if attr["key"] == "service.name"
+            ),
+            "unknown",
+        )
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for span in scope_spans.get("spans", []):
+                yield service, span
+
+
+def _format_tree(children: dict, parent_id: str | None, depth: int, lines: list[str]) -> None:
+    for service, span in sorted(
+        children.get(parent_id, []), key=lambda item: int(item[1]["startTimeUnixNano"])
+    ):
+        duration = (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+        error = " ERROR" if span.get("status", {}).get("code") == 2 else ""
+        lines.append(f"  {'  ' * depth}{duration:9.1f} ms  [{service}] {span['name']}{error}")
+        _format_tree(children, span["spanId"], depth + 1, lines)
+
+
+def format_traces(spans: list[tuple[str, dict]]) -> str:
+    """按 trace 输出缩进的 span 树：耗时（毫秒）、服务、名称"""
+    traces: dict[str, list[tuple[str, dict]]] = defaultdict(list)
+    for service, span in spans:
+        traces[span["traceId"]].append((service, span))
+
+    lines = []
+    for trace_id, members in traces.items():
+        ids = {span["spanId"] for _, span in members}
+        children: dict[str | None, list[tuple[str, dict]]] = defaultdict(list)
+        for service, span in members:
+            parent = span.get("parentSpanId")
+            children[parent if parent in ids else None].append((service, span))
+
+        lines.append(f"trace {trace_id}")
+        _format_tree(children, None, 0, lines)
+    return "\n".join(lines)
+
+
+def create_app(out: Path) -> Starlette:
+    out.parent.mkdir(parents=True, exist_ok=True)
+
+    async def traces(request: Request):
+        if "json" not in request.headers.get("content-type", ""):
+            return JSONResponse({"error": "only application/json is supported"}, status_code=415)
+        payload = await request.json()
+        with open(out, "a", encoding="utf-8") as f:
+            f.write(json.dumps(payload, ensure_ascii=False, separators=(",", ":")) + "\n")
+        spans = list(iter_spans(payload))
+        if spans:
+            print(format_traces(spans), flush=True)
+        return JSONResponse({})
+
+    return Starlette(routes=[Route("/v1/traces", traces, methods=["POST"])])
+
+
+def show(path: Path) -> None:
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                spans.extend(iter_spans(json.loads(line)))
+    print(format_traces(spans))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CxyGPT 本地追踪收集器（OTLP/HTTP JSON）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--out", type=Path, default=Path("data/traces.jsonl"))
+    parser.add_argument("--show", type=Path, help="打印已有文件中的 trace 后退出")
+    args = parser.parse_args()
+
+    if args.show:
+        show(args.show)
+        return
+
+    print(f"追踪收集器: http://{args.host}:{args.port}/v1/traces -> {args.out}")
+    uvicorn.run(
+        create_app(args.out), host=args.host, port=args.port, log_level="warning", access_log=False
+    )
+
+
+if __name__ == "__main__":
+    main()